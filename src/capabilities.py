@@ -0,0 +1,257 @@
+import os
+import glob
+import json
+import hashlib
+import logging
+import platform
+import tempfile
+import subprocess
+from vaapi_detect import parse_vainfo_driver_version
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+VA_PROFILE_BIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vaapi_src", "va_profile")
+
+DEFAULT_CACHE_FILE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+    "ffmpeg-benchmark",
+    "vaapi_capabilities.json"
+)
+
+# Directories searched for user-space VAAPI drivers (their mtime is part of the cache key)
+VA_DRIVER_DIRS = [
+    "/usr/lib/x86_64-linux-gnu/dri",
+    "/usr/lib64/dri",
+    "/usr/lib/dri",
+    "/usr/local/lib/dri"
+]
+
+# va_profile profile names (see vaapi_src/va_profiles.h) -> codec key
+VA_PROFILE_CODECS = {
+    "MPEG-2 Simple": "mpeg2",
+    "MPEG-2 Main": "mpeg2",
+    "H.264 Main": "h264",
+    "H.264 High": "h264",
+    "H.264 Constrained Baseline": "h264",
+    "VC-1 Simple": "vc1",
+    "VC-1 Main": "vc1",
+    "VC-1 Advanced": "vc1",
+    "JPEG Baseline": "mjpeg",
+    "VP8": "vp8",
+    "HEVC Main": "hevc",
+    "HEVC Main 10-bit": "hevc_main10",
+    "HEVC Main 12-bit": "hevc_main12",
+    "VP9 Profile 0": "vp9",
+    "VP9 Profile 2": "vp9_10bit",
+    "AV1 Profile 0": "av1",
+    "AV1 Profile 1": "av1_444"
+}
+
+# vainfo profile names -> codec key
+VAINFO_PROFILE_CODECS = {
+    "VAProfileMPEG2Simple": "mpeg2",
+    "VAProfileMPEG2Main": "mpeg2",
+    "VAProfileH264Main": "h264",
+    "VAProfileH264High": "h264",
+    "VAProfileH264ConstrainedBaseline": "h264",
+    "VAProfileVC1Simple": "vc1",
+    "VAProfileVC1Main": "vc1",
+    "VAProfileVC1Advanced": "vc1",
+    "VAProfileJPEGBaseline": "mjpeg",
+    "VAProfileVP8Version0_3": "vp8",
+    "VAProfileHEVCMain": "hevc",
+    "VAProfileHEVCMain10": "hevc_main10",
+    "VAProfileHEVCMain12": "hevc_main12",
+    "VAProfileVP9Profile0": "vp9",
+    "VAProfileVP9Profile2": "vp9_10bit",
+    "VAProfileAV1Profile0": "av1",
+    "VAProfileAV1Profile1": "av1_444"
+}
+
+# va_profile entrypoint names and vainfo entrypoint suffixes -> normalized entrypoint
+ENTRYPOINTS = {
+    "Decoding (VLD)": "VLD",
+    "Encoding (Slice)": "EncSlice",
+    "Encoding (Slice LP)": "EncSliceLP",
+    "Encoding (Picture)": "EncPicture",
+    "Video Processing": "VideoProc",
+    "VAEntrypointVLD": "VLD",
+    "VAEntrypointEncSlice": "EncSlice",
+    "VAEntrypointEncSliceLP": "EncSliceLP",
+    "VAEntrypointEncPicture": "EncPicture",
+    "VAEntrypointVideoProc": "VideoProc"
+}
+
+def _read_sysfs(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+def driver_fingerprint(device):
+    """
+    Identifie le pilote d'un nœud de rendu sans initialiser VAAPI: pilote noyau et sa version,
+    identifiant PCI, variables LIBVA_* et dates de modification des pilotes *_drv_video.so.
+    Toute mise à jour du pilote change l'empreinte et invalide donc le cache.
+    """
+    node = os.path.basename(device)
+    sys_device = f"/sys/class/drm/{node}/device"
+    kernel_driver = os.path.basename(os.path.realpath(f"{sys_device}/driver")) if os.path.exists(f"{sys_device}/driver") else ""
+    parts = [
+        kernel_driver,
+        _read_sysfs(f"/sys/module/{kernel_driver}/version") if kernel_driver else "",
+        _read_sysfs(f"/sys/module/{kernel_driver}/srcversion") if kernel_driver else "",
+        _read_sysfs(f"{sys_device}/vendor"),
+        _read_sysfs(f"{sys_device}/device"),
+        os.environ.get("LIBVA_DRIVER_NAME", ""),
+        os.environ.get("LIBVA_DRIVERS_PATH", "")
+    ]
+    driver_dirs = os.environ.get("LIBVA_DRIVERS_PATH", "").split(":") + VA_DRIVER_DIRS
+    for directory in driver_dirs:
+        for path in sorted(glob.glob(os.path.join(directory, "*_drv_video.so"))):
+            parts.append(f"{path}:{os.stat(path).st_mtime_ns}")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+
+def cache_key(device):
+    """
+    Clé de cache d'un périphérique: chemin + empreinte du pilote + version du noyau.
+    """
+    return f"{device}|{driver_fingerprint(device)}|{platform.release()}"
+
+def build_matrix(profiles, driver, source):
+    """
+    Construit la matrice de capacités à partir de {profil: [entrypoints normalisés]}.
+    La section "codecs" résume, pour chaque codec, decode / encode / encode_lp.
+    """
+    codecs = {}
+    for profile, entrypoints in profiles.items():
+        codec = VA_PROFILE_CODECS.get(profile) or VAINFO_PROFILE_CODECS.get(profile)
+        if codec is None:
+            continue
+        flags = codecs.setdefault(codec, {"decode": False, "encode": False, "encode_lp": False})
+        flags["decode"] |= "VLD" in entrypoints
+        flags["encode"] |= "EncSlice" in entrypoints or "EncPicture" in entrypoints or "EncSliceLP" in entrypoints
+        flags["encode_lp"] |= "EncSliceLP" in entrypoints
+    return {
+        "source": source,
+        "driver": driver,
+        "profiles": profiles,
+        "codecs": codecs
+    }
+
+def probe_va_profile(device):
+    """
+    Interroge un nœud de rendu avec l'outil va_profile (sortie JSON).
+    Retourne la matrice de capacités, ou None si l'outil est absent ou échoue.
+    """
+    if not os.access(VA_PROFILE_BIN, os.X_OK):
+        return None
+    fd, json_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        subprocess.run([VA_PROFILE_BIN, device, "--json", json_path],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True, timeout=30)
+        with open(json_path) as f:
+            data = json.load(f)
+    except (OSError, subprocess.SubprocessError, ValueError) as e:
+        logging.warning(f"va_profile indisponible pour {device}: {e}")
+        return None
+    finally:
+        os.remove(json_path)
+
+    profiles = {}
+    for entry in data.get("Profiles", []):
+        entrypoints = [ENTRYPOINTS.get(ep, ep) for ep in entry.get("entrypoints", [])]
+        profiles.setdefault(entry["profile"], []).extend(entrypoints)
+    return build_matrix(profiles, data.get("Driver Version", ""), "va_profile")
+
+def probe_vainfo(device):
+    """
+    Repli: interroge un nœud de rendu avec `vainfo --display drm --device`.
+    Retourne la matrice de capacités, ou None si vainfo est absent ou échoue.
+    """
+    try:
+        result = subprocess.run(["vainfo", "--display", "drm", "--device", device],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, timeout=30)
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.warning(f"vainfo indisponible pour {device}: {e}")
+        return None
+
+    profiles = {}
+    for line in result.stdout.split('\n'):
+        line = line.strip()
+        if line.startswith("VAProfile"):
+            profile, _, entrypoint = line.partition(":")
+            entrypoint = entrypoint.strip()
+            profiles.setdefault(profile.strip(), []).append(ENTRYPOINTS.get(entrypoint, entrypoint))
+    return build_matrix(profiles, parse_vainfo_driver_version(result.stdout), "vainfo")
+
+def _load_cache(cache_file):
+    try:
+        with open(cache_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_cache(cache, cache_file):
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    partial = f"{cache_file}.partial"
+    with open(partial, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(partial, cache_file)
+
+def get_capability_matrix(devices, cache_file=DEFAULT_CACHE_FILE, refresh=False):
+    """
+    Retourne {périphérique: matrice de capacités} pour chaque nœud de rendu.
+    Les matrices sont lues dans le cache disque quand la clé (périphérique, pilote, noyau)
+    n'a pas changé; sinon va_profile est interrogé, puis vainfo en repli.
+    Les périphériques qu'aucun outil ne sait interroger sont absents du résultat.
+    """
+    cache = {} if refresh else _load_cache(cache_file)
+    matrices = {}
+    updated = False
+    for device in devices:
+        key = cache_key(device)
+        if key in cache:
+            matrices[device] = cache[key]
+            continue
+        matrix = probe_va_profile(device) or probe_vainfo(device)
+        if matrix is None:
+            continue
+        logging.info(f"Capacités VAAPI de {device} détectées via {matrix['source']} ({matrix['driver']})")
+        matrices[device] = cache[key] = matrix
+        updated = True
+    if updated:
+        try:
+            _save_cache(cache, cache_file)
+        except OSError as e:
+            logging.warning(f"Impossible d'écrire le cache de capacités {cache_file}: {e}")
+    return matrices
+
+def devices_supporting(matrices, codec, capability="encode"):
+    """
+    Périphériques dont la matrice annonce `capability` (decode, encode, encode_lp) pour `codec`.
+    """
+    return [
+        device for device, matrix in matrices.items()
+        if matrix["codecs"].get(codec, {}).get(capability)
+    ]
+
+def summarize_capabilities(matrices):
+    """
+    Aplatit les matrices en booléens "<codec>_<capacité>" vrais si au moins un périphérique
+    les supporte. Les clés h264/hevc encode/decode sont toujours présentes.
+    """
+    summary = {
+        "h264_encode": False,
+        "h264_decode": False,
+        "hevc_encode": False,
+        "hevc_decode": False,
+    }
+    for matrix in matrices.values():
+        for codec, flags in matrix["codecs"].items():
+            for capability, supported in flags.items():
+                key = f"{codec}_{capability}"
+                summary[key] = summary.get(key, False) or supported
+    return summary
@@ -0,0 +1,211 @@
+import os
+import csv
+import glob
+import time
+import shutil
+import logging
+from config import PRESETS, BITRATES
+from progress import run_ffmpeg, extract_metrics
+from scheduler import run_jobs
+from quality import score_output, QUALITY_FIELDS
+from software_transcode import build_software_command
+from hardware_transcode import build_hardware_command
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CHUNKED_FIELDS = [
+    "source",
+    "codec",
+    "acceleration",
+    "preset",
+    "bitrate",
+    "iteration",
+    "chunks",
+    "workers",
+    "mono_utime_s",
+    "mono_rtime_s",
+    "segment_rtime_s",
+    "encode_rtime_s",
+    "concat_rtime_s",
+    "chunked_rtime_s",
+    "speedup",
+    "chunk_utime_s",
+    "mono_kbps",
+    "chunked_kbps",
+    "kbps_delta_pct",
+    "boundary_bytes"
+] + [f"mono_{field}" for field in QUALITY_FIELDS] + [f"chunked_{field}" for field in QUALITY_FIELDS]
+
+DEFAULT_SEGMENT_S = 2.0
+
+def build_segment_command(source, pattern, segment_s=DEFAULT_SEGMENT_S):
+    """
+    Découpe la piste vidéo de `source` en segments d'environ `segment_s` secondes sans réencodage:
+    avec -c copy, le muxer segment ne coupe que sur une image clé, chaque segment commence
+    donc au début d'un GOP.
+    """
+    return [
+        "ffmpeg",
+        "-benchmark",
+        "-y", "-hide_banner",
+        "-i", source,
+        "-map", "0:v:0",
+        "-c", "copy",
+        "-f", "segment",
+        "-segment_time", str(segment_s),
+        "-reset_timestamps", "1",
+        pattern
+    ]
+
+def build_concat_command(list_file, target):
+    """
+    Assemble les segments encodés listés dans `list_file` avec le démultiplexeur concat, sans réencodage.
+    """
+    return [
+        "ffmpeg",
+        "-benchmark",
+        "-y", "-hide_banner",
+        "-f", "concat", "-safe", "0",
+        "-i", list_file,
+        "-c", "copy",
+        target
+    ]
+
+def _run(cmd, cpus=None):
+    logging.info(f"Exécution de la commande: {' '.join(cmd)}")
+    run = run_ffmpeg(cmd, cpus)
+    return extract_metrics(run.stderr), run
+
+def _size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def segment_source(source, directory, segment_s=DEFAULT_SEGMENT_S):
+    """
+    Découpe `source` dans `directory`; retourne (métriques du découpage, chemins des segments dans l'ordre).
+    """
+    os.makedirs(directory, exist_ok=True)
+    metrics, _ = _run(build_segment_command(source, os.path.join(directory, "chunk_%05d.mp4"), segment_s))
+    return metrics, sorted(glob.glob(os.path.join(directory, "chunk_*.mp4")))
+
+def transcode_chunked(source, codec, acceleration="software", iteration_count=1, workers=4, gpus=None,
+                      sessions_per_gpu=1, isolate=False, segment_s=DEFAULT_SEGMENT_S, quality=None,
+                      quality_subsample=1):
+    """
+    Compare, pour chaque configuration preset x bitrate, l'encodage monolithique de `source`
+    à l'encodage par segments (VOD): découpage aux images clés, encodage des segments en
+    parallèle par `workers` processus ffmpeg (répartis sur `gpus` en VAAPI) puis assemblage
+    avec le démultiplexeur concat.
+
+    chunked_rtime_s est le temps de bout en bout (découpage + encodage parallèle + assemblage),
+    comparé à mono_rtime_s par `speedup`; concat_rtime_s isole le coût de l'assemblage.
+    Chaque segment commence par une image IDR et relance le contrôle de débit: le surcoût aux
+    frontières est mesuré par l'écart de débit (kbps_delta_pct), l'excédent d'octets par
+    frontière (boundary_bytes) et, avec `quality`, l'écart des métriques des deux sorties
+    mesurées contre le source.
+    """
+    os.makedirs("transcoded_outputs", exist_ok=True)
+    base = os.path.basename(source).replace('.mp4', '')
+    workdir = os.path.join("transcoded_outputs", f"{base}_chunks")
+    results = []
+
+    def build(input_file, target, preset, bitrate, gpu=None):
+        if acceleration == "vaapi":
+            return build_hardware_command(input_file, target, codec, bitrate, preset, gpu or gpus[0])
+        return build_software_command(input_file, target, codec, bitrate, preset)
+
+    try:
+        segment, chunks = segment_source(source, os.path.join(workdir, "source"), segment_s)
+        if not chunks:
+            logging.error(f"Aucun segment produit pour {source}")
+            return results
+        logging.info(f"{source}: {len(chunks)} segment(s) en {segment['rtime_s']:.2f}s")
+
+        for i in range(iteration_count):
+            for preset in PRESETS:
+                for bitrate in BITRATES:
+                    mono_file = f"transcoded_outputs/{base}_{codec}_{bitrate}_{preset}_{i}_mono.mp4"
+                    joined_file = f"transcoded_outputs/{base}_{codec}_{bitrate}_{preset}_{i}_chunked.mp4"
+                    encoded_dir = os.path.join(workdir, f"{preset}_{bitrate}_{i}")
+                    os.makedirs(encoded_dir, exist_ok=True)
+                    try:
+                        mono, mono_run = _run(build(source, mono_file, preset, bitrate))
+
+                        def encode_chunk(chunk, cpus, device=None):
+                            target = os.path.join(encoded_dir, os.path.basename(chunk))
+                            metrics, _ = _run(build(chunk, target, preset, bitrate, device), cpus)
+                            return {"file": target, **metrics}
+
+                        started = time.monotonic()
+                        placement = (
+                            {"devices": list(gpus), "sessions_per_device": sessions_per_gpu}
+                            if acceleration == "vaapi" else {"concurrency": workers}
+                        )
+                        encoded = run_jobs(chunks, encode_chunk, isolate=isolate, **placement)
+                        encode_wall = time.monotonic() - started
+                        if len(encoded) != len(chunks):
+                            logging.error(f"{len(chunks) - len(encoded)} segment(s) non encodé(s): {preset} {bitrate}")
+                            continue
+
+                        list_file = os.path.join(encoded_dir, "concat.txt")
+                        with open(list_file, "w") as f:
+                            for chunk in encoded:
+                                f.write(f"file '{os.path.abspath(chunk['file'])}'\n")
+                        concat, _ = _run(build_concat_command(list_file, joined_file))
+
+                        duration = mono_run.samples[-1].out_time_s if mono_run.samples else None
+                        mono_bytes, joined_bytes = _size(mono_file), _size(joined_file)
+                        chunked_rtime = segment['rtime_s'] + encode_wall + concat['rtime_s']
+                        row = {
+                            "source": source,
+                            "codec": codec,
+                            "acceleration": acceleration,
+                            "preset": preset,
+                            "bitrate": bitrate,
+                            "iteration": i + 1,
+                            "chunks": len(chunks),
+                            "workers": len(gpus) * sessions_per_gpu if acceleration == "vaapi" else workers,
+                            "mono_utime_s": mono['utime_s'],
+                            "mono_rtime_s": mono['rtime_s'],
+                            "segment_rtime_s": segment['rtime_s'],
+                            "encode_rtime_s": round(encode_wall, 3),
+                            "concat_rtime_s": concat['rtime_s'],
+                            "chunked_rtime_s": round(chunked_rtime, 3),
+                            "speedup": round(mono['rtime_s'] / chunked_rtime, 2) if chunked_rtime else None,
+                            "chunk_utime_s": round(sum(chunk['utime_s'] for chunk in encoded), 3),
+                            "mono_kbps": round(mono_bytes * 8 / 1000 / duration, 1) if duration else None,
+                            "chunked_kbps": round(joined_bytes * 8 / 1000 / duration, 1) if duration else None,
+                            "kbps_delta_pct": round(100 * (joined_bytes - mono_bytes) / mono_bytes, 2) if mono_bytes else None,
+                            "boundary_bytes": round((joined_bytes - mono_bytes) / (len(chunks) - 1)) if len(chunks) > 1 else None
+                        }
+                        if quality:
+                            for prefix, output in (("mono", mono_file), ("chunked", joined_file)):
+                                scores = score_output(output, source, quality, quality_subsample)
+                                row.update({f"{prefix}_{field}": value for field, value in scores.items()})
+                        results.append(row)
+                        logging.info(
+                            f"Terminé: {source} {preset} {bitrate} itération {i + 1} - "
+                            f"monolithique {mono['rtime_s']:.2f}s, par segments {chunked_rtime:.2f}s "
+                            f"(découpage {segment['rtime_s']:.2f}s, encodage {encode_wall:.2f}s, "
+                            f"assemblage {concat['rtime_s']:.2f}s), accélération x{row['speedup']}, "
+                            f"débit {row['kbps_delta_pct']}%"
+                        )
+                    finally:
+                        shutil.rmtree(encoded_dir, ignore_errors=True)
+                        for output in (mono_file, joined_file):
+                            if os.path.exists(output):
+                                os.remove(output)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return results
+
+def write_chunked_results(results, csv_file="chunked_results.csv"):
+    """
+    Enregistre la table des mesures monolithique / par segments.
+    """
+    with open(csv_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CHUNKED_FIELDS)
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+    logging.info(f"Les résultats par segments sont enregistrés dans : {csv_file}")
@@ -41,10 +41,10 @@ BITRATES = ["2M", "4M", "8M"]
 # Nombre d'itérations par test (peut être remplacé par un paramètre CLI plus tard)
 ITERATION_COUNT = 1
 
-def download_videos():
+def download_videos(videos=VIDEOS):
     """
     Télécharge les vidéos de test si elles ne sont pas déjà présentes,
-    en utilisant `wget` ou `curl`.
+    en utilisant `wget` ou `curl`. Les vidéos sans "url" doivent déjà exister.
     """
     os.makedirs("samples", exist_ok=True)
 
@@ -56,8 +56,10 @@ def download_videos():
         print("Erreur: ni wget ni curl n'est installé. Impossible de télécharger les fichiers.")
         return
 
-    for video in VIDEOS:
-        if not os.path.exists(video["file"]):
+    for video in videos:
+        if not os.path.exists(video["file"]) and not video.get("url"):
+            print(f"Erreur: {video['file']} est absent et n'a pas d'url de téléchargement.")
+        elif not os.path.exists(video["file"]):
             print(f"Téléchargement de {video['file']}...")
 
             # Construire la commande en fonction de wget ou curl
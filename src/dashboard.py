@@ -0,0 +1,206 @@
+import os
+import sys
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from resource_sampler import read_core_times
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_REFRESH_S = 1.0
+DEFAULT_METRICS_PORT = 9464
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+def _duration(seconds):
+    if seconds is None:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+def _bar(percent, width=10):
+    filled = round(max(0, min(100, percent)) / 100 * width)
+    return "█" * filled + "░" * (width - filled)
+
+def gpu_busy_percent(device):
+    """
+    Occupation d'un GPU d'après sysfs (gpu_busy_percent, exposé par amdgpu); None si indisponible.
+    """
+    path = f"/sys/class/drm/{os.path.basename(device)}/device/gpu_busy_percent"
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+class Dashboard:
+    """
+    Tableau de bord en terminal, redessiné toutes les `refresh_s` secondes depuis un SweepState:
+    avancement et ETA du balayage, jobs en cours (fps, vitesse), occupation de chaque cœur et,
+    pour chaque GPU, sessions en cours et occupation quand le pilote l'expose.
+    Pendant l'affichage, seuls les avertissements du journal sont écrits sur la console.
+    """
+
+    def __init__(self, state, refresh_s=DEFAULT_REFRESH_S, stream=sys.stdout):
+        self.state = state
+        self.refresh_s = refresh_s
+        self.stream = stream
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._cores = read_core_times()
+        self._levels = []
+
+    def start(self):
+        for handler in logging.getLogger().handlers:
+            self._levels.append((handler, handler.level))
+            handler.setLevel(max(handler.level, logging.WARNING))
+        # Alternate screen: the terminal is restored as it was when the dashboard stops
+        self.stream.write("\x1b[?1049h\x1b[?25l")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stream.write("\x1b[?25h\x1b[?1049l")
+        self.stream.flush()
+        for handler, level in self._levels:
+            handler.setLevel(level)
+
+    def _core_load(self):
+        cores = read_core_times()
+        load = {
+            core: 100 * (busy - self._cores[core][0]) / (total - self._cores[core][1])
+            if core in self._cores and total > self._cores[core][1] else 0.0
+            for core, (busy, total) in sorted(cores.items())
+        }
+        self._cores = cores
+        return load
+
+    def render(self):
+        snapshot = self.state.snapshot()
+        done, planned = snapshot["finished"], snapshot["planned"]
+        percent = 100 * done / planned if planned else 0.0
+        lines = [
+            f"Benchmark de transcodage - {_duration(snapshot['elapsed_s'])} écoulé, "
+            f"ETA {_duration(snapshot['eta_s'])}",
+            f"Jobs: {done}/{planned} {_bar(percent, 30)} {percent:.0f}%  "
+            f"(en cours {len(snapshot['running'])}, échecs {snapshot['failed']}, interrompus {snapshot['aborted']})",
+            "",
+            "Jobs en cours:"
+        ]
+        gpus = {}
+        for job, info in sorted(snapshot["running"].items()):
+            if info["device"]:
+                gpus[info["device"]] = gpus.get(info["device"], 0) + 1
+            lines.append(
+                f"  {job:<60.60} {info['fps']:7.1f} fps  x{info['speed']:<5.2f} "
+                f"{_duration(snapshot['elapsed_s'] - (info['started'] - self.state.started))}"
+                f"{'  ' + info['device'] if info['device'] else ''}"
+            )
+        lines += ["", "Cœurs:"]
+        load = list(self._core_load().items())
+        for start in range(0, len(load), 4):
+            lines.append("  " + "  ".join(
+                f"cpu{core:<3} {_bar(value)} {value:3.0f}%" for core, value in load[start:start + 4]
+            ))
+        if gpus:
+            lines += ["", "GPU:"]
+            for device, sessions in sorted(gpus.items()):
+                busy = gpu_busy_percent(device)
+                lines.append(f"  {device}: {sessions} session(s)"
+                             + (f" {_bar(busy)} {busy}%" if busy is not None else ""))
+        return "\n".join(lines)
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_s):
+            try:
+                self.stream.write("\x1b[H\x1b[2J" + self.render() + "\n")
+                self.stream.flush()
+            except Exception as e:
+                logging.error(f"Erreur du tableau de bord: {e}")
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{_label_value(value)}"' for key, value in labels.items() if value is not None) + "}"
+
+def render_openmetrics(snapshot):
+    """
+    Exposition OpenMetrics (texte) d'un SweepState.snapshot(): avancement du balayage,
+    métriques des jobs en cours et histogrammes des jobs terminés.
+    """
+    lines = [
+        "# TYPE ffbench_jobs_planned counter",
+        "# HELP ffbench_jobs_planned Jobs added to the sweep plan.",
+        f"ffbench_jobs_planned_total {snapshot['planned']}",
+        "# TYPE ffbench_jobs_finished counter",
+        "# HELP ffbench_jobs_finished Jobs finished, including failed and aborted ones.",
+        f"ffbench_jobs_finished_total {snapshot['finished']}",
+        "# TYPE ffbench_jobs_failed counter",
+        f"ffbench_jobs_failed_total {snapshot['failed']}",
+        "# TYPE ffbench_jobs_aborted counter",
+        f"ffbench_jobs_aborted_total {snapshot['aborted']}",
+        "# TYPE ffbench_jobs_running gauge",
+        f"ffbench_jobs_running {len(snapshot['running'])}",
+        "# TYPE ffbench_sweep_eta_seconds gauge",
+        "# UNIT ffbench_sweep_eta_seconds seconds",
+        f"ffbench_sweep_eta_seconds {snapshot['eta_s'] if snapshot['eta_s'] is not None else 'NaN'}"
+    ]
+    for name, field, help_text in (
+        ("ffbench_job_fps", "fps", "Current encoding frame rate of a running job."),
+        ("ffbench_job_speed", "speed", "Current encoding speed of a running job (1 = real time)."),
+        ("ffbench_job_frames", "frame", "Frames encoded so far by a running job.")
+    ):
+        lines += [f"# TYPE {name} gauge", f"# HELP {name} {help_text}"]
+        for job, info in sorted(snapshot["running"].items()):
+            lines.append(f"{name}{_labels(job=job, acceleration=info['acceleration'], device=info['device'])} {info[field]}")
+    for name, key, unit in (("ffbench_job_rtime_seconds", "rtime", "seconds"), ("ffbench_job_fps_completed", "fps", None)):
+        lines.append(f"# TYPE {name} histogram")
+        if unit:
+            lines.append(f"# UNIT {name} {unit}")
+        for acceleration, (buckets, counts, count, total) in sorted(snapshot[key].items()):
+            for bound, bucket_count in zip(buckets, counts):
+                lines.append(f"{name}_bucket{_labels(acceleration=acceleration, le=float(bound))} {bucket_count}")
+            lines.append(f"{name}_bucket{_labels(acceleration=acceleration, le='+Inf')} {count}")
+            lines.append(f"{name}_count{_labels(acceleration=acceleration)} {count}")
+            lines.append(f"{name}_sum{_labels(acceleration=acceleration)} {total}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    """
+    Point de collecte /metrics (OpenMetrics) servi par un thread, pour les collecteurs existants.
+    """
+
+    def __init__(self, state, port=DEFAULT_METRICS_PORT, bind="127.0.0.1"):
+        state_ref = state
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logging.debug(format % args)
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_openmetrics(state_ref.snapshot()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((bind, port), MetricsHandler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        host, port = self.server.server_address[:2]
+        logging.info(f"Métriques OpenMetrics disponibles sur http://{host}:{port}/metrics")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,480 @@
+import os
+import time
+import signal
+import asyncio
+import logging
+from collections import namedtuple
+from contextlib import asynccontextmanager
+from config import PRESETS, BITRATES
+from scheduler import (MatrixPlan, available_cpus, partition_cpus, format_cpus, pinned_command, pin_process,
+                       job_label, publish_finished)
+from events import publish
+from progress import (PROGRESS_ARGS, ProgressParser, FfmpegRun, StderrLog, StageTimer, extract_metrics,
+                      instrument_command)
+from frame_cache import raw_input_args
+from resource_sampler import ResourceSampler, summarize_resources, read_rapl_energy, rapl_energy_j
+from output_sink import apply_sink, extract_output_size, output_metrics
+from software_transcode import build_software_command
+from hardware_transcode import build_hardware_command, build_hwaccel_command
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Seconds given to ffmpeg to finish its output after SIGTERM before its process group is killed
+KILL_GRACE_S = 5.0
+
+# One source swept by one backend; `gpus` lists the render nodes usable by a GPU backend
+# `backend` names the BACKENDS entry when it differs from the acceleration label of the results
+# `jobs` ({(preset, bitrate): job description}, e.g. matrix.MatrixJob) replaces the preset x bitrate sweep
+SweepTask = namedtuple("SweepTask", ["acceleration", "source", "codec", "gpus", "backend", "jobs"],
+                       defaults=(None, None))
+
+# Encoding backends by name:
+#  - build_command(task, target, bitrate, preset, device, entry) returns the ffmpeg command;
+#    `entry` is the frame cache entry of the source, or None
+#  - resource: "cpu" jobs share the CPU pool, "gpu" jobs take one session of a render node
+#  - raw_input: whether the backend can read (True) or needs ("required") the decoded frames of the frame cache
+#  - pix_fmt: pixel format of those frames (nv12 is what VAAPI uploads to the GPU)
+#  - run: coroutine replacing run_ffmpeg_async for pipelines that consume ffmpeg's output themselves
+#    (live); called as run(cmd, entry, cpus, timeout=, sample_interval=, stages=, on_sample=), it returns
+#    (FfmpegRun, extra result columns). Such backends write no output file: sinks do not apply
+#  - metric: result column driving the adaptive iterations (see MatrixPlan)
+BACKENDS = {}
+
+def register_backend(name, build_command, resource="cpu", raw_input=True, run=None, metric="rtime_s",
+                     pix_fmt="yuv420p"):
+    """
+    Déclare un backend d'encodage utilisable par run_sweep (libx264/libx265, VAAPI, matrice, live...).
+    """
+    BACKENDS[name] = {
+        "build_command": build_command,
+        "resource": resource,
+        "raw_input": raw_input,
+        "run": run,
+        "metric": metric,
+        "pix_fmt": pix_fmt
+    }
+
+def backend_of(task):
+    return BACKENDS[task.backend or task.acceleration]
+
+def task_configs(task, sinks=("file",)):
+    """
+    Configurations (preset, bitrate, puits) d'une tâche: ses `jobs`, à défaut preset x bitrate.
+    """
+    pairs = task.jobs if task.jobs is not None else [(preset, bitrate) for preset in PRESETS for bitrate in BITRATES]
+    return [(preset, bitrate, sink) for preset, bitrate in pairs for sink in sinks]
+
+def _input_args(entry):
+    return raw_input_args(entry) if entry is not None else None
+
+def _software_command(task, target, bitrate, preset, device, entry):
+    return build_software_command(task.source, target, task.codec, bitrate, preset, _input_args(entry))
+
+def _vaapi_command(task, target, bitrate, preset, device, entry):
+    return build_hardware_command(task.source, target, task.codec, bitrate, preset, device, _input_args(entry))
+
+def _vaapi_hwaccel_command(task, target, bitrate, preset, device, entry):
+    # Hardware decoding is what this pipeline measures: it always reads the compressed source
+    return build_hwaccel_command(task.source, target, task.codec, bitrate, preset, device)
+
+register_backend("software", _software_command)
+register_backend("vaapi", _vaapi_command, resource="gpu", pix_fmt="nv12")
+register_backend("vaapi_hwaccel", _vaapi_hwaccel_command, resource="gpu", raw_input=False)
+
+def _signal_group(process, sig):
+    try:
+        os.killpg(process.pid, sig)
+    except ProcessLookupError:
+        pass
+
+async def terminate_group(process, grace_s=KILL_GRACE_S):
+    """
+    Arrête ffmpeg et tous les processus de son groupe: SIGTERM (ffmpeg finalise alors sa sortie),
+    puis SIGKILL si le groupe n'est pas terminé après `grace_s` secondes.
+    """
+    if process.returncode is not None:
+        return
+    _signal_group(process, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(process.wait(), grace_s)
+    except asyncio.TimeoutError:
+        _signal_group(process, signal.SIGKILL)
+        await process.wait()
+
+async def supervise(process, follow, readers, timeout=None, sample_interval=None):
+    """
+    Suit un ffmpeg lancé dans son propre groupe de processus: attend la coroutine `follow`
+    (lecture de sa sortie jusqu'à la fin du processus) puis les tâches `readers`, avec un
+    ResourceSampler si `sample_interval` est fourni. Si `timeout` secondes s'écoulent ou si
+    la tâche est annulée (Ctrl-C), tout le groupe est arrêté par terminate_group.
+    Retourne (délai dépassé, échantillons de ressources).
+    """
+    sampler = None
+    if sample_interval:
+        sampler = ResourceSampler(process.pid, sample_interval)
+        sampler.start()
+
+    timed_out = False
+    try:
+        try:
+            await asyncio.wait_for(follow, timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Délai de {timeout:g}s dépassé, arrêt du transcodage.")
+            timed_out = True
+            await terminate_group(process)
+        await asyncio.gather(*readers)
+    except asyncio.CancelledError:
+        await terminate_group(process)
+        for reader in readers:
+            reader.cancel()
+        raise
+    finally:
+        resources = await asyncio.to_thread(sampler.stop) if sampler is not None else []
+    return timed_out, resources
+
+async def run_ffmpeg_async(cmd, cpus=None, timeout=None, min_speed=None, min_speed_grace_s=5.0,
+                           sample_interval=None, output_pipe=False, stages=None, on_sample=None):
+    """
+    Équivalent asyncio de progress.run_ffmpeg (mêmes options, même FfmpegRun en retour).
+
+    ffmpeg est suivi par supervise(): un transcodage interrompu par le délai `timeout` est
+    marqué `aborted`, comme un arrêt sur `min_speed`.
+    `stages` (StageTimer) cumule les temps par étape d'une commande passée par instrument_command.
+    `on_sample(sample)` est appelé pour chaque échantillon de progression; il ne doit pas bloquer.
+    """
+    cmd = [cmd[0]] + PROGRESS_ARGS + list(cmd[1:])
+    parser = ProgressParser()
+    log = StderrLog(stages)
+    counted = {"bytes": 0}
+    pass_fds = ()
+    if output_pipe:
+        read_fd, write_fd = os.pipe()
+        cmd.append(f"pipe:{write_fd}")
+        pass_fds = (write_fd,)
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *pinned_command(cmd, cpus), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            start_new_session=True, pass_fds=pass_fds
+        )
+    except BaseException:
+        if output_pipe:
+            os.close(read_fd)
+        raise
+    finally:
+        # Only ffmpeg keeps the write end open: the reader sees EOF when it exits
+        if output_pipe:
+            os.close(write_fd)
+    pin_process(process.pid, cpus)
+
+    async def drain_stderr():
+        async for line in process.stderr:
+            log.feed(line.decode(errors="replace"))
+
+    async def count_output():
+        reader = asyncio.StreamReader()
+        transport, _ = await asyncio.get_running_loop().connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(read_fd, "rb", buffering=0)
+        )
+        try:
+            while chunk := await reader.read(1 << 20):
+                counted["bytes"] += len(chunk)
+        finally:
+            transport.close()
+
+    aborted = False
+
+    async def follow_progress():
+        nonlocal aborted
+        async for line in process.stdout:
+            sample = parser.feed(line.decode(errors="replace"))
+            if sample is not None and on_sample is not None:
+                on_sample(sample)
+            if (
+                sample is not None
+                and min_speed is not None
+                and not aborted
+                and sample.elapsed_s >= min_speed_grace_s
+                and 0 < sample.speed < min_speed
+            ):
+                logging.warning(f"Vitesse {sample.speed:.2f}x sous le seuil {min_speed:.2f}x, arrêt du transcodage.")
+                aborted = True
+                _signal_group(process, signal.SIGKILL)
+        await process.wait()
+
+    readers = [asyncio.create_task(drain_stderr())]
+    if output_pipe:
+        readers.append(asyncio.create_task(count_output()))
+    timed_out, resources = await supervise(process, follow_progress(), readers, timeout, sample_interval)
+    aborted = aborted or timed_out
+
+    if process.returncode != 0 and not aborted:
+        logging.warning(f"ffmpeg a retourné {process.returncode}: {''.join(log.tail).strip()}")
+
+    return FfmpegRun(log.text(), parser.samples, aborted, process.returncode, resources,
+                     counted["bytes"] if output_pipe else None)
+
+class Resource:
+    """
+    Ressource d'exécution bornée (pool CPU ou un GPU): un sémaphore limite le nombre de jobs
+    simultanés et chaque job reçoit l'un des ensembles de cœurs de la ressource.
+    """
+
+    def __init__(self, name, core_sets):
+        self.name = name
+        self.semaphore = asyncio.Semaphore(len(core_sets))
+        self.core_sets = list(core_sets)
+        # Jobs waiting for or holding a slot, used to pick the least loaded GPU
+        self.load = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        self.load += 1
+        try:
+            async with self.semaphore:
+                core_set = self.core_sets.pop(0)
+                try:
+                    yield core_set
+                finally:
+                    self.core_sets.append(core_set)
+        finally:
+            self.load -= 1
+
+class Engine:
+    """
+    Moteur d'exécution asyncio des balayages preset x bitrate x puits de sortie, des jobs de
+    matrice et du mode live (backends enregistrés par matrix.py et live.py).
+
+    Les jobs de toutes les tâches (SweepTask) partagent une même boucle d'événements: les jobs
+    des backends "cpu" se partagent `concurrency` places, chaque GPU offre `sessions_per_gpu`
+    places, si bien que les balayages logiciels et matériels s'exécutent en même temps.
+    Avec `isolate`, chaque place reçoit un ensemble de cœurs disjoint (taskset).
+    `timeout` borne la durée de chaque transcodage. Avec `stage_timing`, les commandes sont
+    instrumentées (progress.instrument_command) et les résultats reçoivent les colonnes STAGE_FIELDS.
+    Les autres options sont celles des anciens runners logiciel, matériel, matrice et live: `quality`
+    (QualityPipeline), `frame_cache` (FrameCache), `journal` (JobJournal), `sample_interval`, `min_speed`.
+    """
+
+    def __init__(self, concurrency=1, isolate=False, sessions_per_gpu=1, timeout=None, min_speed=None,
+                 sample_interval=None, stage_timing=False, quality=None, frame_cache=None, journal=None):
+        self.concurrency = max(1, concurrency)
+        self.isolate = isolate
+        self.sessions_per_gpu = max(1, sessions_per_gpu)
+        self.timeout = timeout
+        self.min_speed = min_speed
+        self.sample_interval = sample_interval
+        self.stage_timing = stage_timing
+        self.quality = quality
+        self.frame_cache = frame_cache
+        self.journal = journal
+        self._cpu = None
+        self._gpus = {}
+
+    def _create_resources(self, tasks):
+        cpu_slots = self.concurrency if any(backend_of(t)["resource"] == "cpu" for t in tasks) else 0
+        gpus = sorted({gpu for t in tasks if backend_of(t)["resource"] == "gpu" for gpu in t.gpus})
+        slots = cpu_slots + len(gpus) * self.sessions_per_gpu
+        cpus = available_cpus()
+        if self.isolate:
+            core_sets = partition_cpus(cpus, slots)
+            if len(core_sets) < slots:
+                logging.warning(f"Seulement {len(cpus)} cœurs disponibles pour {slots} places: cœurs partagés.")
+        else:
+            core_sets = [cpus]
+        assigned = iter(core_sets[k % len(core_sets)] for k in range(slots))
+        self._cpu = Resource("cpu", [next(assigned) for _ in range(cpu_slots)]) if cpu_slots else None
+        self._gpus = {
+            gpu: Resource(gpu, [next(assigned) for _ in range(self.sessions_per_gpu)]) for gpu in gpus
+        }
+
+    async def _transcode(self, task, preset, bitrate, sink, i, device, cpus, entry, is_warmup, label):
+        # Matrix job labels join their axis values with "/"
+        target_file = (
+            f"transcoded_outputs/"
+            f"{os.path.basename(task.source).replace('.mp4','')}_{task.codec}_{task.acceleration}_"
+            f"{bitrate}_{preset.replace('/', '_')}_{i}.mp4"
+        )
+        backend = backend_of(task)
+        output_file = None
+        result = None
+        try:
+            cmd = backend["build_command"](task, target_file, bitrate, preset, device, entry)
+            if backend["run"] is None:
+                cmd, output_file = apply_sink(cmd, sink)
+            stages = None
+            if self.stage_timing:
+                cmd, stages = instrument_command(cmd), StageTimer()
+            logging.info(f"Exécution de la commande: {' '.join(cmd)}")
+
+            def on_sample(sample):
+                publish("progress", job=label, fps=sample.fps, speed=sample.speed, frame=sample.frame,
+                        out_time_s=sample.out_time_s)
+
+            # Package energy over the job's lifetime, shared with any job running at the same time
+            energy_start = read_rapl_energy()
+            columns = {}
+            if backend["run"] is None:
+                run = await run_ffmpeg_async(cmd, cpus, timeout=self.timeout, min_speed=self.min_speed,
+                                             sample_interval=self.sample_interval, output_pipe=sink == "pipe",
+                                             stages=stages, on_sample=on_sample)
+            else:
+                run, columns = await backend["run"](cmd, entry, cpus, timeout=self.timeout,
+                                                    sample_interval=self.sample_interval, stages=stages,
+                                                    on_sample=on_sample)
+            energy_j = rapl_energy_j(energy_start, read_rapl_energy())
+            metrics = extract_metrics(run.stderr)
+            result = {
+                "source": task.source,
+                "codec": task.codec,
+                "preset": preset,
+                "bitrate": bitrate,
+                "acceleration": task.acceleration,
+                "iteration": i + 1,
+                "utime_s": metrics['utime_s'],
+                "rtime_s": metrics['rtime_s'],
+                "maxrss_kb": metrics['maxrss_kb'],
+                "frames": run.samples[-1].frame if run.samples else 0,
+                "aborted": run.aborted,
+                "energy_j": energy_j,
+                "progress": run.samples,
+                "resources": run.resources
+            }
+            if sink == "pipe":
+                output_bytes = run.output_bytes
+            elif output_file is not None:
+                output_bytes = os.path.getsize(output_file) if os.path.exists(output_file) else None
+            else:
+                output_bytes = extract_output_size(run.stderr)
+            result.update(output_metrics(sink, output_bytes, run.samples[-1].out_time_s if run.samples else None))
+            if self.sample_interval:
+                result.update(summarize_resources(run.resources))
+            if stages is not None:
+                result.update(stages.buckets(metrics['rtime_s']))
+            result.update(columns)
+
+            logging.info(
+                f"Terminé: {output_file or target_file} ({task.acceleration}, {sink}) - "
+                f"utime_s={metrics['utime_s']:.2f}, "
+                f"rtime_s={metrics['rtime_s']:.2f}, "
+                f"maxrss_kb={metrics['maxrss_kb']}, "
+                f"output_kbps={result['output_kbps']}"
+            )
+        except Exception as e:
+            logging.error(f"Exception lors du transcodage de {target_file}: {e}")
+
+        if output_file is not None:
+            if self.quality is not None and result is not None and not result["aborted"] and not is_warmup:
+                # Scored in _finish(), once the engine has added its columns
+                result["output"] = output_file
+            elif os.path.exists(output_file):
+                os.remove(output_file)
+
+        return result
+
+    async def _run_job(self, task, job, plan, entry):
+        (preset, bitrate, sink), i, is_warmup = job
+        device = None
+        resource = self._cpu
+        if backend_of(task)["resource"] == "gpu":
+            device = min(task.gpus, key=lambda gpu: self._gpus[gpu].load)
+            resource = self._gpus[device]
+
+        label = job_label(job, f"{os.path.basename(task.source)} {task.codec} {task.acceleration}")
+        async with resource.slot() as core_set:
+            publish("job_started", job=label, acceleration=task.acceleration, device=device,
+                    cpus=format_cpus(core_set))
+            started = time.monotonic()
+            result = None
+            try:
+                result = await self._transcode(task, preset, bitrate, sink, i, device,
+                                               core_set if self.isolate else None, entry, is_warmup, label)
+            finally:
+                publish_finished(label, result, acceleration=task.acceleration, device=device)
+            finished = time.monotonic()
+
+        if result is not None:
+            result["cpus"] = format_cpus(core_set)
+            if device is not None:
+                result["device"] = device
+            result["started_s"] = round(started, 3)
+            result["finished_s"] = round(finished, 3)
+        result = plan.record(job, result)
+        if result is not None:
+            self._finish(task, result)
+        return result
+
+    def _finish(self, task, result):
+        record = self.journal.record if self.journal is not None else None
+        output_file = result.pop("output", None)
+        if output_file is not None:
+            self.quality.submit(result, output_file, task.source, on_done=record)
+        elif record is not None:
+            record(result)
+
+    async def _run_task(self, task, sinks, iteration_count, warmup, target_ci, time_budget):
+        backend = backend_of(task)
+        entry = None
+        if self.frame_cache is not None and backend["raw_input"]:
+            try:
+                # Decoding into the cache blocks: keep the other tasks running meanwhile
+                entry = await asyncio.to_thread(self.frame_cache.get, task.source, backend["pix_fmt"])
+            except Exception as e:
+                logging.error(f"Cache d'images indisponible pour {task.source}, lecture de la source compressée: {e}")
+        if entry is None and backend["raw_input"] == "required":
+            logging.error(f"{task.acceleration}: {task.source} ignoré, le cache d'images est nécessaire")
+            return []
+
+        completed = None
+        if self.journal is not None:
+            completed = self.journal.completed_jobs(task.source, task.codec, task.acceleration)
+        plan = MatrixPlan(task_configs(task, sinks), iteration_count, warmup, target_ci, time_budget,
+                          metric=backend["metric"], completed=completed)
+
+        results = []
+        jobs = plan.first_round()
+        while jobs is not None:
+            outcomes = await asyncio.gather(*(self._run_job(task, job, plan, entry) for job in jobs))
+            results += [result for result in outcomes if result is not None]
+            jobs = plan.next_round()
+        return results
+
+    async def _run(self, tasks, sinks, iteration_count, warmup, target_ci, time_budget):
+        self._create_resources(tasks)
+        per_task = await asyncio.gather(
+            *(self._run_task(task, sinks, iteration_count, warmup, target_ci, time_budget) for task in tasks)
+        )
+        return [result for results in per_task for result in results]
+
+    async def _run_single(self, task, config, i):
+        self._create_resources([task])
+        return await self._run_job(task, (config, i, False), MatrixPlan([config]), None)
+
+    def run_job(self, task, preset, bitrate, sink="file", i=0):
+        """
+        Exécute un seul transcodage de `task` (itération d'indice `i`), sans échauffement ni
+        itération adaptative: jobs distribués par un coordinateur de flotte (voir fleet.py).
+        Retourne le résultat, ou None en cas d'échec.
+        """
+        os.makedirs("transcoded_outputs", exist_ok=True)
+        return asyncio.run(self._run_single(task, (preset, bitrate, sink), i))
+
+    def run(self, tasks, sinks=("file",), iteration_count=1, warmup=0, target_ci=None, time_budget=None):
+        """
+        Exécute chaque tâche sur toutes ses configurations x puits de `sinks` (voir task_configs et
+        scheduler.MatrixPlan pour `warmup`, `target_ci` et `time_budget`).
+        Retourne les résultats de toutes les tâches, dans l'ordre des tâches.
+        """
+        os.makedirs("transcoded_outputs", exist_ok=True)
+        return asyncio.run(self._run(tasks, sinks, iteration_count, warmup, target_ci, time_budget))
+
+def run_sweep(tasks, iteration_count=1, concurrency=1, isolate=False, sessions_per_gpu=1, timeout=None,
+              min_speed=None, quality=None, frame_cache=None, warmup=0, target_ci=None, time_budget=None,
+              sample_interval=None, journal=None, sinks=("file",), stage_timing=False):
+    """
+    Balayage preset x bitrate de toutes les tâches (SweepTask) en une seule exécution du moteur
+    (voir Engine); remplace les anciens transcode_software et transcode_hardware.
+    """
+    engine = Engine(concurrency=concurrency, isolate=isolate, sessions_per_gpu=sessions_per_gpu, timeout=timeout,
+                    min_speed=min_speed, sample_interval=sample_interval, stage_timing=stage_timing,
+                    quality=quality, frame_cache=frame_cache, journal=journal)
+    return engine.run(tasks, sinks=sinks, iteration_count=iteration_count, warmup=warmup,
+                      target_ci=target_ci, time_budget=time_budget)
@@ -0,0 +1,216 @@
+import os
+import re
+import glob
+import time
+import shutil
+import hashlib
+import logging
+import platform
+import subprocess
+from resource_sampler import read_core_times
+from scheduler import available_cpus, format_cpus
+from vaapi_detect import get_vainfo_output, parse_vainfo_driver_version
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CPU_SYSFS = "/sys/devices/system/cpu"
+NODE_SYSFS = "/sys/devices/system/node"
+
+# Environment columns stamped on every result row (see JobJournal); `fingerprint` hashes the others
+ENVIRONMENT_FIELDS = [
+    "cpu_model",
+    "cpu_governor",
+    "turbo",
+    "smt",
+    "numa_layout",
+    "numa_node",
+    "ffmpeg_version",
+    "ffmpeg_build",
+    "encoder_libs",
+    "driver",
+    "kernel",
+    "fingerprint"
+]
+
+# Shared libraries of ffmpeg whose version changes encoding speed or output
+ENCODER_LIB_PATTERN = re.compile(r'^\s*(lib(?:x264|x265|SvtAv1Enc|vpx|aom|dav1d|vmaf|va|vpl|mfx)\S*\.so\S*)', re.MULTILINE)
+
+DEFAULT_IDLE_WINDOW_S = 3.0
+DEFAULT_MAX_BUSY_PERCENT = 10.0
+
+def _read(path, default=None):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+def cpu_model():
+    for line in (_read("/proc/cpuinfo") or "").split('\n'):
+        if line.startswith("model name"):
+            return line.partition(":")[2].strip()
+    return platform.processor() or platform.machine()
+
+def cpu_governors():
+    """
+    Gouverneurs cpufreq des cœurs, dédoublonnés (ex: "performance" ou "powersave,performance").
+    """
+    governors = {_read(path) for path in glob.glob(f"{CPU_SYSFS}/cpu[0-9]*/cpufreq/scaling_governor")}
+    return ",".join(sorted(g for g in governors if g)) or None
+
+def turbo_enabled():
+    """
+    1 si le turbo (intel_pstate) ou le boost (acpi-cpufreq, amd-pstate) est actif, 0 sinon, None si inconnu.
+    """
+    no_turbo = _read(f"{CPU_SYSFS}/intel_pstate/no_turbo")
+    if no_turbo is not None:
+        return int(no_turbo == "0")
+    boost = _read(f"{CPU_SYSFS}/cpufreq/boost")
+    return int(boost == "1") if boost is not None else None
+
+def smt_active():
+    active = _read(f"{CPU_SYSFS}/smt/active")
+    return int(active) if active in ("0", "1") else None
+
+def numa_nodes():
+    """
+    Retourne {nœud: liste des cœurs} d'après sysfs (dictionnaire vide sans NUMA exposé).
+    """
+    nodes = {}
+    for path in glob.glob(f"{NODE_SYSFS}/node[0-9]*"):
+        cpus = []
+        for part in (_read(f"{path}/cpulist") or "").split(","):
+            if part:
+                start, _, end = part.partition("-")
+                cpus.extend(range(int(start), int(end or start) + 1))
+        nodes[int(os.path.basename(path)[4:])] = cpus
+    return dict(sorted(nodes.items()))
+
+def ffmpeg_build():
+    """
+    Retourne (première ligne de `ffmpeg -version`, ligne configuration: de la compilation).
+    """
+    try:
+        output = subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                text=True).stdout
+    except FileNotFoundError:
+        return "", ""
+    configuration = next((line for line in output.split('\n') if line.startswith("configuration:")), "")
+    return output.split('\n', 1)[0].strip(), configuration.partition(":")[2].strip()
+
+def encoder_libraries():
+    """
+    Bibliothèques d'encodage liées dynamiquement à ffmpeg, avec leur version de soname
+    (ex: "libx264.so.164 libx265.so.199"); None pour un binaire statique ou sans ldd.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if not (ffmpeg and shutil.which("ldd")):
+        return None
+    output = subprocess.run(["ldd", ffmpeg], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True).stdout
+    return " ".join(sorted(set(ENCODER_LIB_PATTERN.findall(output)))) or None
+
+def collect_fingerprint(numa_node=None):
+    """
+    Empreinte de l'environnement d'exécution (colonnes ENVIRONMENT_FIELDS): deux exécutions
+    de même `fingerprint` ont tourné sur le même matériel, avec les mêmes réglages et le même ffmpeg.
+    """
+    version, configuration = ffmpeg_build()
+    fingerprint = {
+        "cpu_model": cpu_model(),
+        "cpu_governor": cpu_governors(),
+        "turbo": turbo_enabled(),
+        "smt": smt_active(),
+        "numa_layout": ";".join(f"{node}:{format_cpus(cpus)}" for node, cpus in numa_nodes().items()) or None,
+        "numa_node": numa_node,
+        "ffmpeg_version": version,
+        "ffmpeg_build": hashlib.sha1(configuration.encode()).hexdigest()[:12] if configuration else None,
+        "encoder_libs": encoder_libraries(),
+        "driver": parse_vainfo_driver_version(get_vainfo_output()),
+        "kernel": platform.release()
+    }
+    fingerprint["fingerprint"] = hashlib.sha1(repr(sorted(fingerprint.items())).encode()).hexdigest()[:12]
+    return fingerprint
+
+def drop_caches():
+    """
+    Vide le cache de pages (sync puis /proc/sys/vm/drop_caches): les sources sont relues
+    depuis le disque comme lors d'une première exécution. Nécessite les droits root.
+    """
+    os.sync()
+    try:
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        logging.info("Cache de pages vidé.")
+        return True
+    except OSError as e:
+        logging.warning(f"Impossible de vider le cache de pages: {e}")
+        return False
+
+def pin_numa_node(node):
+    """
+    Restreint le processus courant aux cœurs du nœud NUMA `node`; tous les ffmpeg lancés
+    ensuite en héritent, et available_cpus() ne retourne plus que ces cœurs.
+    """
+    nodes = numa_nodes()
+    if node not in nodes:
+        raise ValueError(f"Nœud NUMA inconnu: {node} (disponibles: {', '.join(map(str, nodes)) or 'aucun'})")
+    os.sched_setaffinity(0, nodes[node])
+    logging.info(f"Exécution épinglée sur le nœud NUMA {node} (cœurs {format_cpus(nodes[node])})")
+
+def measure_busy_percent(window_s=DEFAULT_IDLE_WINDOW_S, cpus=None):
+    """
+    Occupation moyenne (en %) des cœurs `cpus` (défaut: cœurs utilisables) sur `window_s` secondes.
+    """
+    cpus = available_cpus() if cpus is None else cpus
+    before = read_core_times()
+    time.sleep(window_s)
+    after = read_core_times()
+    # Cores taken offline meanwhile have nothing to measure
+    cores = [c for c in cpus if c in before and c in after]
+    busy = sum(after[c][0] - before[c][0] for c in cores)
+    total = sum(after[c][1] - before[c][1] for c in cores)
+    return 100 * busy / total if total else 0.0
+
+def preflight_issues(fingerprint, busy_percent=None, max_busy_percent=DEFAULT_MAX_BUSY_PERCENT):
+    """
+    Raisons pour lesquelles les mesures de cet hôte risquent de varier d'une exécution à l'autre.
+    """
+    issues = []
+    governors = (fingerprint["cpu_governor"] or "").split(",")
+    if fingerprint["cpu_governor"] and governors != ["performance"]:
+        issues.append(f"gouverneur cpufreq {fingerprint['cpu_governor']} (performance recommandé)")
+    if fingerprint["turbo"]:
+        issues.append("turbo actif: la fréquence dépend de la température et de la charge")
+    if busy_percent is not None and busy_percent > max_busy_percent:
+        issues.append(f"hôte occupé à {busy_percent:.1f}% (seuil {max_busy_percent:g}%)")
+    return issues
+
+def preflight(numa_node=None, drop_page_cache=False, idle_window_s=None,
+              max_busy_percent=DEFAULT_MAX_BUSY_PERCENT, strict=False):
+    """
+    Préparation de l'hôte avant le premier transcodage: épinglage NUMA, vidage du cache,
+    contrôle de l'inactivité puis empreinte de l'environnement, retournée pour être
+    ajoutée à chaque résultat. Les causes de bruit sont signalées; avec `strict`, elles
+    lèvent une RuntimeError.
+    """
+    if numa_node is not None:
+        pin_numa_node(numa_node)
+    if drop_page_cache:
+        drop_caches()
+    busy_percent = None
+    if idle_window_s:
+        busy_percent = measure_busy_percent(idle_window_s)
+        logging.info(f"Occupation de l'hôte sur {idle_window_s:g}s: {busy_percent:.1f}%")
+    fingerprint = collect_fingerprint(numa_node)
+    logging.info(
+        f"Environnement {fingerprint['fingerprint']}: {fingerprint['cpu_model']}, "
+        f"gouverneur {fingerprint['cpu_governor']}, turbo {fingerprint['turbo']}, SMT {fingerprint['smt']}, "
+        f"NUMA {fingerprint['numa_layout']}, {fingerprint['ffmpeg_version']} (build {fingerprint['ffmpeg_build']}), "
+        f"{fingerprint['encoder_libs']}, pilote {fingerprint['driver']}"
+    )
+    issues = preflight_issues(fingerprint, busy_percent, max_busy_percent)
+    for issue in issues:
+        logging.warning(f"Environnement bruité: {issue}")
+    if issues and strict:
+        raise RuntimeError(f"Hôte trop bruité pour des mesures fiables ({len(issues)} problème(s))")
+    return fingerprint
@@ -0,0 +1,158 @@
+import time
+import queue
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Events waiting for the dispatcher; beyond this the oldest consumers are behind and new events are dropped
+MAX_PENDING_EVENTS = 10000
+
+# Completed-run histogram buckets (upper bounds)
+RTIME_BUCKETS_S = [0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800]
+FPS_BUCKETS = [1, 5, 10, 25, 30, 50, 60, 100, 200, 500, 1000]
+
+class EventBus:
+    """
+    Bus d'événements du processus: les runners publient (publish) sans jamais attendre, un
+    thread distribue ensuite les événements aux abonnés (tableau de bord, export /metrics).
+
+    Sans abonné, publish() ne fait rien; si les abonnés prennent trop de retard, les
+    événements en excès sont perdus (compteur `dropped`) plutôt que de ralentir le suivi
+    des encodages.
+    """
+
+    def __init__(self, max_pending=MAX_PENDING_EVENTS):
+        self._queue = queue.Queue(max_pending)
+        self._subscribers = []
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def subscribe(self, callback):
+        """
+        Abonne `callback(event)`; les événements sont des dictionnaires avec "kind" et "time".
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, daemon=True)
+                self._thread.start()
+
+    def publish(self, kind, **fields):
+        if not self._subscribers:
+            return
+        try:
+            self._queue.put_nowait({"kind": kind, "time": time.monotonic(), **fields})
+        except queue.Full:
+            self.dropped += 1
+
+    def _dispatch(self):
+        while True:
+            event = self._queue.get()
+            for callback in list(self._subscribers):
+                try:
+                    callback(event)
+                except Exception as e:
+                    logging.error(f"Erreur d'un abonné au bus d'événements: {e}")
+
+# Bus shared by the runners of the process
+BUS = EventBus()
+
+def publish(kind, **fields):
+    BUS.publish(kind, **fields)
+
+class Histogram:
+    """
+    Histogramme cumulatif au format OpenMetrics (seaux `le`, somme et nombre d'observations).
+    """
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for k, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[k] += 1
+
+class SweepState:
+    """
+    État courant d'un balayage reconstruit à partir des événements du bus:
+      - "planned" (jobs): jobs ajoutés au plan (premier tour puis tours adaptatifs);
+      - "job_started" (job, acceleration, device, cpus): job lancé;
+      - "progress" (job, fps, speed, frame, out_time_s): échantillon de `ffmpeg -progress`;
+      - "job_finished" (job, acceleration, device, rtime_s, fps, aborted): job terminé (ou échoué).
+    Lu par le tableau de bord et l'export OpenMetrics via snapshot().
+    """
+
+    def __init__(self, bus=BUS):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.planned = 0
+        self.finished = 0
+        self.failed = 0
+        self.aborted = 0
+        self.running = {}
+        self.completed_by_acceleration = {}
+        self.rtime = {}
+        self.fps = {}
+        bus.subscribe(self.handle)
+
+    def handle(self, event):
+        kind = event["kind"]
+        with self._lock:
+            if kind == "planned":
+                self.planned += event["jobs"]
+            elif kind == "job_started":
+                self.running[event["job"]] = {
+                    "acceleration": event.get("acceleration"),
+                    "device": event.get("device"),
+                    "cpus": event.get("cpus"),
+                    "started": event["time"],
+                    "fps": 0.0,
+                    "speed": 0.0,
+                    "frame": 0
+                }
+            elif kind == "progress" and event["job"] in self.running:
+                self.running[event["job"]].update(fps=event["fps"], speed=event["speed"], frame=event["frame"])
+            elif kind == "job_finished":
+                self.running.pop(event["job"], None)
+                self.finished += 1
+                acceleration = event.get("acceleration") or ""
+                if event.get("rtime_s") is None:
+                    self.failed += 1
+                    return
+                if event.get("aborted"):
+                    self.aborted += 1
+                    return
+                self.completed_by_acceleration[acceleration] = self.completed_by_acceleration.get(acceleration, 0) + 1
+                self.rtime.setdefault(acceleration, Histogram(RTIME_BUCKETS_S)).observe(event["rtime_s"])
+                if event.get("fps"):
+                    self.fps.setdefault(acceleration, Histogram(FPS_BUCKETS)).observe(event["fps"])
+
+    def snapshot(self):
+        """
+        Copie cohérente de l'état, avec l'estimation du temps restant (eta_s, None avant le premier job).
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            remaining = max(0, self.planned - self.finished)
+            return {
+                "elapsed_s": elapsed,
+                "planned": self.planned,
+                "finished": self.finished,
+                "failed": self.failed,
+                "aborted": self.aborted,
+                "remaining": remaining,
+                # Jobs finish at the sweep's observed rate, whatever its concurrency
+                "eta_s": elapsed / self.finished * remaining if self.finished else None,
+                "running": {job: dict(info) for job, info in self.running.items()},
+                "completed_by_acceleration": dict(self.completed_by_acceleration),
+                "rtime": {a: (list(h.buckets), list(h.counts), h.count, h.sum) for a, h in self.rtime.items()},
+                "fps": {a: (list(h.buckets), list(h.counts), h.count, h.sum) for a, h in self.fps.items()}
+            }
@@ -0,0 +1,150 @@
+import os
+import csv
+import logging
+from config import PRESETS, BITRATES
+from progress import run_ffmpeg, extract_metrics
+from software_transcode import build_software_command, build_software_encoder_args
+from hardware_transcode import build_hardware_command, build_hardware_device_args, build_hardware_encoder_args
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+FANOUT_FIELDS = [
+    "source",
+    "codec",
+    "acceleration",
+    "device",
+    "mode",
+    "preset",
+    "bitrate",
+    "iteration",
+    "outputs",
+    "utime_s",
+    "rtime_s",
+    "maxrss_kb",
+    "encode_utime_s",
+    "encode_rtime_s"
+]
+
+def build_decode_command(source):
+    """
+    Décodage seul de `source` vers le muxer null: sert de référence à soustraire.
+    """
+    return [
+        "ffmpeg",
+        "-benchmark",
+        "-y", "-hide_banner",
+        "-i", source,
+        "-f", "null", "-"
+    ]
+
+def build_fanout_command(source, codec, outputs, acceleration="software", gpu="renderD128"):
+    """
+    Une seule commande ffmpeg qui décode `source` une fois et alimente un encodeur par sortie.
+    `outputs` est une liste de tuples (preset, bitrate, target).
+    """
+    cmd = [
+        "ffmpeg",
+        "-benchmark",
+        "-y", "-hide_banner",
+        "-i", source
+    ]
+    if acceleration == "vaapi":
+        cmd += build_hardware_device_args(gpu)
+    for preset, bitrate, target in outputs:
+        if acceleration == "vaapi":
+            cmd += build_hardware_encoder_args(codec, bitrate, preset)
+        else:
+            cmd += build_software_encoder_args(codec, bitrate, preset)
+        cmd.append(target)
+    return cmd
+
+def _run(cmd, cpus=None):
+    logging.info(f"Exécution de la commande: {' '.join(cmd)}")
+    return extract_metrics(run_ffmpeg(cmd, cpus).stderr)
+
+def _remove(targets):
+    for target_file in targets:
+        if os.path.exists(target_file):
+            os.remove(target_file)
+
+def transcode_fanout(source, codec, acceleration="software", iteration_count=1, gpu="renderD128"):
+    """
+    Compare, pour un même source, la chaîne de production "décoder une fois, encoder N fois"
+    aux encodages indépendants de chaque configuration.
+
+    Pour chaque itération on mesure:
+      - un décodage seul (mode "decode"), soustrait ensuite des autres mesures;
+      - chaque configuration preset x bitrate seule (mode "single");
+      - toutes les configurations dans une seule commande multi-sorties (mode "fanout").
+    Les colonnes encode_utime_s / encode_rtime_s donnent le coût d'encodage seul.
+    """
+    os.makedirs("transcoded_outputs", exist_ok=True)
+    base = os.path.basename(source).replace('.mp4', '')
+    configs = [(preset, bitrate) for preset in PRESETS for bitrate in BITRATES]
+    results = []
+
+    def row(mode, i, metrics, decode, preset="", bitrate="", outputs=1):
+        return {
+            "source": source,
+            "codec": codec,
+            "acceleration": acceleration,
+            "device": gpu if acceleration == "vaapi" else "",
+            "mode": mode,
+            "preset": preset,
+            "bitrate": bitrate,
+            "iteration": i + 1,
+            "outputs": outputs,
+            "utime_s": metrics['utime_s'],
+            "rtime_s": metrics['rtime_s'],
+            "maxrss_kb": metrics['maxrss_kb'],
+            "encode_utime_s": round(metrics['utime_s'] - decode['utime_s'], 3),
+            "encode_rtime_s": round(metrics['rtime_s'] - decode['rtime_s'], 3)
+        }
+
+    for i in range(iteration_count):
+        decode = _run(build_decode_command(source))
+        results.append(row("decode", i, decode, decode, outputs=0))
+
+        for preset, bitrate in configs:
+            target_file = f"transcoded_outputs/{base}_{codec}_{bitrate}_{preset}_{i}.mp4"
+            if acceleration == "vaapi":
+                cmd = build_hardware_command(source, target_file, codec, bitrate, preset, gpu)
+            else:
+                cmd = build_software_command(source, target_file, codec, bitrate, preset)
+            try:
+                results.append(row("single", i, _run(cmd), decode, preset, bitrate))
+            finally:
+                _remove([target_file])
+
+        outputs = [
+            (preset, bitrate, f"transcoded_outputs/{base}_{codec}_{bitrate}_{preset}_{i}_fanout.mp4")
+            for preset, bitrate in configs
+        ]
+        try:
+            fanout = _run(build_fanout_command(source, codec, outputs, acceleration, gpu))
+            results.append(row("fanout", i, fanout, decode, outputs=len(outputs)))
+        finally:
+            _remove([target for _, _, target in outputs])
+
+        singles = [r for r in results if r["mode"] == "single" and r["iteration"] == i + 1]
+        single_encode = sum(r["encode_utime_s"] for r in singles)
+        logging.info(
+            f"Terminé: {source} itération {i + 1} - "
+            f"décodage seul utime_s={decode['utime_s']:.2f}, "
+            f"somme des encodages seuls utime_s={single_encode:.2f}, "
+            f"multi-sorties utime_s={fanout['utime_s']:.2f} "
+            f"(économie {sum(r['utime_s'] for r in singles) - fanout['utime_s']:.2f}s CPU)"
+        )
+
+    return results
+
+def write_fanout_results(results, csv_file="fanout_results.csv"):
+    """
+    Enregistre la table des mesures décodage unique / multi-sorties.
+    """
+    with open(csv_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FANOUT_FIELDS)
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+    logging.info(f"Les résultats multi-sorties sont enregistrés dans : {csv_file}")
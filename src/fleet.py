@@ -0,0 +1,408 @@
+import json
+import time
+import socket
+import logging
+import threading
+import urllib.error
+import urllib.request
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from config import PRESETS, BITRATES, download_videos
+from engine import Engine, SweepTask, BACKENDS
+from journal import JOB_KEY_FIELDS
+from results_store import save_run
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_PORT = 8470
+
+# A worker silent for this long (no lease, heartbeat or result) is lost: its jobs go back to the queue
+DEFAULT_LEASE_TIMEOUT_S = 60.0
+
+# Seconds a worker waits before asking again when no job is available for it yet
+IDLE_RETRY_S = 2.0
+
+def expand_fleet_jobs(videos, accelerations, sinks=("file",), iteration_count=1):
+    """
+    Jobs du balayage preset x bitrate x puits de sortie de chaque source pour chaque accélération
+    (backend de engine.BACKENDS), dans l'ordre où ils seront distribués.
+    """
+    return [
+        {
+            "video": video,
+            "source": video["file"],
+            "codec": video["codec"],
+            "acceleration": acceleration,
+            "preset": preset,
+            "bitrate": bitrate,
+            "sink": sink,
+            "iteration": i + 1
+        }
+        for video in videos
+        for acceleration in accelerations
+        for preset in PRESETS
+        for bitrate in BITRATES
+        for sink in sinks
+        for i in range(iteration_count)
+    ]
+
+def can_run(worker, job):
+    """
+    Un worker ne reçoit que les jobs de ses capacités (vaapi_detect.get_encoding_capabilities):
+    encodage matériel du codec et au moins un GPU pour les backends GPU, décodage matériel en plus
+    pour vaapi_hwaccel.
+    """
+    if BACKENDS[job["acceleration"]]["resource"] != "gpu":
+        return True
+    capabilities = worker["capabilities"]
+    if not (worker["gpus"] and capabilities.get(f"{job['codec']}_encode")):
+        return False
+    return job["acceleration"] != "vaapi_hwaccel" or bool(capabilities.get(f"{job['codec']}_decode"))
+
+class Coordinator:
+    """
+    État du coordinateur d'un balayage distribué: file des jobs, baux en cours et workers connus.
+
+    Chaque job est confié (bail) à un worker capable de l'exécuter. Un worker silencieux pendant
+    `lease_timeout` secondes est considéré perdu et ses jobs sont remis en tête de file.
+    Sans `replicate`, chaque job est exécuté une fois sur l'un des hôtes de la flotte; avec
+    `replicate`, chaque hôte reçoit sa propre copie de tous les jobs (comparaison des hôtes): les
+    jobs d'un worker perdu ne reviennent qu'aux workers du même hôte (dont ce worker, s'il se
+    réinscrit), une mesure prise ailleurs ne décrivant pas cet hôte. Sans worker restant sur
+    l'hôte, ils sont signalés non exécutables à la fin du balayage.
+    Le balayage se termine quand au moins `expected_hosts` hôtes se sont inscrits et qu'il ne
+    reste ni bail en cours ni job exécutable par un worker connu; si tous les workers sont perdus,
+    les jobs restants attendent leur réinscription.
+    Les résultats, marqués de la colonne "host", sont enregistrés dans `journal`: les jobs déjà
+    terminés d'un journal repris ne sont pas redistribués.
+    """
+
+    def __init__(self, jobs, journal, lease_timeout=DEFAULT_LEASE_TIMEOUT_S, replicate=False, expected_hosts=1):
+        self.jobs = list(jobs)
+        self.journal = journal
+        self.lease_timeout = lease_timeout
+        self.replicate = replicate
+        self.expected_hosts = expected_hosts
+        self.workers = {}
+        self.leases = {}
+        self.done = set()
+        self.pools = {}
+        self.hosts = set()
+        self.finished = threading.Event()
+        self._lock = threading.Lock()
+        self._next_worker = 0
+        if not replicate:
+            self.pools[None] = self._pool(None)
+
+    def _job_id(self, pool, index):
+        return f"{pool}#{index}" if pool is not None else f"#{index}"
+
+    def _pool(self, host):
+        # The key of a replicated job includes the host running it
+        fields = JOB_KEY_FIELDS if host is not None else [field for field in JOB_KEY_FIELDS if field != "host"]
+        completed = self.journal.completed_keys(fields)
+        pending = deque()
+        for index, job in enumerate(self.jobs):
+            job = {**job, "id": self._job_id(host, index), "host": host}
+            if tuple(job.get(field) for field in fields) in completed:
+                self.done.add(job["id"])
+            else:
+                pending.append(job)
+        if len(pending) < len(self.jobs):
+            logging.info(f"{len(self.jobs) - len(pending)} job(s) déjà terminé(s) ignoré(s){f' pour {host}' if host else ''}")
+        return pending
+
+    def register(self, host, capabilities, gpus, fingerprint=None):
+        with self._lock:
+            self._next_worker += 1
+            worker_id = f"{host}-{self._next_worker}"
+            self.workers[worker_id] = {
+                "host": host,
+                "capabilities": capabilities,
+                "gpus": gpus,
+                "fingerprint": fingerprint or {},
+                "last_seen": time.monotonic()
+            }
+            self.hosts.add(host)
+            if self.replicate and host not in self.pools:
+                self.pools[host] = self._pool(host)
+        logging.info(f"Worker {worker_id} inscrit: GPU {', '.join(gpus) or 'aucun'}, "
+                     f"capacités {', '.join(k for k, v in capabilities.items() if v) or 'aucune'}")
+        return worker_id
+
+    def _touch(self, worker_id):
+        worker = self.workers.get(worker_id)
+        if worker is None:
+            raise KeyError(worker_id)
+        worker["last_seen"] = time.monotonic()
+        return worker
+
+    def heartbeat(self, worker_id):
+        with self._lock:
+            self._touch(worker_id)
+
+    def lease(self, worker_id):
+        """
+        Retourne le prochain job exécutable par le worker, ou None (voir `finished`).
+        """
+        with self._lock:
+            worker = self._touch(worker_id)
+            pending = self.pools.get(worker["host"] if self.replicate else None, ())
+            for job in pending:
+                if can_run(worker, job):
+                    pending.remove(job)
+                    self.leases[job["id"]] = (worker_id, job)
+                    logging.info(f"Job {job['id']} ({job['source']} {job['acceleration']} {job['preset']} "
+                                 f"{job['bitrate']} {job['sink']} n°{job['iteration']}) confié à {worker_id}")
+                    return job
+            self._check_finished()
+            return None
+
+    def complete(self, worker_id, job_id, result):
+        with self._lock:
+            worker = self._touch(worker_id)
+            lease = self.leases.pop(job_id, None)
+            if job_id in self.done:
+                logging.info(f"Résultat en double du job {job_id} ignoré ({worker_id})")
+                return
+            if lease is None:
+                # Requeued after the worker was presumed lost: the late result still counts
+                for pending in self.pools.values():
+                    for job in list(pending):
+                        if job["id"] == job_id:
+                            pending.remove(job)
+            self.done.add(job_id)
+            if result is not None:
+                result["host"] = worker["host"]
+                self.journal.record(result)
+            self._check_finished()
+
+    def fail(self, worker_id, job_id):
+        """
+        Job en échec sur un worker: il n'est pas relancé (le même job échouerait sur le même hôte).
+        """
+        with self._lock:
+            self._touch(worker_id)
+            self.leases.pop(job_id, None)
+            self.done.add(job_id)
+            self._check_finished()
+        logging.warning(f"Job {job_id} en échec sur {worker_id}")
+
+    def reap(self):
+        """
+        Remet en file les jobs des workers perdus et retire ces workers.
+        """
+        with self._lock:
+            deadline = time.monotonic() - self.lease_timeout
+            for worker_id, worker in list(self.workers.items()):
+                if worker["last_seen"] >= deadline:
+                    continue
+                del self.workers[worker_id]
+                lost = [job_id for job_id, (owner, _) in self.leases.items() if owner == worker_id]
+                for job_id in lost:
+                    _, job = self.leases.pop(job_id)
+                    self.pools[job["host"]].appendleft(job)
+                if lost:
+                    logging.warning(f"Worker {worker_id} perdu: {len(lost)} job(s) remis en file")
+            self._check_finished()
+
+    def _check_finished(self):
+        if self.finished.is_set() or self.leases or len(self.hosts) < self.expected_hosts:
+            return
+        if not self.workers and any(self.pools.values()):
+            # Every worker was lost: wait for them to register again rather than drop their jobs
+            return
+        runnable = any(
+            can_run(worker, job)
+            for worker in self.workers.values()
+            for job in self.pools.get(worker["host"] if self.replicate else None, ())
+        )
+        if runnable:
+            return
+        unrunnable = sum(len(pending) for pending in self.pools.values())
+        if unrunnable:
+            logging.warning(f"{unrunnable} job(s) non exécutable(s) par les workers inscrits")
+        self.finished.set()
+
+def _handler(coordinator):
+    class FleetHandler(BaseHTTPRequestHandler):
+        """
+        Protocole JSON sur HTTP: POST /register, /lease, /heartbeat, /result.
+        """
+
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path == "/register":
+                    worker_id = coordinator.register(request["host"], request["capabilities"], request["gpus"],
+                                                     request.get("fingerprint"))
+                    self._reply(200, {"worker_id": worker_id, "lease_timeout": coordinator.lease_timeout})
+                elif self.path == "/lease":
+                    job = coordinator.lease(request["worker_id"])
+                    self._reply(200, {"job": job, "done": job is None and coordinator.finished.is_set()})
+                elif self.path == "/heartbeat":
+                    coordinator.heartbeat(request["worker_id"])
+                    self._reply(200, {})
+                elif self.path == "/result":
+                    if request.get("result") is None:
+                        coordinator.fail(request["worker_id"], request["job_id"])
+                    else:
+                        coordinator.complete(request["worker_id"], request["job_id"], request["result"])
+                    self._reply(200, {})
+                else:
+                    self._reply(404, {"error": f"chemin inconnu: {self.path}"})
+            except KeyError as e:
+                # Unknown worker (presumed lost): it must register again
+                self._reply(410, {"error": f"worker inconnu: {e}"})
+            except (ValueError, TypeError) as e:
+                self._reply(400, {"error": str(e)})
+
+    return FleetHandler
+
+def serve_coordinator(coordinator, bind="0.0.0.0", port=DEFAULT_PORT):
+    """
+    Sert le protocole de flotte jusqu'à la fin du balayage (ou Ctrl-C) puis arrête le serveur.
+    """
+    server = ThreadingHTTPServer((bind, port), _handler(coordinator))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logging.info(f"Coordinateur à l'écoute sur {bind}:{port}: {len(coordinator.jobs)} job(s) par "
+                 f"{'hôte' if coordinator.replicate else 'flotte'}, {coordinator.expected_hosts} hôte(s) attendu(s)")
+    try:
+        while not coordinator.finished.wait(max(1.0, coordinator.lease_timeout / 4)):
+            coordinator.reap()
+        # Let idle workers see `done` before the server goes away
+        time.sleep(IDLE_RETRY_S)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def save_fleet_run(results, label=None, db_path=None):
+    """
+    Enregistre les résultats d'un balayage distribué: une exécution par hôte, décrite par
+    l'empreinte d'environnement de ses résultats (environment.ENVIRONMENT_FIELDS).
+    """
+    by_host = {}
+    for result in results:
+        by_host.setdefault(result.get("host"), []).append(result)
+    run_ids = []
+    for host, rows in sorted(by_host.items(), key=lambda item: str(item[0])):
+        metadata = {
+            "label": label,
+            "host": host,
+            "ffmpeg_version": rows[0].get("ffmpeg_version"),
+            "driver": rows[0].get("driver"),
+            "kernel": rows[0].get("kernel")
+        }
+        run_ids.append(save_run(rows, metadata, **({"db_path": db_path} if db_path else {})))
+    return run_ids
+
+class WorkerClient:
+    """
+    Client du protocole de flotte, côté worker.
+    """
+
+    def __init__(self, url, timeout=30.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def post(self, path, payload):
+        request = urllib.request.Request(
+            self.url + path, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+def run_worker(url, capabilities, gpus, fingerprint=None, engine=None, max_retries=10):
+    """
+    Agent worker: s'inscrit auprès du coordinateur `url` avec ses capacités, exécute les jobs
+    reçus un par un avec `engine` (engine.Engine) et renvoie chaque résultat, jusqu'à la fin
+    du balayage. Un battement de cœur maintient les baux pendant les transcodages longs.
+    Après une erreur réseau, le worker réessaie (`max_retries` échecs consécutifs au plus) et se
+    réinscrit si le coordinateur l'a considéré perdu. Retourne le nombre de jobs exécutés.
+    """
+    client = WorkerClient(url)
+    engine = engine or Engine()
+    host = socket.gethostname()
+    registration = {"host": host, "capabilities": capabilities, "gpus": list(gpus), "fingerprint": fingerprint}
+    state = {"worker_id": None, "interval": DEFAULT_LEASE_TIMEOUT_S / 4}
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(state["interval"]):
+            if state["worker_id"] is not None:
+                try:
+                    client.post("/heartbeat", {"worker_id": state["worker_id"]})
+                except (urllib.error.URLError, OSError):
+                    pass
+
+    def register():
+        reply = client.post("/register", registration)
+        state["worker_id"] = reply["worker_id"]
+        state["interval"] = reply["lease_timeout"] / 4
+        logging.info(f"Inscrit auprès de {url} comme {state['worker_id']}")
+
+    heartbeat = threading.Thread(target=beat, daemon=True)
+    heartbeat.start()
+    executed = 0
+    failures = 0
+    try:
+        while True:
+            try:
+                if state["worker_id"] is None:
+                    register()
+                reply = client.post("/lease", {"worker_id": state["worker_id"]})
+                failures = 0
+            except urllib.error.HTTPError as e:
+                if e.code != 410:
+                    raise
+                logging.warning("Worker inconnu du coordinateur: nouvelle inscription")
+                state["worker_id"] = None
+                continue
+            except (urllib.error.URLError, OSError) as e:
+                failures += 1
+                if failures > max_retries:
+                    logging.error(f"Coordinateur injoignable ({e}): arrêt du worker")
+                    break
+                time.sleep(IDLE_RETRY_S * failures)
+                continue
+            if reply["done"]:
+                logging.info(f"Balayage terminé: {executed} job(s) exécuté(s) sur {host}")
+                break
+            job = reply["job"]
+            if job is None:
+                time.sleep(IDLE_RETRY_S)
+                continue
+            download_videos([job["video"]])
+            task = SweepTask(job["acceleration"], job["source"], job["codec"],
+                             tuple(gpus) if BACKENDS[job["acceleration"]]["resource"] == "gpu" else ())
+            result = engine.run_job(task, job["preset"], job["bitrate"], job["sink"], job["iteration"] - 1)
+            if result is not None and fingerprint:
+                result.update(fingerprint)
+            executed += 1
+            try:
+                try:
+                    client.post("/result", {"worker_id": state["worker_id"], "job_id": job["id"], "result": result})
+                except urllib.error.HTTPError as e:
+                    # Presumed lost meanwhile: the job was requeued, a late result still completes it
+                    if e.code != 410:
+                        raise
+                    register()
+                    client.post("/result", {"worker_id": state["worker_id"], "job_id": job["id"], "result": result})
+            except (urllib.error.URLError, OSError) as e:
+                logging.error(f"Résultat du job {job['id']} perdu: {e}")
+    finally:
+        stop.set()
+    return executed
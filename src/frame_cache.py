@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# tmpfs keeps the decoded frames in RAM: encoder runs never touch the disk nor the page cache of the source
+DEFAULT_CACHE_DIR = (
+    "/dev/shm/ffmpeg-benchmark-frames" if os.path.isdir("/dev/shm")
+    else os.path.join(tempfile.gettempdir(), "ffmpeg-benchmark-frames")
+)
+DEFAULT_CACHE_SIZE_GB = 8
+
+def file_checksum(path, chunk_size=1 << 20):
+    """
+    Calcule le SHA-256 du contenu de `path`.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def probe_video(source):
+    """
+    Retourne la largeur, la hauteur et la cadence (chaîne ffprobe, ex: "30/1") du premier flux vidéo.
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,avg_frame_rate",
+        "-of", "json",
+        source
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+    stream = json.loads(result.stdout)["streams"][0]
+    return int(stream["width"]), int(stream["height"]), stream["avg_frame_rate"]
+
+def raw_input_args(entry):
+    """
+    Options d'entrée ffmpeg lisant une entrée du cache à la place de la source compressée.
+    """
+    return [
+        "-f", "rawvideo",
+        "-pix_fmt", entry["pix_fmt"],
+        "-video_size", f"{entry['width']}x{entry['height']}",
+        "-framerate", entry["frame_rate"],
+        "-i", entry["path"]
+    ]
+
+class FrameCache:
+    """
+    Cache d'images décodées (YUV brut) pour mesurer les encodeurs sans démultiplexage ni décodage.
+
+    Chaque entrée est identifiée par le hash du contenu de la source, le format de pixel et la
+    résolution; elle est réutilisée d'une itération et d'une exécution à l'autre.
+    Le format de pixel est celui demandé par l'encodeur (get), sauf si `pix_fmt` l'impose.
+    Le cache est borné à `max_bytes`: les entrées les moins récemment utilisées sont évincées.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_SIZE_GB << 30, pix_fmt=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.pix_fmt = pix_fmt
+        self._lock = threading.Lock()
+        self._checksums = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _source_checksum(self, source):
+        # Hashing a large source is costly: remember it for as long as the file is unchanged
+        stat = os.stat(source)
+        key = (os.path.abspath(source), stat.st_size, stat.st_mtime_ns)
+        if key not in self._checksums:
+            self._checksums[key] = file_checksum(source)
+        return self._checksums[key]
+
+    def key(self, source, width, height, pix_fmt):
+        material = f"{self._source_checksum(source)}:{pix_fmt}:{width}x{height}"
+        return hashlib.sha256(material.encode()).hexdigest()[:24]
+
+    def get(self, source, pix_fmt="yuv420p"):
+        """
+        Retourne l'entrée du cache pour `source` au format `pix_fmt`, en la décodant si nécessaire.
+        L'entrée est un dictionnaire {path, pix_fmt, width, height, frame_rate, source}.
+        """
+        pix_fmt = self.pix_fmt or pix_fmt
+        with self._lock:
+            width, height, frame_rate = probe_video(source)
+            key = self.key(source, width, height, pix_fmt)
+            path = os.path.join(self.directory, f"{key}.yuv")
+            meta_path = os.path.join(self.directory, f"{key}.json")
+
+            if os.path.exists(path) and os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    entry = json.load(f)
+                # Refresh the LRU timestamp
+                os.utime(path)
+                logging.info(f"Cache d'images: {source} déjà décodé dans {path}")
+                return entry
+
+            entry = {
+                "path": path,
+                "pix_fmt": pix_fmt,
+                "width": width,
+                "height": height,
+                "frame_rate": frame_rate,
+                "source": source
+            }
+            self._decode(source, path, pix_fmt)
+            with open(meta_path, "w") as f:
+                json.dump(entry, f)
+            self._evict(keep=path)
+            return entry
+
+    def _decode(self, source, path, pix_fmt):
+        partial = f"{path}.partial"
+        cmd = [
+            "ffmpeg",
+            "-y", "-hide_banner", "-nostats",
+            "-i", source,
+            "-map", "0:v:0",
+            "-f", "rawvideo",
+            "-pix_fmt", pix_fmt,
+            partial
+        ]
+        logging.info(f"Cache d'images: décodage de {source}: {' '.join(cmd)}")
+        try:
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+        except subprocess.CalledProcessError as e:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise RuntimeError(f"Échec du décodage de {source} vers le cache: {e.stderr.strip()[-500:]}")
+        # Entries only appear once complete, so an interrupted decode is never reused
+        os.replace(partial, path)
+
+    def _evict(self, keep):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".yuv"):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            logging.info(f"Cache d'images: éviction de {path} ({size >> 20} Mo)")
+            os.remove(path)
+            meta_path = path[:-len(".yuv")] + ".json"
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            total -= size
+
+        if total > self.max_bytes:
+            logging.warning(
+                f"Cache d'images: {keep} dépasse à lui seul la taille maximale "
+                f"({total >> 20} Mo > {self.max_bytes >> 20} Mo)"
+            )
@@ -2,21 +2,23 @@ import subprocess
 import os
 import logging
 import re
-from config import PRESETS, BITRATES
+import csv
+from config import PRESETS
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def list_available_gpus():
+DRI_DIR = "/dev/dri"
+
+def list_available_gpus(dri_dir=DRI_DIR):
     """
     Lists all available GPU render devices.
-    Returns a list of device paths, e.g., ['/dev/dri/renderD128', '/dev/dri/renderD129']
+    Returns a sorted list of device paths, e.g., ['/dev/dri/renderD128', '/dev/dri/renderD129']
     """
-    dri_dir = "/dev/dri"
     try:
         devices = os.listdir(dri_dir)
-        render_devices = [os.path.join(dri_dir, dev) for dev in devices if re.match(r'renderD\d+', dev)]
+        render_devices = sorted(os.path.join(dri_dir, dev) for dev in devices if re.match(r'renderD\d+$', dev))
         if not render_devices:
-            logging.warning("Aucun GPU VAAPI trouvé dans /dev/dri.")
+            logging.warning(f"Aucun GPU VAAPI trouvé dans {dri_dir}.")
         else:
             logging.info(f"GPUs VAAPI disponibles: {', '.join(render_devices)}")
         return render_devices
@@ -26,7 +28,7 @@ def list_available_gpus():
 
 def check_available_gpus(gpus):
     """
-    Execute the command: ffmpeg -init_hw_device vaapi=foo:/dev/dri/{gpu}
+    Execute a one-frame null encode with: ffmpeg -init_hw_device vaapi=foo:/dev/dri/{gpu}
     Check if the selected GPU can be used for VAAPI hardware transcoding.
     Returns a list of usable GPUs.
     """
@@ -35,116 +37,125 @@ def check_available_gpus(gpus):
     for gpu in gpus:
         try:
             result = subprocess.run(
-                ["ffmpeg", "-init_hw_device", f"vaapi=foo:{gpu}"],
+                ["ffmpeg", "-hide_banner", "-init_hw_device", f"vaapi=foo:{device_path(gpu)}",
+                 "-f", "lavfi", "-i", "nullsrc", "-frames:v", "1", "-f", "null", "-"],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True
             )
             if result.returncode == 0:
-                logging.info(f"Hardware device at {gpu} cannot be used for hardware acceleration using VAAPI.")
+                logging.info(f"Hardware device at {gpu} can be used for hardware acceleration using VAAPI.")
                 usable_gpus.append(gpu)
             else:
-                logging.warning(f"Hardware device at {gpu} can be used for hardware acceleration using VAAPI.")
+                logging.warning(f"Hardware device at {gpu} cannot be used for hardware acceleration using VAAPI.")
         except Exception as e:
-            logging.error(f"There is no available devices for VAAPI hardware acceleration")
+            logging.error(f"Erreur lors du test de {gpu} pour l'accélération VAAPI: {e}")
 
     return usable_gpus
 
-def build_hardware_command(source, target, codec, bitrate, preset, gpu):
-    # (same as before)
+def device_path(gpu):
+    """
+    Chemin complet d'un nœud de rendu: "renderD128" -> "/dev/dri/renderD128"; un chemin est laissé tel quel.
+    """
+    return gpu if os.sep in gpu else os.path.join(DRI_DIR, gpu)
+
+def build_hardware_device_args(gpu):
+    """
+    Options globales initialisant le périphérique VAAPI utilisé par le filtre hwupload.
+    """
+    return [
+        "-init_hw_device", f"vaapi=hw:{device_path(gpu)}",
+        "-filter_hw_device", "hw"
+    ]
+
+def build_hardware_encoder_args(codec, bitrate, preset, upload=True):
+    """
+    Options d'encodage VAAPI d'une sortie, partagées par les commandes simples et multi-sorties.
+    Avec `upload`, les images décodées en mémoire système sont converties en NV12 puis envoyées
+    au GPU (hwupload); sans, elles doivent déjà être des surfaces VAAPI (décodage matériel).
+    """
     codec_map = {
         "h264": "h264_vaapi",
         "hevc": "hevc_vaapi"
     }
+    return [
+        *(["-vf", "format=nv12,hwupload"] if upload else []),
+        "-c:v", codec_map.get(codec, "h264_vaapi"),
+        "-preset", PRESETS[preset]["preset"],
+        "-crf", PRESETS[preset]["crf"],
+        "-b:v", bitrate
+    ]
+
+def build_hardware_command(source, target, codec, bitrate, preset, gpu, input_args=None):
+    """
+    Construit la commande de transcodage VAAPI.
+    `input_args` remplace l'entrée par défaut ["-i", source] (ex: entrée du cache d'images).
+    """
     cmd = [
         "ffmpeg",
         "-benchmark",
         "-y", "-hide_banner",
-        "-i", source,
-        "-init_hw_device", f"vaapi=hw:/dev/dri/{gpu}",
-        "-filter_hw_device", "hw",
-        "-vf", "format=nv12,hwupload",
-        "-c:v", codec_map.get(codec, "h264_vaapi"),
-        "-preset", PRESETS[preset]["preset"],
-        "-crf", PRESETS[preset]["crf"],
-        "-b:v", bitrate,
+        *(input_args or ["-i", source]),
+        *build_hardware_device_args(gpu),
+        *build_hardware_encoder_args(codec, bitrate, preset),
         target
     ]
     return cmd
 
-def extract_metrics(stderr):
-    # (same as before)
-    metrics = {
-        'utime_s': 0.0,
-        'rtime_s': 0.0,
-        'maxrss_kb': 0
-    }
-
-    bench_match = re.search(
-        r'bench:\s*utime=([\d\.]+)s\s*stime=([\d\.]+)s\s*rtime=([\d\.]+)s',
-        stderr
-    )
-    if bench_match:
-        try:
-            metrics['utime_s'] = float(bench_match.group(1))
-            metrics['rtime_s'] = float(bench_match.group(3))
-        except ValueError:
-            pass
-
-    rss_match = re.search(r'bench:\s*maxrss=(\d+)kB', stderr)
-    if rss_match:
-        try:
-            metrics['maxrss_kb'] = int(rss_match.group(1))
-        except ValueError:
-            pass
-
-    return metrics
-
-def transcode_hardware(source, codec, gpu = "renderD128", iteration_count=1):
+def build_hwaccel_command(source, target, codec, bitrate, preset, gpu):
     """
-    Effectue le transcodage matériel pour un codec donné (H.264 ou HEVC).
-    On répète chaque test 'iteration_count' fois.
+    Construit la commande du pipeline VAAPI complet: décodage matériel (-hwaccel vaapi) dont les
+    surfaces restent en mémoire GPU jusqu'à l'encodeur, sans conversion ni hwupload.
     """
-    results = []
-    os.makedirs("transcoded_outputs", exist_ok=True)
-
-    for preset in PRESETS:
-        for bitrate in BITRATES:
-            for i in range(iteration_count):
-                target_file = (
-                    f"transcoded_outputs/"
-                    f"{os.path.basename(source).replace('.mp4','')}_{codec}_{bitrate}_{preset}_{i}.mp4"
-                )
-                cmd = build_hardware_command(source, target_file, codec, bitrate, preset, gpu)
-                logging.info(f"Exécution de la commande: {' '.join(cmd)}")
-
-                try:
-                    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                    stdout, stderr = process.communicate()
-
-                    metrics = extract_metrics(stderr)
-
-                    results.append({
-                        "source": source,
-                        "codec": codec,
-                        "preset": preset,
-                        "bitrate": bitrate,
-                        "iteration": i + 1,
-                        "utime_s": metrics['utime_s'],
-                        "rtime_s": metrics['rtime_s'],
-                        "maxrss_kb": metrics['maxrss_kb']
-                    })
-
-                    logging.info(
-                        f"Terminé: {target_file} - "
-                        f"utime_s={metrics['utime_s']:.2f}, "
-                        f"rtime_s={metrics['rtime_s']:.2f}, "
-                        f"maxrss_kb={metrics['maxrss_kb']}"
-                    )
-                except Exception as e:
-                    logging.error(f"Exception lors du transcodage de {target_file}: {e}")
-
-                if os.path.exists(target_file):
-                    os.remove(target_file)
+    cmd = [
+        "ffmpeg",
+        "-benchmark",
+        "-y", "-hide_banner",
+        "-hwaccel", "vaapi",
+        "-hwaccel_device", device_path(gpu),
+        "-hwaccel_output_format", "vaapi",
+        "-i", source,
+        *build_hardware_encoder_args(codec, bitrate, preset, upload=False),
+        target
+    ]
+    return cmd
 
-    return results
+def gpu_throughput(results):
+    """
+    Débit de chaque GPU et débit total, en images encodées par seconde de temps réel.
+    Le temps d'un GPU va du début de son premier job à la fin de son dernier job
+    (voir les colonnes started_s / finished_s de scheduler.run_device_jobs).
+    Retourne une liste de dictionnaires {device, jobs, frames, wall_s, fps}, le total en dernier.
+    """
+    rows = []
+    by_device = {}
+    for result in results:
+        by_device.setdefault(result["device"], []).append(result)
+    groups = sorted(by_device.items()) + ([("total", results)] if results else [])
+    for device, group in groups:
+        wall = max(r["finished_s"] for r in group) - min(r["started_s"] for r in group)
+        frames = sum(r.get("frames", 0) for r in group)
+        rows.append({
+            "device": device,
+            "jobs": len(group),
+            "frames": frames,
+            "wall_s": round(wall, 3),
+            "fps": round(frames / wall, 2) if wall > 0 else 0.0
+        })
+    return rows
+
+def write_gpu_throughput(rows, csv_file="gpu_throughput_results.csv"):
+    """
+    Affiche et enregistre le débit de chaque GPU et le débit total.
+    """
+    for row in rows:
+        logging.info(
+            f"Débit {row['device']}: {row['fps']:.1f} images/s "
+            f"({row['jobs']} transcodages, {row['frames']} images en {row['wall_s']:.1f}s)"
+        )
+    with open(csv_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["device", "jobs", "frames", "wall_s", "fps"])
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+    logging.info(f"Le débit par GPU est enregistré dans : {csv_file}")
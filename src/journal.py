@@ -0,0 +1,140 @@
+import os
+import json
+import logging
+import threading
+from progress import ProgressSample
+from resource_sampler import ResourceSample
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+JOURNAL_FILE = "benchmark_journal.jsonl"
+
+# A job is done once a row with this key is in the journal
+# "host" tells apart the rows of the hosts of a distributed sweep (see fleet.py)
+JOB_KEY_FIELDS = ["source", "codec", "preset", "bitrate", "iteration", "acceleration", "sink", "host"]
+
+# Time series kept in the journal but dropped from the in-memory results once written
+SERIES_FIELDS = ["progress", "resources"]
+
+def job_key(result):
+    return tuple(result.get(field) for field in JOB_KEY_FIELDS)
+
+def _decode(row):
+    # JSON turns the namedtuples of the time series into plain lists
+    row["progress"] = [ProgressSample(*sample) for sample in row.get("progress") or []]
+    row["resources"] = [
+        ResourceSample(*sample[:-1], tuple(sample[-1])) for sample in row.get("resources") or []
+    ]
+    return row
+
+class JobJournal:
+    """
+    Journal des transcodages terminés, en ajout seul: une ligne JSON par résultat,
+    écrite et synchronisée sur disque (fsync) dès la fin du job.
+
+    Sans `resume`, un journal existant est vidé. Avec `resume`, ses lignes sont relues et
+    `completed_jobs()` permet aux runners de sauter les jobs déjà terminés; une dernière
+    ligne tronquée par un arrêt brutal est ignorée.
+    Seules les clés des jobs terminés restent en mémoire: les résultats sont relus dans le
+    fichier, sans séries temporelles par `completed_jobs()`, complets par `results()`.
+    `stamp` (ex: l'empreinte de environment.preflight) est ajouté à chaque nouveau résultat;
+    les résultats repris d'un journal existant gardent celui de leur exécution.
+    """
+
+    def __init__(self, path=JOURNAL_FILE, resume=False, stamp=None):
+        self.path = path
+        self.stamp = stamp or {}
+        self._lock = threading.Lock()
+        self._completed = set()
+        if resume and os.path.exists(path):
+            self._load()
+            logging.info(f"Reprise depuis {path}: {len(self._completed)} transcodage(s) déjà terminé(s)")
+        elif os.path.exists(path):
+            logging.warning(f"Journal existant {path} remplacé (utiliser --resume pour le reprendre)")
+            os.remove(path)
+        self._file = open(path, "a")
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        # Drop a partially written last line so that appended rows stay one per line
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            logging.warning(f"Dernière ligne incomplète ignorée dans {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+        for line in data[:end].decode().splitlines():
+            if not line.strip():
+                continue
+            self._completed.add(job_key(json.loads(line)))
+
+    def __len__(self):
+        return len(self._completed)
+
+    def record(self, result):
+        """
+        Ajoute un résultat au journal puis retire ses séries temporelles de la mémoire.
+        """
+        result.update(self.stamp)
+        line = json.dumps(result)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            for field in SERIES_FIELDS:
+                result.pop(field, None)
+            self._completed.add(job_key(result))
+
+    def _rows(self):
+        # Rows of the journal file in order; later rows of the same job replace earlier ones
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def completed_jobs(self, source, codec, acceleration):
+        """
+        Jobs déjà terminés pour un source, au format de scheduler.MatrixPlan:
+        {((preset, bitrate), i): résultat}, où i est l'indice d'itération (iteration - 1);
+        la configuration devient (preset, bitrate, sink) pour les résultats ayant un puits de sortie.
+        Les résultats sont relus dans le journal, sans leurs séries temporelles.
+        """
+        completed = {}
+        with self._lock:
+            self._file.flush()
+            for row in self._rows():
+                if (row["source"], row["codec"], row["acceleration"]) != (source, codec, acceleration):
+                    continue
+                for field in SERIES_FIELDS:
+                    row.pop(field, None)
+                config = (row["preset"], row["bitrate"]) + ((row["sink"],) if row.get("sink") else ())
+                completed[(config, row["iteration"] - 1)] = row
+        return completed
+
+    def completed_keys(self, fields=JOB_KEY_FIELDS):
+        """
+        Ensemble des valeurs de `fields` (parmi JOB_KEY_FIELDS) des jobs déjà terminés.
+        """
+        indexes = [JOB_KEY_FIELDS.index(field) for field in fields]
+        with self._lock:
+            return {tuple(key[i] for i in indexes) for key in self._completed}
+
+    def results(self):
+        """
+        Relit le journal ligne par ligne et génère les résultats complets.
+        Le dernier résultat enregistré pour un même job l'emporte.
+        """
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+        latest = {}
+        for offset, row in enumerate(self._rows()):
+            latest[job_key(row)] = offset
+        wanted = set(latest.values())
+        for offset, row in enumerate(self._rows()):
+            if offset in wanted:
+                yield _decode(row)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
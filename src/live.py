@@ -0,0 +1,224 @@
+import time
+import asyncio
+import logging
+from config import PRESETS
+from scheduler import pinned_command, pin_process
+from frame_cache import raw_input_args
+from hardware_transcode import build_hardware_device_args
+from progress import ProgressSample, FfmpegRun, StderrLog
+from engine import SweepTask, register_backend, supervise
+from result_stats import percentile
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Per-run live metrics added to the results next to utime_s / rtime_s
+LATENCY_FIELDS = [
+    "latency_p50_ms",
+    "latency_p99_ms",
+    "latency_max_ms",
+    "late_frames",
+    "dropped_frames",
+    "first_packet_ms"
+]
+
+# Bytes per pixel of the 8-bit 4:2:0 formats produced by the frame cache
+FRAME_BYTES_PER_PIXEL = {
+    "yuv420p": 1.5,
+    "nv12": 1.5
+}
+
+# Seconds between the progress samples derived from the received packets
+PROGRESS_PERIOD_S = 1.0
+
+def build_live_encoder_args(codec, bitrate, preset, acceleration="software", frame_rate=30):
+    """
+    Options d'encodage faible latence: pas de B-frames, GOP de 2 secondes, débit constant;
+    tune zerolatency pour libx264/libx265, low_power et async_depth 1 pour VAAPI.
+    """
+    gop = str(max(1, round(2 * frame_rate)))
+    if acceleration == "vaapi":
+        return [
+            "-vf", "format=nv12,hwupload",
+            "-c:v", {"h264": "h264_vaapi", "hevc": "hevc_vaapi"}.get(codec, "h264_vaapi"),
+            "-low_power", "1",
+            "-async_depth", "1",
+            "-rc_mode", "CBR",
+            "-bf", "0",
+            "-g", gop,
+            "-b:v", bitrate,
+            "-maxrate", bitrate
+        ]
+    return [
+        "-c:v", {"h264": "libx264", "hevc": "libx265"}.get(codec, "libx264"),
+        "-preset", PRESETS[preset]["preset"],
+        "-tune", "zerolatency",
+        "-bf", "0",
+        "-g", gop,
+        "-b:v", bitrate,
+        "-maxrate", bitrate,
+        "-bufsize", bitrate
+    ]
+
+def build_live_command(entry, codec, bitrate, preset, acceleration="software", gpu=None):
+    """
+    Commande ffmpeg lisant des images brutes sur stdin (cadencées par le harnais) et écrivant
+    une ligne framecrc par paquet encodé sur stdout, sans fichier de sortie.
+    """
+    frame_rate = _frame_rate(entry["frame_rate"])
+    cmd = [
+        "ffmpeg",
+        "-benchmark",
+        "-y", "-hide_banner", "-nostats",
+        *raw_input_args({**entry, "path": "pipe:0"})
+    ]
+    if acceleration == "vaapi":
+        cmd += build_hardware_device_args(gpu)
+    cmd += build_live_encoder_args(codec, bitrate, preset, acceleration, frame_rate)
+    cmd += ["-flush_packets", "1", "-f", "framecrc", "pipe:1"]
+    return cmd
+
+def _frame_rate(value):
+    # ffprobe rates look like "30000/1001"
+    numerator, _, denominator = str(value).partition("/")
+    return float(numerator) / float(denominator or 1)
+
+def latency_metrics(arrivals, schedule_start, frame_rate, frames_sent, late_frames):
+    """
+    Métriques de latence d'une exécution (LATENCY_FIELDS et nombre de paquets reçus): la latence du paquet n est son heure d'arrivée moins
+    l'heure prévue d'envoi de l'image n (sans B-frames, paquets et images sont dans le même ordre).
+    """
+    latencies = [
+        (arrival - (schedule_start + n / frame_rate)) * 1000
+        for n, arrival in enumerate(arrivals)
+    ]
+    return {
+        "frames": len(arrivals),
+        "latency_p50_ms": round(percentile(latencies, 50), 2),
+        "latency_p99_ms": round(percentile(latencies, 99), 2),
+        "latency_max_ms": round(max(latencies), 2) if latencies else 0.0,
+        "late_frames": late_frames,
+        "dropped_frames": max(0, frames_sent - len(arrivals)),
+        "first_packet_ms": round((arrivals[0] - schedule_start) * 1000, 2) if arrivals else None
+    }
+
+async def run_live_async(cmd, entry, cpus=None, timeout=None, sample_interval=None, stages=None, on_sample=None):
+    """
+    Exécute une commande live (run du backend, voir engine.register_backend): une tâche envoie
+    les images de l'entrée du cache à la cadence native de la source pendant que chaque paquet
+    framecrc reçu est horodaté.
+    Une image est en retard quand elle n'a pu être transmise qu'après plus d'un intervalle
+    d'image de retard sur son heure prévue (l'encodeur ne suit plus le temps réel).
+    ffmpeg est suivi par engine.supervise (délai `timeout`, arrêt du groupe de processus);
+    chaque seconde, un ProgressSample tiré des paquets reçus est passé à `on_sample`.
+    Retourne (FfmpegRun, métriques de latence); output_bytes est la taille des paquets encodés.
+    """
+    frame_rate = _frame_rate(entry["frame_rate"])
+    frame_size = int(entry["width"] * entry["height"] * FRAME_BYTES_PER_PIXEL[entry["pix_fmt"]])
+    process = await asyncio.create_subprocess_exec(
+        *pinned_command(cmd, cpus), stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE, start_new_session=True
+    )
+    pin_process(process.pid, cpus)
+    log = StderrLog(stages)
+
+    async def drain_stderr():
+        async for line in process.stderr:
+            log.feed(line.decode(errors="replace"))
+
+    fed = {"frames": 0, "late": 0}
+    schedule_start = time.monotonic()
+
+    async def feed():
+        interval = 1 / frame_rate
+        try:
+            with open(entry["path"], "rb") as f:
+                while True:
+                    frame = f.read(frame_size)
+                    if len(frame) < frame_size:
+                        break
+                    delay = schedule_start + fed["frames"] * interval - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    elif -delay > interval:
+                        fed["late"] += 1
+                    process.stdin.write(frame)
+                    await process.stdin.drain()
+                    fed["frames"] += 1
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            process.stdin.close()
+
+    arrivals = []
+    samples = []
+    received = {"bytes": 0}
+
+    def sample(now):
+        elapsed = now - schedule_start
+        out_time = len(arrivals) / frame_rate
+        point = ProgressSample(
+            elapsed_s=elapsed,
+            out_time_s=out_time,
+            frame=len(arrivals),
+            fps=len(arrivals) / elapsed if elapsed > 0 else 0.0,
+            bitrate_kbps=received["bytes"] * 8 / 1000 / out_time if out_time else 0.0,
+            speed=out_time / elapsed if elapsed > 0 else 0.0
+        )
+        samples.append(point)
+        if on_sample is not None:
+            on_sample(point)
+
+    async def follow_packets():
+        last = schedule_start
+        async for line in process.stdout:
+            # framecrc: "stream, dts, pts, duration, size, crc", one line per packet
+            fields = line.split(b",")
+            if line.startswith(b"#") or fields[0].strip() != b"0":
+                continue
+            now = time.monotonic()
+            arrivals.append(now)
+            if len(fields) > 4 and fields[4].strip().isdigit():
+                received["bytes"] += int(fields[4])
+            if now - last >= PROGRESS_PERIOD_S:
+                sample(now)
+                last = now
+        await process.wait()
+        if arrivals and (not samples or samples[-1].frame != len(arrivals)):
+            sample(arrivals[-1])
+
+    readers = [asyncio.create_task(drain_stderr()), asyncio.create_task(feed())]
+    timed_out, resources = await supervise(process, follow_packets(), readers, timeout, sample_interval)
+    if process.returncode != 0 and not timed_out:
+        logging.warning(f"ffmpeg a retourné {process.returncode}: {''.join(log.tail).strip()}")
+
+    latency = latency_metrics(arrivals, schedule_start, frame_rate, fed["frames"], fed["late"])
+    logging.info(
+        f"Latence (live): p50={latency['latency_p50_ms']:.1f}ms, p99={latency['latency_p99_ms']:.1f}ms, "
+        f"max={latency['latency_max_ms']:.1f}ms, premier paquet={latency['first_packet_ms']}ms, "
+        f"images en retard={latency['late_frames']}, perdues={latency['dropped_frames']}"
+    )
+    run = FfmpegRun(log.text(), samples, timed_out or process.returncode != 0, process.returncode, resources,
+                    received["bytes"])
+    return run, latency
+
+def _live_command(task, target, bitrate, preset, device, entry):
+    # The backend name is the acceleration label of the results: "software_live" or "vaapi_live"
+    acceleration = task.acceleration.rpartition("_")[0]
+    return build_live_command(entry, task.codec, bitrate, preset, acceleration, device)
+
+# Live results are labelled "<acceleration>_live"; adaptive iterations target the median latency
+register_backend("software_live", _live_command, raw_input="required", run=run_live_async,
+                 metric="latency_p50_ms")
+register_backend("vaapi_live", _live_command, resource="gpu", raw_input="required", run=run_live_async,
+                 metric="latency_p50_ms", pix_fmt="nv12")
+
+def live_tasks(videos, acceleration="software", gpus=()):
+    """
+    Tâches du moteur (engine.SweepTask) du benchmark live: chaque configuration preset x bitrate
+    encode le source décodé (cache d'images) reçu à sa cadence native, avec les réglages faible
+    latence. Les résultats ont l'accélération "<accélération>_live" et les colonnes LATENCY_FIELDS.
+    """
+    return [
+        SweepTask(f"{acceleration}_live", video["file"], video["codec"], tuple(gpus) if acceleration == "vaapi" else ())
+        for video in videos
+    ]
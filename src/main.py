@@ -1,13 +1,35 @@
 import os
+import sys
 import csv
 import logging
 import argparse
 import platform
-from config import download_videos, VIDEOS
+from config import download_videos, VIDEOS, PRESETS, BITRATES
 from vaapi_detect import get_encoding_capabilities
-from software_transcode import transcode_software
-from hardware_transcode import transcode_hardware
-from result_process import process_results
+from hardware_transcode import list_available_gpus, check_available_gpus, gpu_throughput, write_gpu_throughput, DRI_DIR
+from result_process import process_results, report_variants
+from throughput import run_throughput_benchmark, write_throughput_results, write_throughput_progress
+from progress import write_progress_series, STAGE_FIELDS
+from engine import Engine, run_sweep, SweepTask
+from quality import QualityPipeline, QUALITY_METRICS, QUALITY_FIELDS
+from fanout import transcode_fanout, write_fanout_results
+from chunked import transcode_chunked, write_chunked_results, DEFAULT_SEGMENT_S
+from frame_cache import FrameCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE_GB
+from resource_sampler import RESOURCE_FIELDS, write_resource_series
+from thread_scaling import run_thread_scaling, write_scaling_results
+from results_store import DEFAULT_DB, collect_run_metadata, save_run, compare_runs, report_comparison, load_history
+from journal import JobJournal, JOURNAL_FILE
+from report import write_report, DEFAULT_REPORT
+from matrix import (load_matrix, expand_jobs, job_encoder, vaapi_codec, available_encoders,
+                    matrix_task, plan_matrix, report_plan)
+from synthetic import synthetic_videos, RESOLUTIONS, MOTION_SOURCES, PIX_FMTS, DEFAULT_SYNTHETIC_DIR
+from live import live_tasks, LATENCY_FIELDS
+from output_sink import SINKS, FILE_SINKS, SINK_FIELDS
+from environment import preflight, ENVIRONMENT_FIELDS, DEFAULT_MAX_BUSY_PERCENT
+from fleet import Coordinator, expand_fleet_jobs, serve_coordinator, run_worker, save_fleet_run, DEFAULT_PORT, DEFAULT_LEASE_TIMEOUT_S
+from events import SweepState
+from dashboard import Dashboard, MetricsServer, DEFAULT_METRICS_PORT
+from capabilities import get_capability_matrix, devices_supporting, summarize_capabilities, DEFAULT_CACHE_FILE
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -20,82 +42,436 @@ def clear_console():
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Benchmark de Transcodage Vidéo avec FFmpeg")
 
-    # Mutually exclusive arguments for software/hardware
-    group = parser.add_mutually_exclusive_group()
-    group.add_argument('--software', action='store_true', help='Exécute uniquement le benchmark logiciel')
-    group.add_argument('--hardware', action='store_true', help='Exécute uniquement le benchmark matériel')
+    # Software and hardware sweeps, run together by the engine when both are given
+    parser.add_argument('--software', action='store_true', help='Exécute le benchmark logiciel (libx264/libx265)')
+    parser.add_argument('--hardware', action='store_true', help='Exécute le benchmark matériel (VAAPI)')
+    parser.add_argument('--hardware-pipeline', nargs='+', choices=['upload', 'hwaccel'], default=['upload'],
+                        help='Pipelines VAAPI mesurés: upload (décodage logiciel, format=nv12,hwupload) et/ou '
+                             'hwaccel (décodage matériel, images gardées en mémoire GPU) (défaut: upload)')
+    parser.add_argument('--job-timeout', type=float, default=None,
+                        help='Durée maximale (secondes) d’un transcodage avant l’arrêt de son groupe de processus')
+    parser.add_argument('--stage-timing', action='store_true',
+                        help='Décompose le temps de chaque transcodage en décodage, filtres, envoi GPU et encodage '
+                             '(-benchmark_all et filtres bench)')
 
     # New argument for iteration count
     parser.add_argument('--iteration-count', type=int, default=1,
                         help='Nombre d’itérations pour chaque test (défaut: 1)')
 
+    # Multi-GPU hardware sweeps
+    parser.add_argument('--gpus', nargs='+', default=None,
+                        help='Nœuds de rendu utilisés en mode matériel (défaut: tous les GPUs VAAPI utilisables)')
+    parser.add_argument('--sessions-per-gpu', type=int, default=1,
+                        help='Nombre d’encodages simultanés par GPU (défaut: 1)')
+    parser.add_argument('--dri-dir', default=DRI_DIR,
+                        help=f'Répertoire des nœuds de rendu DRM (défaut: {DRI_DIR})')
+
+    # Cached per-device VAAPI capability matrix (see capabilities.py)
+    parser.add_argument('--capabilities-cache', default=DEFAULT_CACHE_FILE,
+                        help=f'Cache des capacités VAAPI par nœud de rendu (défaut: {DEFAULT_CACHE_FILE})')
+    parser.add_argument('--refresh-capabilities', action='store_true',
+                        help='Ignore le cache et réinterroge chaque nœud de rendu (va_profile, puis vainfo)')
+
+    # Warmup and adaptive iteration (see scheduler.MatrixPlan)
+    parser.add_argument('--warmup', type=int, default=0,
+                        help='Nombre d’itérations d’échauffement exécutées puis écartées (défaut: 0)')
+    parser.add_argument('--target-ci', type=float, default=None,
+                        help='Relance une configuration tant que son IC95 de la médiane de rtime_s '
+                             'dépasse ce pourcentage (ex: 2 pour 2%%)')
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='Durée maximale (secondes) consacrée aux itérations adaptatives')
+
+    # Parallel scheduling of the preset x bitrate x iteration matrix
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Nombre de transcodages exécutés en parallèle (défaut: 1)')
+    parser.add_argument('--isolate', action='store_true',
+                        help='Épingle chaque job sur un ensemble de cœurs dédié (taskset)')
+
+    # Early abort of runs that fall below a speed threshold (read from -progress)
+    parser.add_argument('--min-speed', type=float, default=None,
+                        help='Interrompt un transcodage dont la vitesse passe sous ce seuil (ex: 0.5 pour 0.5x)')
+
+    # Per-process resource sampling from /proc
+    parser.add_argument('--sample-interval', type=float, default=None,
+                        help='Échantillonne CPU, threads, RSS, I/O et changements de contexte de ffmpeg '
+                             'toutes les N secondes (ex: 0.5)')
+
+    # Optional quality stage scoring each output against its source
+    parser.add_argument('--quality', nargs='+', choices=QUALITY_METRICS, default=None,
+                        help='Mesure la qualité de chaque sortie (vmaf, psnr, ssim) en parallèle des encodages')
+    parser.add_argument('--quality-subsample', type=int, default=1,
+                        help='Ne compare qu’une image sur N lors de la mesure de qualité (défaut: 1)')
+
+    # Where the encoded outputs go (see output_sink.py)
+    parser.add_argument('--output-sink', nargs='+', choices=SINKS, default=['file'],
+                        help='Destination des sorties: file (disque), tmpfs (RAM), null (muxer null) ou '
+                             'pipe (pipe vidé et compté par le harnais); avec plusieurs puits, chaque '
+                             'configuration est mesurée pour chacun et le coût des E/S est comparé au puits null')
+
+    # Decoded-frame cache for encoder-only measurements
+    parser.add_argument('--frame-cache', action='store_true',
+                        help='Décode chaque source une fois en YUV brut (tmpfs) et mesure les encodeurs seuls')
+    parser.add_argument('--frame-cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'Répertoire du cache d’images décodées (défaut: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--frame-cache-size', type=float, default=DEFAULT_CACHE_SIZE_GB,
+                        help=f'Taille maximale du cache d’images en Go (défaut: {DEFAULT_CACHE_SIZE_GB})')
+    parser.add_argument('--frame-cache-pix-fmt', choices=['yuv420p', 'nv12'], default=None,
+                        help='Format de pixel imposé au cache (défaut: nv12 pour les jobs VAAPI, yuv420p pour les logiciels)')
+
+    # Segment-parallel (VOD chunked) encoding against a monolithic encode
+    parser.add_argument('--chunked', action='store_true',
+                        help='Encodage par segments: découpage aux images clés, encodage parallèle puis concat, '
+                             'comparé à l’encodage monolithique (logiciel par défaut, VAAPI avec --hardware)')
+    parser.add_argument('--segment-duration', type=float, default=DEFAULT_SEGMENT_S,
+                        help=f'Durée cible des segments en secondes (défaut: {DEFAULT_SEGMENT_S:g})')
+    parser.add_argument('--chunk-workers', type=int, default=4,
+                        help='Segments encodés simultanément en logiciel (défaut: 4)')
+
+    # Decode-once, encode-many ladder benchmark
+    parser.add_argument('--fanout', action='store_true',
+                        help='Décode chaque source une seule fois vers toutes les configurations '
+                             '(logiciel par défaut, VAAPI avec --hardware)')
+
+    # Thread-scaling sweep of the software encoders
+    parser.add_argument('--thread-scaling', action='store_true',
+                        help='Mesure le passage à l’échelle de libx264/libx265 de 1 à N threads (speedup, efficacité, Amdahl)')
+    parser.add_argument('--scaling-bitrate', choices=BITRATES, default='4M',
+                        help='Bitrate utilisé pour le passage à l’échelle (défaut: 4M)')
+    parser.add_argument('--max-threads', type=int, default=None,
+                        help='Nombre maximal de threads testés (défaut: nombre de cœurs disponibles)')
+    parser.add_argument('--sliced-threads', action='store_true',
+                        help='Utilise le mode sliced-threads de x264 pendant le passage à l’échelle')
+
+    # Throughput mode: how many concurrent real-time streams a host sustains
+    parser.add_argument('--throughput', action='store_true',
+                        help='Mesure le nombre de transcodages temps réel simultanés soutenables '
+                             '(logiciel par défaut, VAAPI avec --hardware)')
+    parser.add_argument('--throughput-preset', choices=list(PRESETS), default='medium',
+                        help='Preset utilisé en mode débit (défaut: medium)')
+    parser.add_argument('--throughput-bitrate', choices=BITRATES, default='4M',
+                        help='Bitrate utilisé en mode débit (défaut: 4M)')
+    parser.add_argument('--max-streams', type=int, default=None,
+                        help='Nombre maximal de flux simultanés en mode débit (défaut: 4 x nombre de cœurs)')
+    parser.add_argument('--realtime-fps', type=float, default=None,
+                        help='Cadence temps réel cible en mode débit (défaut: cadence native de la source)')
+
+    # Append-only journal of finished jobs, used to resume an interrupted sweep
+    parser.add_argument('--journal', default=JOURNAL_FILE,
+                        help=f'Journal des transcodages terminés, écrit au fil de l’eau (défaut: {JOURNAL_FILE})')
+    parser.add_argument('--resume', action='store_true',
+                        help='Reprend le balayage interrompu du journal sans relancer les transcodages terminés')
+
+    # Pre-flight host preparation and noise checks (see environment.py)
+    parser.add_argument('--numa-node', type=int, default=None,
+                        help='Épingle le benchmark sur les cœurs d’un nœud NUMA')
+    parser.add_argument('--drop-caches', action='store_true',
+                        help='Vide le cache de pages avant le benchmark (nécessite root)')
+    parser.add_argument('--idle-check', type=float, default=None, metavar='SECONDES',
+                        help='Mesure l’occupation de l’hôte pendant N secondes avant le benchmark')
+    parser.add_argument('--max-busy', type=float, default=DEFAULT_MAX_BUSY_PERCENT,
+                        help=f'Occupation en %% au-delà de laquelle l’hôte est bruité (défaut: {DEFAULT_MAX_BUSY_PERCENT:g})')
+    parser.add_argument('--strict-environment', action='store_true',
+                        help='Refuse de lancer le benchmark sur un hôte bruité (gouverneur, turbo, occupation)')
+
+    # Distributed sweep: a coordinator hands the preset x bitrate jobs to worker agents (see fleet.py)
+    parser.add_argument('--coordinator', action='store_true',
+                        help='Coordonne un balayage distribué (--software/--hardware) entre des workers')
+    parser.add_argument('--worker', default=None, metavar='URL',
+                        help='Agent worker: exécute les jobs du coordinateur URL (ex: http://hote:8470)')
+    parser.add_argument('--fleet-bind', default='0.0.0.0',
+                        help='Adresse d’écoute du coordinateur (défaut: 0.0.0.0)')
+    parser.add_argument('--fleet-port', type=int, default=DEFAULT_PORT,
+                        help=f'Port du coordinateur (défaut: {DEFAULT_PORT})')
+    parser.add_argument('--fleet-hosts', type=int, default=1,
+                        help='Nombre d’hôtes attendus avant que le balayage puisse se terminer (défaut: 1)')
+    parser.add_argument('--fleet-replicate', action='store_true',
+                        help='Chaque hôte exécute tous les jobs (comparaison des hôtes) au lieu de se les partager')
+    parser.add_argument('--lease-timeout', type=float, default=DEFAULT_LEASE_TIMEOUT_S,
+                        help=f'Secondes sans nouvelles d’un worker avant de redistribuer ses jobs '
+                             f'(défaut: {DEFAULT_LEASE_TIMEOUT_S:g})')
+
+    # Live monitoring of the sweep, both fed by the event bus (see events.py and dashboard.py)
+    parser.add_argument('--dashboard', action='store_true',
+                        help='Tableau de bord en terminal: jobs en cours (fps, vitesse), ETA du balayage, '
+                             'occupation des cœurs et des GPU')
+    parser.add_argument('--metrics-port', type=int, default=None, nargs='?', const=DEFAULT_METRICS_PORT,
+                        help=f'Expose les métriques du balayage au format OpenMetrics sur '
+                             f'http://127.0.0.1:PORT/metrics (défaut: {DEFAULT_METRICS_PORT})')
+
+    # Live (latency-oriented) mode fed at the native frame rate
+    parser.add_argument('--live', action='store_true',
+                        help='Benchmark live: images envoyées à la cadence native, réglages faible latence, '
+                             'latence par image p50/p99/max, images en retard/perdues, délai du premier paquet '
+                             '(logiciel par défaut, VAAPI avec --hardware)')
+
+    # Declarative benchmark matrix (see matrix.py and matrices/production_ladder.toml)
+    parser.add_argument('--matrix', default=None,
+                        help='Fichier de matrice TOML/YAML (axes, exclusions, gabarits d’arguments) '
+                             'remplaçant les presets et bitrates intégrés')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Avec --matrix: affiche le plan et la durée estimée d’après l’historique sans rien exécuter')
+
+    # Offline synthetic sources generated with lavfi (see synthetic.py)
+    parser.add_argument('--synthetic', action='store_true',
+                        help='Génère des sources synthétiques (lavfi) au lieu de télécharger les vidéos de test')
+    parser.add_argument('--synthetic-resolutions', nargs='+', default=['1080p'],
+                        help=f'Résolutions générées: {", ".join(RESOLUTIONS)} ou LxH (défaut: 1080p)')
+    parser.add_argument('--synthetic-duration', type=float, default=60,
+                        help='Durée des sources synthétiques en secondes (défaut: 60)')
+    parser.add_argument('--synthetic-fps', type=int, default=30,
+                        help='Cadence des sources synthétiques (défaut: 30)')
+    parser.add_argument('--synthetic-bit-depth', type=int, choices=sorted(PIX_FMTS), default=8,
+                        help='Profondeur de couleur des sources synthétiques (défaut: 8)')
+    parser.add_argument('--synthetic-motion', choices=list(MOTION_SOURCES), default='medium',
+                        help='Complexité de mouvement: low (testsrc2), medium (mandelbrot), high (bruit temporel)')
+    parser.add_argument('--synthetic-dir', default=DEFAULT_SYNTHETIC_DIR,
+                        help=f'Répertoire des sources synthétiques (défaut: {DEFAULT_SYNTHETIC_DIR})')
+
+    # Results store shared by every run (see results_store.py)
+    parser.add_argument('--db', default=DEFAULT_DB,
+                        help=f'Base SQLite conservant l’historique des exécutions (défaut: {DEFAULT_DB})')
+    parser.add_argument('--label', default=None,
+                        help='Label associé à cette exécution dans l’historique (ex: ffmpeg-7.0)')
+
+    # `compare` subcommand: diff a stored run against a baseline run
+    subparsers = parser.add_subparsers(dest='command')
+    compare = subparsers.add_parser('compare', help='Compare une exécution enregistrée à une exécution de référence')
+    compare.add_argument('--run', default='latest',
+                         help='Exécution comparée: identifiant, label, latest ou previous (défaut: latest)')
+    compare.add_argument('--baseline', default='previous',
+                         help='Exécution de référence: identifiant, label, latest ou previous (défaut: previous)')
+    compare.add_argument('--metric', default='rtime_s',
+                         help='Métrique comparée (défaut: rtime_s)')
+    compare.add_argument('--threshold', type=float, default=5.0,
+                         help='Écart en %% au-delà duquel une dégradation est une régression (défaut: 5)')
+
+    # `report` subcommand: cost-efficiency and Pareto report over stored runs (see report.py)
+    report = subparsers.add_parser('report', help='Rapport d’efficacité (coût, énergie, frontière de Pareto)')
+    report.add_argument('--run', nargs='+', default=None,
+                        help='Exécutions incluses: identifiants, labels, latest ou previous (défaut: toutes)')
+    report.add_argument('--output', default=DEFAULT_REPORT,
+                        help=f'Nom des fichiers produits, sans extension (défaut: {DEFAULT_REPORT})')
+    report.add_argument('--format', nargs='+', choices=['html', 'md'], default=['html', 'md'],
+                        help='Formats du rapport (défaut: html md)')
+    report.add_argument('--price-per-hour', type=float, default=None,
+                        help='Prix d’une heure de la machine, pour le coût par heure de contenu encodé')
+    report.add_argument('--quality-metric', choices=QUALITY_FIELDS, default='vmaf',
+                        help='Axe de qualité des frontières de Pareto, output_kbps à défaut de mesure (défaut: vmaf)')
+
     return parser.parse_args()
 
+def run_compare(args):
+    """
+    Sous-commande `compare`: retourne le code de sortie (1 en cas de régression).
+    """
+    try:
+        comparisons = compare_runs(args.run, args.baseline, args.metric, args.threshold / 100, args.db)
+    except ValueError as e:
+        logging.error(str(e))
+        return 2
+    regressions = report_comparison(comparisons, args.metric)
+    return 1 if regressions else 0
+
+def run_report(args):
+    """
+    Sous-commande `report`: retourne le code de sortie (2 si une exécution est introuvable).
+    """
+    try:
+        written = write_report(args.run, args.output, args.format, args.price_per_hour,
+                               args.quality_metric, args.db)
+    except ValueError as e:
+        logging.error(str(e))
+        return 2
+    return 0 if written else 1
+
 def main():
     args = parse_arguments()
+    if args.command == 'compare':
+        sys.exit(run_compare(args))
+    if args.command == 'report':
+        sys.exit(run_report(args))
+
     clear_console()
 
     logging.info("=== Benchmark de Transcodage Vidéo ===")
 
-    # Always detect CPU capabilities
-    logging.info("=== Détection des Capacités du CPU ===")
-    capabilities = get_encoding_capabilities()
+    # Always detect VAAPI capabilities, per render node when possible
+    logging.info("=== Détection des Capacités VAAPI ===")
+    matrices = get_capability_matrix(list_available_gpus(args.dri_dir), args.capabilities_cache,
+                                     refresh=args.refresh_capabilities)
+    for device, matrix in matrices.items():
+        logging.info(f"{device} ({matrix['driver'] or 'pilote inconnu'}, via {matrix['source']}):")
+        for codec, flags in sorted(matrix["codecs"].items()):
+            supported = [capability for capability, value in flags.items() if value]
+            logging.info(f"  {codec}: {', '.join(supported) if supported else 'Non'}")
+    capabilities = summarize_capabilities(matrices) if matrices else get_encoding_capabilities()
     logging.info("Capacités d'encodage/décodage détectées :")
     for key, value in capabilities.items():
         logging.info(f"  {key}: {'Oui' if value else 'Non'}")
 
     # If no arguments, just show capabilities and exit
-    if not (args.software or args.hardware):
+    if not (args.software or args.hardware or args.throughput or args.fanout or args.thread_scaling or args.matrix
+            or args.live or args.worker or args.chunked):
         logging.info("Aucun benchmark demandé. Fin du programme.")
         return
 
+    # Workers download the sources of their jobs themselves
+    if args.worker:
+        fingerprint = run_preflight(args)
+        stop_monitoring = start_monitoring(args)
+        try:
+            run_fleet_worker(args, capabilities, fingerprint)
+        finally:
+            stop_monitoring()
+        return
+
+    spec = None
+    if args.matrix:
+        try:
+            spec = load_matrix(args.matrix)
+        except (OSError, ValueError) as e:
+            logging.error(f"Matrice invalide {args.matrix}: {e}")
+            sys.exit(2)
+        if args.dry_run:
+            logging.info(f"=== Plan de la matrice {spec['name']} ===")
+            gpu_slots = len(args.gpus or list_available_gpus(args.dri_dir)) * args.sessions_per_gpu
+            rows, summary = plan_matrix(spec, load_history(args.db), iteration_count=args.iteration_count,
+                                        warmup=args.warmup, concurrency=args.jobs, gpu_slots=gpu_slots)
+            report_plan(rows, summary)
+            return
+
     # If we are doing either hardware or software, we need the sample videos
-    logging.info("=== Téléchargement des vidéos de test ===")
-    download_videos()
+    if args.synthetic:
+        logging.info("=== Génération des sources synthétiques ===")
+        videos = synthetic_videos(args.synthetic_resolutions, duration=args.synthetic_duration,
+                                  fps=args.synthetic_fps, bit_depth=args.synthetic_bit_depth,
+                                  motion=args.synthetic_motion, directory=args.synthetic_dir)
+        if spec:
+            spec["sources"] = videos
+    else:
+        logging.info("=== Téléchargement des vidéos de test ===")
+        videos = spec["sources"] if spec else VIDEOS
+        download_videos(videos)
 
-    all_results = []
+    # Pre-flight once the sources are ready, so that downloads do not count as background load
+    fingerprint = run_preflight(args)
 
-    # --software mode
-    if args.software:
-        logging.info("=== Début du Transcodage Logiciel ===")
-        for video in VIDEOS:
-            source = video["file"]
-            codec = video["codec"]
-            logging.info(f"--- Transcodage logiciel de {source} avec codec {codec} ---")
-
-            # Pass the iteration count to transcode_software
-            results = transcode_software(source, codec, iteration_count=args.iteration_count)
-            for entry in results:
-                entry["acceleration"] = "software"
-            all_results.extend(results)
-
-    # --hardware mode
-    elif args.hardware:
-        if not (capabilities.get("h264_encode") or capabilities.get("hevc_encode")):
-            logging.info("=== Encodage matériel non supporté sur ce système ===")
+    # --throughput mode replaces the preset/bitrate sweep
+    if args.throughput:
+        logging.info("=== Début du Mode Débit ===")
+        acceleration = "vaapi" if args.hardware else "software"
+        gpu = None
+        if args.hardware:
+            gpus = args.gpus or check_available_gpus(list_available_gpus(args.dri_dir))
+            if not gpus:
+                logging.warning("=== Aucun GPU VAAPI utilisable ===")
+                return
+            # Saturation is a per-device figure: every stream shares the first selected render node
+            gpu = gpus[0]
+        rows = run_throughput_benchmark(
+            videos, args.throughput_preset, args.throughput_bitrate, acceleration,
+            max_streams=args.max_streams, realtime_fps=args.realtime_fps, gpu=gpu
+        )
+        write_throughput_results(rows)
+        write_throughput_progress(rows)
+        logging.info("Benchmark terminé.")
+        return
+
+    # --thread-scaling mode writes its own results table
+    if args.thread_scaling:
+        logging.info("=== Début du Passage à l'Échelle des Threads ===")
+        rows = run_thread_scaling(videos, args.scaling_bitrate, iteration_count=args.iteration_count,
+                                  max_threads=args.max_threads, sliced_threads=args.sliced_threads)
+        write_scaling_results(rows)
+        logging.info("Benchmark terminé.")
+        return
+
+    # --fanout mode writes its own results table
+    if args.fanout:
+        logging.info("=== Début du Benchmark Multi-sorties ===")
+        acceleration = "vaapi" if args.hardware else "software"
+        gpu = None
+        if args.hardware:
+            gpus = args.gpus or check_available_gpus(list_available_gpus(args.dri_dir))
+            if not gpus:
+                logging.warning("=== Aucun GPU VAAPI utilisable ===")
+                return
+            # The single and fan-out encodes are compared on the same render node
+            gpu = gpus[0]
+        fanout_results = []
+        for video in videos:
+            logging.info(f"--- Décodage unique de {video['file']} vers {acceleration}{f' sur {gpu}' if gpu else ''} ---")
+            fanout_results.extend(
+                transcode_fanout(video["file"], video["codec"], acceleration, iteration_count=args.iteration_count,
+                                 gpu=gpu)
+            )
+        write_fanout_results(fanout_results)
+        logging.info("Benchmark terminé.")
+        return
+
+    # --chunked mode writes its own results table
+    if args.chunked:
+        logging.info("=== Début du Benchmark par Segments ===")
+        acceleration = "vaapi" if args.hardware else "software"
+        gpus = None
+        if args.hardware:
+            gpus = args.gpus or check_available_gpus(list_available_gpus(args.dri_dir))
+            if not gpus:
+                logging.warning("=== Aucun GPU VAAPI utilisable ===")
+                return
+        chunked_results = []
+        for video in videos:
+            logging.info(f"--- Encodage par segments de {video['file']} ({acceleration}) ---")
+            chunked_results.extend(
+                transcode_chunked(video["file"], video["codec"], acceleration, iteration_count=args.iteration_count,
+                                  workers=args.chunk_workers, gpus=gpus, sessions_per_gpu=args.sessions_per_gpu,
+                                  isolate=args.isolate, segment_s=args.segment_duration, quality=args.quality,
+                                  quality_subsample=args.quality_subsample)
+            )
+        write_chunked_results(chunked_results)
+        logging.info("Benchmark terminé.")
+        return
+
+    frame_cache = None
+    # The live mode feeds decoded frames, so it always goes through the frame cache
+    if args.frame_cache or args.live:
+        frame_cache = FrameCache(args.frame_cache_dir, int(args.frame_cache_size * (1 << 30)), args.frame_cache_pix_fmt)
+    stats_options = {
+        "warmup": args.warmup,
+        "target_ci": args.target_ci / 100 if args.target_ci else None,
+        "time_budget": args.time_budget,
+        "sample_interval": args.sample_interval
+    }
+    quality = None
+    if args.quality and not FILE_SINKS & set(args.output_sink):
+        logging.warning("Aucun puits de sortie n'écrit de fichier (file, tmpfs): mesure de qualité désactivée")
+    elif args.quality and args.coordinator:
+        logging.warning("Mesure de qualité non disponible en balayage distribué: les sorties restent sur les workers")
+    elif args.quality:
+        quality = QualityPipeline(args.quality, subsample=args.quality_subsample, workers=args.jobs)
+
+    # Results are streamed to the journal as each job finishes, then read back from it
+    # Fleet results carry the fingerprint of the worker that produced them
+    journal = JobJournal(args.journal, resume=args.resume, stamp=None if args.coordinator else fingerprint)
+    stop_monitoring = start_monitoring(args)
+    try:
+        if args.coordinator:
+            run_fleet_coordinator(args, videos, journal)
+        elif spec is not None:
+            run_matrix_sweep(args, spec, matrices, quality, stats_options, journal)
+        elif args.live:
+            run_live_sweep(args, videos, stats_options, frame_cache, journal)
         else:
-            logging.info("=== Début du Transcodage Matériel ===")
-            for video in VIDEOS:
-                source = video["file"]
-                codec = video["codec"]
-                # Check if hardware is supported for the given codec
-                if codec == "h264" and capabilities.get("h264_encode"):
-                    logging.info(f"--- Transcodage matériel de {source} avec codec {codec} ---")
-                    results = transcode_hardware(source, codec, iteration_count=args.iteration_count)
-                    for entry in results:
-                        entry["acceleration"] = "vaapi"
-                    all_results.extend(results)
-                elif codec == "hevc" and capabilities.get("hevc_encode"):
-                    logging.info(f"--- Transcodage matériel de {source} avec codec {codec} ---")
-                    results = transcode_hardware(source, codec, iteration_count=args.iteration_count)
-                    for entry in results:
-                        entry["acceleration"] = "vaapi"
-                    all_results.extend(results)
-                else:
-                    logging.info(f"--- Transcodage matériel de {source} avec codec {codec} ignoré (non supporté) ---")
+            run_sweeps(args, videos, capabilities, matrices, quality, frame_cache, stats_options, journal)
+    except KeyboardInterrupt:
+        logging.warning(f"Benchmark interrompu: relancer avec --resume pour reprendre depuis {args.journal}")
+        sys.exit(130)
+    finally:
+        stop_monitoring()
+        journal.close()
 
     # Save results to CSV
-    if not all_results:
+    if not len(journal):
         logging.warning("Aucun résultat de benchmark à enregistrer.")
     else:
         logging.info("=== Enregistrement des Résultats ===")
@@ -111,19 +487,244 @@ def main():
                     "utime_s",
                     "rtime_s",
                     "maxrss_kb",
-                    "acceleration"
-                ]
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                    "acceleration",
+                    "cpus",
+                    "device",
+                    "frames",
+                    "aborted",
+                    "energy_j"
+                ] + (QUALITY_FIELDS if args.quality else []) + (RESOURCE_FIELDS if args.sample_interval else [])
+                fieldnames += SINK_FIELDS + ENVIRONMENT_FIELDS + (["host"] if args.coordinator else [])
+                fieldnames += STAGE_FIELDS if args.stage_timing else []
+                fieldnames += LATENCY_FIELDS if args.live else []
+                writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
                 writer.writeheader()
-                for result in all_results:
+                for result in journal.results():
                     writer.writerow(result)
             logging.info(f"Les résultats de benchmark sont enregistrés dans : {csv_file}")
+            write_progress_series(journal.results())
+            if args.sample_interval:
+                write_resource_series(journal.results())
+            if args.coordinator:
+                save_fleet_run(journal.results(), args.label, args.db)
+            else:
+                save_run(journal.results(), collect_run_metadata(args.label), args.db)
         except Exception as e:
             logging.error(f"Erreur lors de l'écriture du fichier CSV : {e}")
 
         logging.info("=== Traitement des Résultats ===")
         process_results(csv_file)
+        if len(args.output_sink) > 1:
+            report_variants(csv_file, "sink", "null")
+        if args.hardware and len(args.hardware_pipeline) > 1:
+            # libx264/libx265 rows of a combined --software sweep are not VAAPI pipelines
+            report_variants(csv_file, "acceleration", "vaapi", variants=("vaapi_hwaccel",))
         logging.info("Benchmark terminé.")
 
+def run_preflight(args):
+    """
+    Préparation de l'hôte (voir environment.preflight); quitte avec le code 3 si elle échoue.
+    """
+    logging.info("=== Préparation de l'Environnement ===")
+    try:
+        return preflight(args.numa_node, args.drop_caches, args.idle_check, args.max_busy, args.strict_environment)
+    except (ValueError, RuntimeError) as e:
+        logging.error(str(e))
+        sys.exit(3)
+
+def start_monitoring(args):
+    """
+    Démarre le tableau de bord (--dashboard) et/ou l'export /metrics (--metrics-port), abonnés
+    au bus d'événements des runners; retourne la fonction qui les arrête.
+    """
+    if not (args.dashboard or args.metrics_port):
+        return lambda: None
+    state = SweepState()
+    running = []
+    if args.metrics_port:
+        try:
+            running.append(MetricsServer(state, args.metrics_port))
+        except OSError as e:
+            logging.error(f"Export des métriques impossible sur le port {args.metrics_port}: {e}")
+    if args.dashboard:
+        running.append(Dashboard(state))
+    for monitor in running:
+        monitor.start()
+
+    def stop():
+        for monitor in reversed(running):
+            monitor.stop()
+    return stop
+
+def run_fleet_coordinator(args, videos, journal):
+    """
+    Balayage distribué: les jobs logiciels et/ou matériels de `videos` sont confiés aux workers
+    qui s'inscrivent, leurs résultats enregistrés dans `journal` avec leur hôte.
+    """
+    if args.matrix or args.live or args.warmup or args.target_ci:
+        logging.warning("Balayage distribué: --matrix, --live, --warmup et --target-ci sont ignorés")
+    pipelines = {"upload": "vaapi", "hwaccel": "vaapi_hwaccel"}
+    accelerations = (["software"] if args.software else []) + (
+        [pipelines[pipeline] for pipeline in args.hardware_pipeline] if args.hardware else []
+    )
+    jobs = expand_fleet_jobs(videos, accelerations, args.output_sink, args.iteration_count)
+    coordinator = Coordinator(jobs, journal, lease_timeout=args.lease_timeout, replicate=args.fleet_replicate,
+                              expected_hosts=args.fleet_hosts)
+    logging.info("=== Début du Balayage Distribué ===")
+    serve_coordinator(coordinator, args.fleet_bind, args.fleet_port)
+
+def run_fleet_worker(args, capabilities, fingerprint):
+    """
+    Agent worker d'un balayage distribué: annonce les capacités VAAPI et les GPU utilisables de
+    l'hôte puis exécute les jobs reçus du coordinateur `args.worker`.
+    """
+    gpus = []
+    if capabilities.get("h264_encode") or capabilities.get("hevc_encode"):
+        gpus = args.gpus or check_available_gpus(list_available_gpus(args.dri_dir))
+    engine = Engine(isolate=args.isolate, timeout=args.job_timeout, min_speed=args.min_speed,
+                    sample_interval=args.sample_interval, stage_timing=args.stage_timing)
+    logging.info(f"=== Worker du Balayage Distribué ({args.worker}) ===")
+    try:
+        run_worker(args.worker, capabilities, gpus, fingerprint, engine)
+    except KeyboardInterrupt:
+        logging.warning("Worker interrompu: ses jobs seront redistribués par le coordinateur")
+        sys.exit(130)
+
+def run_sweeps(args, videos, capabilities, matrices, quality, frame_cache, stats_options, journal):
+    """
+    Balayages preset x bitrate logiciels et/ou matériels, exécutés ensemble par le moteur
+    (voir engine.run_sweep); chaque résultat est enregistré dans `journal`.
+    """
+    tasks = []
+    # --software mode
+    if args.software:
+        for video in videos:
+            tasks.append(SweepTask("software", video["file"], video["codec"], ()))
+
+    # --hardware mode, one task per pipeline
+    pipelines = {"upload": "vaapi", "hwaccel": "vaapi_hwaccel"}
+    if args.hardware:
+        if not (capabilities.get("h264_encode") or capabilities.get("hevc_encode")):
+            logging.info("=== Encodage matériel non supporté sur ce système ===")
+        else:
+            # Only render nodes announcing an encoder for one of the sample codecs are tested
+            candidates = [
+                device for device in list_available_gpus(args.dri_dir)
+                if not matrices or any(device in devices_supporting(matrices, video["codec"]) for video in videos)
+            ]
+            gpus = args.gpus or check_available_gpus(candidates)
+            if not gpus:
+                logging.warning("=== Aucun GPU VAAPI utilisable ===")
+            for video in videos if gpus else []:
+                source = video["file"]
+                codec = video["codec"]
+                # Skip the codec on render nodes whose matrix has no encoder for it, before any ffmpeg launch
+                codec_gpus = gpus
+                if matrices:
+                    supported = [os.path.basename(device) for device in devices_supporting(matrices, codec)]
+                    codec_gpus = [gpu for gpu in gpus if os.path.basename(gpu) in supported]
+                if not (capabilities.get(f"{codec}_encode") and codec_gpus):
+                    logging.info(f"--- Transcodage matériel de {source} avec codec {codec} ignoré (non supporté) ---")
+                    continue
+                for pipeline in args.hardware_pipeline:
+                    pipeline_gpus = codec_gpus
+                    # The full-GPU pipeline also needs a hardware decoder for the source codec
+                    if pipeline == "hwaccel" and matrices:
+                        decoders = [os.path.basename(device) for device in devices_supporting(matrices, codec, "decode")]
+                        pipeline_gpus = [gpu for gpu in codec_gpus if os.path.basename(gpu) in decoders]
+                    if pipeline_gpus:
+                        tasks.append(SweepTask(pipelines[pipeline], source, codec, tuple(pipeline_gpus)))
+                    else:
+                        logging.info(f"--- Pipeline {pipeline} ignoré pour {source}: décodage {codec} non supporté ---")
+
+    if tasks:
+        labels = sorted({task.acceleration for task in tasks})
+        logging.info(f"=== Début du Transcodage ({', '.join(labels)}): {len(tasks)} balayage(s) ===")
+        results = run_sweep(tasks, iteration_count=args.iteration_count, concurrency=args.jobs,
+                            isolate=args.isolate, sessions_per_gpu=args.sessions_per_gpu,
+                            timeout=args.job_timeout, min_speed=args.min_speed, quality=quality,
+                            frame_cache=frame_cache, journal=journal, sinks=args.output_sink,
+                            stage_timing=args.stage_timing, **stats_options)
+        hardware_results = [result for result in results if result.get("device")]
+        if hardware_results:
+            write_gpu_throughput(gpu_throughput(hardware_results))
+
+    # Wait for the last quality scores (and their journal entries) before saving
+    if quality is not None:
+        quality.shutdown()
+
+def run_live_sweep(args, videos, stats_options, frame_cache, journal):
+    """
+    Benchmark live de chaque vidéo (voir live.live_tasks), exécuté par le moteur.
+    Une seule session live à la fois (une par GPU en VAAPI): des sessions simultanées se
+    partageraient le budget temps réel.
+    """
+    acceleration = "vaapi" if args.hardware else "software"
+    gpus = ()
+    if acceleration == "vaapi":
+        gpus = args.gpus or check_available_gpus(list_available_gpus(args.dri_dir))
+        if not gpus:
+            logging.warning("=== Aucun GPU VAAPI utilisable ===")
+            return
+    logging.info(f"=== Début du Benchmark Live ({acceleration}) ===")
+    # The harness counts the encoded packets it receives on ffmpeg's stdout
+    run_sweep(live_tasks(videos, acceleration, gpus), iteration_count=args.iteration_count, concurrency=1,
+              isolate=args.isolate, sessions_per_gpu=1, timeout=args.job_timeout, frame_cache=frame_cache,
+              journal=journal, sinks=("pipe",), stage_timing=args.stage_timing, **stats_options)
+
+def run_matrix_sweep(args, spec, matrices, quality, stats_options, journal):
+    """
+    Exécute les jobs d'une matrice déclarative sur chacun de ses sources.
+    Les jobs dont l'encodeur n'est pas compilé dans ffmpeg, ou VAAPI sans GPU capable,
+    sont écartés avant tout lancement. --software / --hardware restreignent l'accélération.
+    """
+    encoders = available_encoders()
+    missing = set()
+    jobs = {}
+    wanted = {"software"} if args.software else set()
+    wanted |= {"vaapi"} if args.hardware else set()
+    for job in expand_jobs(spec):
+        if wanted and job.acceleration not in wanted:
+            continue
+        encoder = job_encoder(job)
+        if encoders is not None and encoder and encoder not in encoders:
+            missing.add(encoder)
+            continue
+        # VAAPI jobs are grouped by output codec since each codec may have its own GPUs
+        key = (job.acceleration, vaapi_codec(encoder) if job.acceleration == "vaapi" else None)
+        jobs.setdefault(key, []).append(job)
+    for encoder in sorted(missing):
+        logging.warning(f"--- Encodeur {encoder} absent de ffmpeg: jobs correspondants ignorés ---")
+
+    gpus = []
+    if any(acceleration == "vaapi" for acceleration, _ in jobs):
+        gpus = args.gpus or check_available_gpus(list_available_gpus(args.dri_dir))
+
+    logging.info(f"=== Début de la Matrice {spec['name']} ({sum(len(group) for group in jobs.values())} jobs) ===")
+    tasks = []
+    for (acceleration, codec), group in jobs.items():
+        group_gpus = gpus
+        if acceleration == "vaapi" and matrices and codec:
+            supported = [os.path.basename(device) for device in devices_supporting(matrices, codec)]
+            group_gpus = [gpu for gpu in gpus if os.path.basename(gpu) in supported]
+        if acceleration == "vaapi" and not group_gpus:
+            logging.info(f"--- {len(group)} job(s) VAAPI {codec or ''} ignoré(s) (aucun GPU capable) ---")
+            continue
+        for video in spec["sources"]:
+            logging.info(f"--- Matrice {acceleration} {codec or ''}: {len(group)} job(s) sur {video['file']} ---")
+            tasks.append(matrix_task(video["file"], video["codec"], group, acceleration, group_gpus))
+    # Software and VAAPI jobs run together, as in run_sweeps
+    results = run_sweep(tasks, iteration_count=args.iteration_count, concurrency=args.jobs, isolate=args.isolate,
+                        sessions_per_gpu=args.sessions_per_gpu, timeout=args.job_timeout, min_speed=args.min_speed,
+                        quality=quality, journal=journal, sinks=args.output_sink, stage_timing=args.stage_timing,
+                        **stats_options)
+    hardware_results = [result for result in results if result.get("device")]
+    if hardware_results:
+        write_gpu_throughput(gpu_throughput(hardware_results))
+
+    # Wait for the last quality scores (and their journal entries) before saving
+    if quality is not None:
+        quality.shutdown()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,304 @@
+import os
+import csv
+import logging
+import tomllib
+import itertools
+import statistics
+import subprocess
+from collections import namedtuple
+from config import VIDEOS
+from engine import SweepTask, register_backend
+from hardware_transcode import build_hardware_device_args
+
+try:
+    import yaml
+except ImportError:
+    # PyYAML is optional: only needed for .yaml/.yml matrix files
+    yaml = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Keys of an axis value that describe the command instead of being template parameters
+RESERVED_KEYS = {"name", "args", "filters", "acceleration"}
+
+# One expanded job of a matrix: `label` identifies it in the results (preset column)
+MatrixJob = namedtuple("MatrixJob", ["label", "params", "acceleration", "filters", "args"])
+
+PLAN_FIELDS = ["source", "job", "acceleration", "runs", "estimate_s", "basis"]
+
+def load_matrix(path):
+    """
+    Charge un fichier de matrice TOML (.toml) ou YAML (.yaml, .yml, nécessite PyYAML)
+    et le normalise (voir normalize_matrix).
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".toml":
+        with open(path, "rb") as f:
+            raw = tomllib.load(f)
+    elif extension in (".yaml", ".yml"):
+        if yaml is None:
+            raise ValueError(f"PyYAML n'est pas installé: impossible de lire {path} (utiliser un fichier .toml)")
+        with open(path) as f:
+            raw = yaml.safe_load(f)
+    else:
+        raise ValueError(f"Format de matrice non reconnu: {path} (attendu .toml, .yaml ou .yml)")
+    return normalize_matrix(raw)
+
+def _axis_values(axis, values):
+    # An axis is a list of scalars, a list of tables with a "name" key, or a table name -> parameters
+    if isinstance(values, dict):
+        return [(str(name), dict(params or {})) for name, params in values.items()]
+    normalized = []
+    for value in values:
+        if isinstance(value, dict):
+            if "name" not in value:
+                raise ValueError(f"Valeur sans nom dans l'axe {axis}: {value}")
+            normalized.append((str(value["name"]), {k: v for k, v in value.items() if k != "name"}))
+        else:
+            normalized.append((str(value), {}))
+    return normalized
+
+def normalize_matrix(raw):
+    """
+    Normalise une matrice lue depuis TOML/YAML:
+      {
+        "name": str,
+        "sources": [{"file", "codec", "url"?}],          # défaut: config.VIDEOS
+        "axes": [(axe, [(valeur, paramètres)])],          # dans l'ordre du fichier
+        "exclude": [{axe: {valeurs}}]
+      }
+    """
+    if not raw or not raw.get("axes"):
+        raise ValueError("La matrice doit définir au moins un axe ([axes])")
+    axes = [(axis, _axis_values(axis, values)) for axis, values in raw["axes"].items()]
+    for axis, values in axes:
+        if not values:
+            raise ValueError(f"L'axe {axis} n'a aucune valeur")
+    names = {axis for axis, _ in axes}
+    exclude = []
+    for rule in raw.get("exclude", []):
+        unknown = set(rule) - names
+        if unknown:
+            raise ValueError(f"Exclusion sur un axe inconnu: {', '.join(sorted(unknown))}")
+        exclude.append({
+            axis: {str(v) for v in (value if isinstance(value, list) else [value])}
+            for axis, value in rule.items()
+        })
+    return {
+        "name": raw.get("name", "matrix"),
+        "sources": raw.get("sources") or VIDEOS,
+        "axes": axes,
+        "exclude": exclude
+    }
+
+def _format(template, params, label):
+    try:
+        return str(template).format(**params)
+    except KeyError as e:
+        raise ValueError(f"Paramètre {e} inconnu dans le gabarit '{template}' ({label})")
+
+def _templates(value, encoder):
+    # `args` / `filters` are either a list, or a table of per-encoder lists with an optional "default"
+    if isinstance(value, dict):
+        return value.get(encoder, value.get("default"))
+    return value
+
+def expand_jobs(spec, skipped=None):
+    """
+    Génère paresseusement les jobs de la matrice (produit cartésien des axes, exclusions retirées).
+
+    Les paramètres d'un job sont le nom de la valeur retenue sur chaque axe ({axe: valeur})
+    complétés par les paramètres scalaires de ces valeurs; ils alimentent les gabarits
+    `args` et `filters` ("{bitrate}", "{gop}", ...). Un gabarit donné par encodeur (table
+    indexée par la valeur de l'axe "encoder") sans entrée pour l'encodeur du job rend le job
+    non applicable. `skipped` (dictionnaire) compte les jobs "exclus" et "non applicables".
+    """
+    skipped = skipped if skipped is not None else {}
+    names = [axis for axis, _ in spec["axes"]]
+    for combination in itertools.product(*(values for _, values in spec["axes"])):
+        chosen = {axis: value for axis, (value, _) in zip(names, combination)}
+        if any(all(chosen[axis] in values for axis, values in rule.items()) for rule in spec["exclude"]):
+            skipped["exclus"] = skipped.get("exclus", 0) + 1
+            continue
+
+        label = "/".join(chosen[axis] for axis in names)
+        params = dict(chosen)
+        for _, value_params in combination:
+            params.update({k: v for k, v in value_params.items() if k not in RESERVED_KEYS})
+
+        encoder = chosen.get("encoder")
+        acceleration = "software"
+        filters, args = [], []
+        applicable = True
+        for _, value_params in combination:
+            acceleration = value_params.get("acceleration", acceleration)
+            for key, target in (("filters", filters), ("args", args)):
+                if key not in value_params:
+                    continue
+                templates = _templates(value_params[key], encoder)
+                if templates is None:
+                    applicable = False
+                    break
+                target.extend(_format(template, params, label) for template in templates)
+        if not applicable:
+            skipped["non applicables"] = skipped.get("non applicables", 0) + 1
+            continue
+        yield MatrixJob(label, params, acceleration, filters, args)
+
+def job_encoder(job):
+    """
+    Encodeur ffmpeg d'un job, lu dans ses arguments (-c:v / -codec:v), ou None.
+    """
+    for option in ("-c:v", "-codec:v", "-vcodec"):
+        if option in job.args[:-1]:
+            return job.args[job.args.index(option) + 1]
+    return None
+
+def vaapi_codec(encoder):
+    """
+    Codec de la matrice de capacités VAAPI correspondant à un encodeur: "av1_vaapi" -> "av1".
+    """
+    return encoder[:-len("_vaapi")] if encoder and encoder.endswith("_vaapi") else None
+
+def available_encoders():
+    """
+    Encodeurs vidéo compilés dans ffmpeg (`ffmpeg -encoders`), ou None si la liste est illisible.
+    """
+    try:
+        result = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    except FileNotFoundError:
+        return None
+    encoders = set()
+    for line in result.stdout.split('\n'):
+        parts = line.split()
+        # Encoder lines look like " V....D libx264   libx264 H.264 / AVC ..."
+        if len(parts) >= 2 and len(parts[0]) == 6 and parts[0].startswith("V"):
+            encoders.add(parts[1])
+    return encoders or None
+
+def build_matrix_command(job, source, target, gpu=None):
+    """
+    Construit la commande ffmpeg d'un job de matrice: filtres du job en une seule chaîne -vf,
+    puis ses arguments. Les jobs VAAPI initialisent en plus le périphérique `gpu`.
+    """
+    cmd = [
+        "ffmpeg",
+        "-benchmark",
+        "-y", "-hide_banner",
+        "-i", source
+    ]
+    if job.acceleration == "vaapi":
+        cmd += build_hardware_device_args(gpu)
+    if job.filters:
+        cmd += ["-vf", ",".join(job.filters)]
+    cmd += job.args
+    cmd.append(target)
+    return cmd
+
+def matrix_config(job):
+    """
+    Configuration (preset, bitrate) d'un job de matrice dans les résultats: son étiquette et son
+    paramètre bitrate s'il en a un.
+    """
+    return job.label, str(job.params.get("bitrate", ""))
+
+def matrix_task(source, codec, jobs, acceleration="software", gpus=()):
+    """
+    Tâche du moteur (engine.SweepTask) exécutant les jobs de matrice `jobs`, tous de la même
+    accélération, sur un source. Les jobs VAAPI sont répartis sur `gpus`.
+    """
+    return SweepTask(acceleration, source, codec, tuple(gpus) if acceleration == "vaapi" else (),
+                     "matrix_vaapi" if acceleration == "vaapi" else "matrix",
+                     {matrix_config(job): job for job in jobs})
+
+def _matrix_command(task, target, bitrate, preset, device, entry):
+    job = task.jobs[(preset, bitrate)]
+    extension = job.params.get("extension", "mp4")
+    return build_matrix_command(job, task.source, f"{os.path.splitext(target)[0]}.{extension}", device)
+
+# Matrix jobs read the compressed source: their filters and arguments are written for it
+register_backend("matrix", _matrix_command, raw_input=False)
+register_backend("matrix_vaapi", _matrix_command, resource="gpu", raw_input=False)
+
+def estimate_job(history, source, codec, job, acceleration):
+    """
+    Durée estimée (rtime_s) d'une exécution d'un job d'après l'historique (results_store.load_history).
+    Retourne (secondes, base): médiane des mesures de ce job ("historique"), à défaut médiane
+    de toutes les mesures du même source et de la même accélération ("approximation"),
+    sinon (None, "inconnu").
+    """
+    exact = history.get((source, codec, *matrix_config(job), acceleration, "file"))
+    if exact:
+        return statistics.median(exact), "historique"
+    similar = [
+        value for (h_source, _, _, _, h_acceleration, _), values in history.items()
+        if h_source == source and h_acceleration == acceleration
+        for value in values
+    ]
+    if similar:
+        return statistics.median(similar), "approximation"
+    return None, "inconnu"
+
+def plan_matrix(spec, history, iteration_count=1, warmup=0, concurrency=1, gpu_slots=1):
+    """
+    Planifie une matrice sans rien exécuter: chaque job de chaque source est estimé d'après
+    l'historique et exécuté (warmup + iteration_count) fois. La durée totale tient compte
+    du parallélisme (`concurrency` jobs logiciels, `gpu_slots` sessions VAAPI simultanées).
+    Retourne (lignes du plan, résumé).
+    """
+    skipped = {}
+    rows = []
+    for source in spec["sources"]:
+        for job in expand_jobs(spec, skipped):
+            estimate, basis = estimate_job(history, source["file"], source["codec"], job, job.acceleration)
+            rows.append({
+                "source": source["file"],
+                "job": job.label,
+                "acceleration": job.acceleration,
+                "runs": warmup + iteration_count,
+                "estimate_s": round(estimate, 3) if estimate is not None else "",
+                "basis": basis
+            })
+
+    # Unknown jobs are counted at the median of the known ones, if any
+    known = [row["estimate_s"] for row in rows if row["basis"] != "inconnu"]
+    fallback = statistics.median(known) if known else 0.0
+    wall = 0.0
+    for acceleration, slots in (("software", concurrency), ("vaapi", gpu_slots)):
+        total = sum(
+            (row["estimate_s"] if row["basis"] != "inconnu" else fallback) * row["runs"]
+            for row in rows if row["acceleration"] == acceleration
+        )
+        wall += total / max(1, slots)
+    summary = {
+        "jobs": len(rows),
+        "runs": sum(row["runs"] for row in rows),
+        "excluded": skipped.get("exclus", 0) // max(1, len(spec["sources"])),
+        "not_applicable": skipped.get("non applicables", 0) // max(1, len(spec["sources"])),
+        "unknown": sum(1 for row in rows if row["basis"] == "inconnu"),
+        "estimated_wall_s": round(wall, 1)
+    }
+    return rows, summary
+
+def report_plan(rows, summary, csv_file="matrix_plan.csv"):
+    """
+    Affiche le plan d'une matrice (dry-run) et l'enregistre en CSV.
+    """
+    with open(csv_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=PLAN_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+    hours, remainder = divmod(int(summary["estimated_wall_s"]), 3600)
+    logging.info(
+        f"Plan: {summary['jobs']} job(s) ({summary['excluded']} exclu(s), "
+        f"{summary['not_applicable']} non applicable(s) par source), {summary['runs']} exécution(s), "
+        f"durée estimée {hours}h{remainder // 60:02d}m{remainder % 60:02d}s"
+    )
+    if summary["unknown"]:
+        logging.warning(
+            f"{summary['unknown']} job(s) sans historique: estimés à la médiane des autres jobs "
+            f"(lancer une première exécution pour affiner)"
+        )
+    logging.info(f"Le plan détaillé est enregistré dans : {csv_file}")
@@ -0,0 +1,62 @@
+import os
+import re
+import tempfile
+
+# Where encoded outputs go:
+#  - file: transcoded_outputs/ on the working directory's storage (historical behaviour)
+#  - tmpfs: same file written in RAM, no disk I/O
+#  - null: ffmpeg's null muxer, nothing is written; size read from ffmpeg's final statistics
+#  - pipe: fragmented MP4 streamed to a pipe drained (and counted) by the harness
+SINKS = ["file", "tmpfs", "null", "pipe"]
+
+# Sinks leaving a file that can be scored by the quality stage
+FILE_SINKS = {"file", "tmpfs"}
+
+# content_s is the duration of encoded content, the basis of output_kbps
+SINK_FIELDS = ["sink", "output_bytes", "output_kbps", "content_s"]
+
+TMPFS_OUTPUT_DIR = (
+    "/dev/shm/ffmpeg-benchmark-outputs" if os.path.isdir("/dev/shm")
+    else os.path.join(tempfile.gettempdir(), "ffmpeg-benchmark-outputs")
+)
+
+def apply_sink(cmd, sink):
+    """
+    Adapte une commande dont le dernier élément est le fichier de sortie au puits `sink`.
+    Retourne (commande, chemin du fichier produit ou None). Pour "pipe", la commande se termine
+    par les options du muxer: run_ffmpeg(output_pipe=True) ajoute lui-même la sortie pipe:N.
+    """
+    *cmd, target = cmd
+    if sink == "file":
+        return cmd + [target], target
+    if sink == "tmpfs":
+        os.makedirs(TMPFS_OUTPUT_DIR, exist_ok=True)
+        path = os.path.join(TMPFS_OUTPUT_DIR, os.path.basename(target))
+        return cmd + [path], path
+    if sink == "null":
+        return cmd + ["-f", "null", "-"], None
+    if sink == "pipe":
+        # A pipe cannot be seeked back to write the moov atom: fragment the MP4 instead
+        return cmd + ["-f", "mp4", "-movflags", "frag_keyframe+empty_moov"], None
+    raise ValueError(f"Puits de sortie inconnu: {sink}")
+
+def extract_output_size(stderr):
+    """
+    Taille des paquets vidéo encodés d'après la ligne de statistiques finale de ffmpeg
+    ("video:4900kB" ou "video:4900KiB"), en octets; None si elle est absente.
+    Précision au kio près: utilisée pour le puits null, qui n'écrit rien.
+    """
+    match = re.search(r'video:\s*(\d+)\s*(?:kB|KiB)', stderr)
+    return int(match.group(1)) * 1024 if match else None
+
+def output_metrics(sink, output_bytes, duration_s):
+    """
+    Colonnes SINK_FIELDS d'un résultat: taille de sortie et débit obtenu (kbit/s) sur `duration_s`.
+    """
+    kbps = round(output_bytes * 8 / 1000 / duration_s, 1) if output_bytes and duration_s else None
+    return {
+        "sink": sink,
+        "output_bytes": output_bytes,
+        "output_kbps": kbps,
+        "content_s": round(duration_s, 3) if duration_s else None
+    }
@@ -0,0 +1,286 @@
+import os
+import re
+import csv
+import time
+import logging
+import subprocess
+import threading
+from collections import deque, namedtuple
+from scheduler import popen_pinned
+from resource_sampler import ResourceSampler
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# One point of the per-second time series emitted by `ffmpeg -progress`
+ProgressSample = namedtuple("ProgressSample", ["elapsed_s", "out_time_s", "frame", "fps", "bitrate_kbps", "speed"])
+
+# Outcome of run_ffmpeg: `stderr` only holds the bench: lines and the tail of the log
+# `output_bytes` is only set when the output goes to a pipe counted by the harness
+FfmpegRun = namedtuple("FfmpegRun", ["stderr", "samples", "aborted", "returncode", "resources", "output_bytes"])
+
+PROGRESS_ARGS = ["-progress", "pipe:1", "-nostats", "-stats_period", "1"]
+
+# Number of trailing stderr lines kept to report ffmpeg errors
+STDERR_TAIL_LINES = 20
+
+# Per-stage time buckets filled by StageTimer (seconds of wall-clock time per run)
+STAGE_FIELDS = ["decode_s", "filter_s", "upload_s", "encode_s", "other_s"]
+
+# -benchmark_all line: "bench:   1234 user     56 sys   7890 real decode_video 0.0" (microseconds)
+BENCH_STAGE_PATTERN = re.compile(r'bench:\s*\d+ user\s+\d+ sys\s+(\d+) real (\w+)')
+
+# Per-frame log of the bench filter pairs added by instrument_command: "[bench@upload @ 0x...] t:0.000412 avg:..."
+BENCH_FILTER_PATTERN = re.compile(r'\[bench@(\w+) @ [^\]]+\] t:([\d.]+)')
+
+# Filters moving frames between system and GPU memory, timed as "upload" rather than "filter"
+UPLOAD_FILTERS = ("hwupload", "hwdownload", "hwmap")
+
+def _to_float(value):
+    # ffmpeg reports "N/A" before the first frame and suffixes some values ("2.01x", "4000.0kbits/s")
+    try:
+        return float(value.rstrip("xkbits/s"))
+    except ValueError:
+        return 0.0
+
+class ProgressParser:
+    """
+    Analyse incrémentale du flux clé=valeur de `ffmpeg -progress`.
+    Chaque bloc se termine par une ligne 'progress=continue' ou 'progress=end';
+    feed() retourne alors un ProgressSample, sinon None.
+    Seules les clés utiles sont conservées, le bloc courant est réutilisé d'un appel à l'autre.
+    """
+
+    KEYS = ("frame", "fps", "bitrate", "speed", "out_time_us")
+
+    def __init__(self, start_time=None):
+        self.start_time = time.monotonic() if start_time is None else start_time
+        self.samples = []
+        self.finished = False
+        self._block = dict.fromkeys(self.KEYS, "0")
+
+    def feed(self, line, now=None):
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return None
+        if key in self._block:
+            self._block[key] = value.strip()
+            return None
+        if key != "progress":
+            return None
+
+        block = self._block
+        now = time.monotonic() if now is None else now
+        sample = ProgressSample(
+            elapsed_s=now - self.start_time,
+            out_time_s=_to_float(block["out_time_us"]) / 1e6,
+            frame=int(_to_float(block["frame"])),
+            fps=_to_float(block["fps"]),
+            bitrate_kbps=_to_float(block["bitrate"]),
+            speed=_to_float(block["speed"]),
+        )
+        self.samples.append(sample)
+        self.finished = value.strip() == "end"
+        return sample
+
+def extract_metrics(stderr):
+    """
+    Temps CPU utilisateur, temps réel et mémoire maximale d'après les lignes finales de -benchmark.
+    """
+    metrics = {
+        'utime_s': 0.0,
+        'rtime_s': 0.0,
+        'maxrss_kb': 0
+    }
+    bench_match = re.search(
+        r'bench:\s*utime=([\d\.]+)s\s*stime=([\d\.]+)s\s*rtime=([\d\.]+)s',
+        stderr
+    )
+    if bench_match:
+        try:
+            metrics['utime_s'] = float(bench_match.group(1))
+            metrics['rtime_s'] = float(bench_match.group(3))
+        except ValueError:
+            pass
+
+    rss_match = re.search(r'bench:\s*maxrss=(\d+)kB', stderr)
+    if rss_match:
+        try:
+            metrics['maxrss_kb'] = int(rss_match.group(1))
+        except ValueError:
+            pass
+
+    return metrics
+
+def instrument_command(cmd):
+    """
+    Ajoute l'instrumentation par étape à une commande construite par un backend:
+    -benchmark_all (temps de chaque appel de décodage et d'encodage) et une paire de filtres
+    bench autour de chaque groupe de filtres de -vf, les filtres de transfert vers/depuis le GPU
+    (UPLOAD_FILTERS) formant l'étape "upload" et les autres l'étape "filter".
+    """
+    cmd = list(cmd)
+    cmd.insert(cmd.index("-benchmark") + 1 if "-benchmark" in cmd else 1, "-benchmark_all")
+    if "-vf" in cmd:
+        position = cmd.index("-vf") + 1
+        groups = []
+        for name in cmd[position].split(","):
+            bucket = "upload" if name.split("=")[0] in UPLOAD_FILTERS else "filter"
+            if groups and groups[-1][0] == bucket:
+                groups[-1][1].append(name)
+            else:
+                groups.append((bucket, [name]))
+        cmd[position] = ",".join(
+            ",".join([f"bench@{bucket}=start", *names, f"bench@{bucket}=stop"]) for bucket, names in groups
+        )
+    return cmd
+
+class StageTimer:
+    """
+    Cumul des temps par étape d'une exécution instrumentée par instrument_command.
+
+    Les lignes -benchmark_all donnent le temps réel de chaque appel au décodeur (decode_*)
+    et à l'encodeur (encode_*, flush_*); les filtres bench donnent le temps passé par chaque
+    image dans les groupes filter et upload. Avec les threads de ffmpeg >= 6.1, les étapes se
+    chevauchent: les compartiments indiquent où le temps est passé, leur somme peut dépasser rtime_s.
+    """
+
+    def __init__(self):
+        self.seconds = {"decode": 0.0, "filter": 0.0, "upload": 0.0, "encode": 0.0}
+
+    def feed(self, line):
+        """
+        Retourne True si `line` est une ligne d'instrumentation (cumulée puis ignorée).
+        """
+        match = BENCH_STAGE_PATTERN.match(line)
+        if match:
+            stage = match.group(2)
+            if stage.endswith("_video"):
+                bucket = "decode" if stage.startswith("decode") else "encode"
+                self.seconds[bucket] += int(match.group(1)) / 1e6
+            return True
+        match = BENCH_FILTER_PATTERN.search(line)
+        if match:
+            if match.group(1) in self.seconds:
+                self.seconds[match.group(1)] += float(match.group(2))
+            return True
+        return False
+
+    def buckets(self, rtime_s):
+        """
+        Colonnes STAGE_FIELDS; other_s est le reste du temps réel (démultiplexage, multiplexage, attente).
+        """
+        stages = {f"{stage}_s": round(seconds, 3) for stage, seconds in self.seconds.items()}
+        stages["other_s"] = round(max(0.0, rtime_s - sum(self.seconds.values())), 3)
+        return stages
+
+class StderrLog:
+    """
+    Lignes utiles du stderr de ffmpeg, en mémoire constante: les lignes 'bench:' finales,
+    les dernières lignes du journal et, avec un StageTimer, les temps par étape.
+    """
+
+    def __init__(self, stages=None):
+        self.stages = stages
+        self.bench_lines = []
+        self.tail = deque(maxlen=STDERR_TAIL_LINES)
+
+    def feed(self, line):
+        if self.stages is not None and self.stages.feed(line):
+            return
+        if line.startswith("bench:"):
+            self.bench_lines.append(line)
+        else:
+            self.tail.append(line)
+
+    def text(self):
+        return "".join(self.bench_lines) + "".join(self.tail)
+
+def run_ffmpeg(cmd, cpus=None, min_speed=None, min_speed_grace_s=5.0, sample_interval=None, output_pipe=False):
+    """
+    Exécute une commande ffmpeg en lisant son flux `-progress` au fil de l'eau.
+
+    Seules les lignes 'bench:' et les dernières lignes de stderr sont conservées, la
+    mémoire reste donc constante quelle que soit la durée du transcodage.
+    Si `min_speed` est fourni, le transcodage est interrompu dès que la vitesse passe
+    sous ce seuil après `min_speed_grace_s` secondes.
+    Si `sample_interval` est fourni, un ResourceSampler suit le processus pendant toute sa durée.
+    Avec `output_pipe`, la sortie de ffmpeg est un pipe (pipe:N ajouté en fin de commande)
+    vidé par un thread qui compte les octets reçus (FfmpegRun.output_bytes).
+
+    Retourne un FfmpegRun, `stderr` contenant les lignes utiles à extract_metrics
+    suivies de la fin du journal.
+    """
+    cmd = [cmd[0]] + PROGRESS_ARGS + list(cmd[1:])
+    parser = ProgressParser()
+    counted = {"bytes": 0}
+    if output_pipe:
+        read_fd, write_fd = os.pipe()
+        cmd.append(f"pipe:{write_fd}")
+        process = popen_pinned(cmd, cpus, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                               pass_fds=(write_fd,))
+        # Only ffmpeg keeps the write end open: the reader sees EOF when it exits
+        os.close(write_fd)
+
+        def drain_output():
+            with os.fdopen(read_fd, "rb", buffering=0) as output:
+                for chunk in iter(lambda: output.read(1 << 20), b""):
+                    counted["bytes"] += len(chunk)
+
+        output_thread = threading.Thread(target=drain_output, daemon=True)
+        output_thread.start()
+    else:
+        process = popen_pinned(cmd, cpus, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+    log = StderrLog()
+
+    def drain_stderr():
+        for line in process.stderr:
+            log.feed(line)
+
+    stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+    stderr_thread.start()
+
+    sampler = None
+    if sample_interval:
+        sampler = ResourceSampler(process.pid, sample_interval)
+        sampler.start()
+
+    aborted = False
+    for line in process.stdout:
+        sample = parser.feed(line)
+        if (
+            sample is not None
+            and min_speed is not None
+            and not aborted
+            and sample.elapsed_s >= min_speed_grace_s
+            and 0 < sample.speed < min_speed
+        ):
+            logging.warning(f"Vitesse {sample.speed:.2f}x sous le seuil {min_speed:.2f}x, arrêt du transcodage.")
+            aborted = True
+            process.kill()
+
+    returncode = process.wait()
+    stderr_thread.join()
+    if output_pipe:
+        output_thread.join()
+    resources = sampler.stop() if sampler is not None else []
+
+    if returncode != 0 and not aborted:
+        logging.warning(f"ffmpeg a retourné {returncode}: {''.join(log.tail).strip()}")
+
+    return FfmpegRun(log.text(), parser.samples, aborted, returncode, resources,
+                     counted["bytes"] if output_pipe else None)
+
+def write_progress_series(results, csv_file="benchmark_progress.csv"):
+    """
+    Enregistre la série temporelle de progression de chaque résultat (une ligne par échantillon).
+    """
+    key_fields = ["source", "codec", "preset", "bitrate", "iteration", "acceleration"]
+    with open(csv_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(key_fields + list(ProgressSample._fields))
+        for result in results:
+            key = [result.get(field, "") for field in key_fields]
+            for sample in result.get("progress", []):
+                writer.writerow(key + [round(value, 3) if isinstance(value, float) else value for value in sample])
+    logging.info(f"Les séries de progression sont enregistrées dans : {csv_file}")
@@ -0,0 +1,128 @@
+import os
+import re
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from frame_cache import probe_video
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+QUALITY_METRICS = ["vmaf", "psnr", "ssim"]
+
+# CSV columns filled by the quality stage
+QUALITY_FIELDS = ["vmaf", "psnr_db", "ssim"]
+
+FILTER_MAP = {
+    "vmaf": "libvmaf",
+    "psnr": "psnr",
+    "ssim": "ssim"
+}
+
+def build_quality_command(distorted, reference, metrics, subsample=1, reference_size=None):
+    """
+    Construit la commande ffmpeg comparant `distorted` à `reference` avec les filtres demandés.
+    Avec `subsample` > 1, seule une image sur `subsample` est comparée.
+    Avec `reference_size` (largeur, hauteur), la sortie encodée est d'abord remise à la taille
+    de la référence (bicubique), comme le ferait un lecteur: les filtres de mesure exigent deux
+    entrées de même taille, ce qui n'est pas le cas des renditions réduites d'une échelle ABR.
+    Les filtres de mesure sont chaînés: chacun laisse passer sa première entrée (l'image
+    encodée), seule la référence est dupliquée.
+    """
+    if subsample > 1:
+        prepare = f"select='not(mod(n\\,{subsample}))',setpts=N/FRAME_RATE/TB"
+    else:
+        prepare = "setpts=PTS-STARTPTS"
+    upscale = f"scale={reference_size[0]}:{reference_size[1]}:flags=bicubic," if reference_size else ""
+
+    graph = [f"[0:v]{upscale}{prepare}[d0]", f"[1:v]{prepare},split={len(metrics)}" + "".join(f"[r{k}]" for k in range(len(metrics)))]
+    for k, metric in enumerate(metrics):
+        graph.append(f"[d{k}][r{k}]{FILTER_MAP[metric]}[d{k + 1}]")
+
+    cmd = [
+        "ffmpeg",
+        "-hide_banner", "-nostats",
+        "-i", distorted,
+        "-i", reference,
+        "-filter_complex", ";".join(graph),
+        "-map", f"[d{len(metrics)}]",
+        "-f", "null", "-"
+    ]
+    return cmd
+
+def extract_quality(stderr):
+    """
+    Extrait les scores VMAF, PSNR moyen (dB) et SSIM global de la sortie des filtres.
+    Les métriques absentes valent None.
+    """
+    scores = dict.fromkeys(QUALITY_FIELDS)
+
+    vmaf_match = re.search(r'VMAF score[:=]\s*([\d\.]+)', stderr)
+    if vmaf_match:
+        scores["vmaf"] = float(vmaf_match.group(1))
+
+    psnr_match = re.search(r'PSNR .*average:([\d\.]+|inf)', stderr)
+    if psnr_match:
+        scores["psnr_db"] = float(psnr_match.group(1))
+
+    ssim_match = re.search(r'SSIM .*All:([\d\.]+)', stderr)
+    if ssim_match:
+        scores["ssim"] = float(ssim_match.group(1))
+
+    return scores
+
+def score_output(distorted, reference, metrics, subsample=1):
+    """
+    Mesure la qualité de `distorted` par rapport à `reference`, à la résolution de la référence.
+    """
+    try:
+        width, height, _ = probe_video(reference)
+        reference_size = (width, height)
+    except Exception as e:
+        logging.warning(f"Résolution de {reference} inconnue, sortie comparée sans mise à l'échelle: {e}")
+        reference_size = None
+    cmd = build_quality_command(distorted, reference, metrics, subsample, reference_size)
+    logging.info(f"Mesure de qualité: {' '.join(cmd)}")
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        logging.error(f"Échec de la mesure de qualité de {distorted}: {result.stderr.strip()[-500:]}")
+    return extract_quality(result.stderr)
+
+class QualityPipeline:
+    """
+    Étage de mesure de qualité exécuté en tâche de fond, en parallèle des encodages suivants.
+    submit() confie une sortie encodée à l'étage: les scores sont ajoutés au résultat puis
+    le fichier est supprimé. drain() attend la fin de toutes les mesures en cours.
+    """
+
+    def __init__(self, metrics=None, subsample=1, workers=1):
+        self.metrics = metrics or QUALITY_METRICS
+        self.subsample = max(1, subsample)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._futures = []
+
+    def submit(self, result, target_file, reference, on_done=None):
+        self._futures.append(self._pool.submit(self._score, result, target_file, reference, on_done))
+
+    def _score(self, result, target_file, reference, on_done=None):
+        try:
+            result.update(score_output(target_file, reference, self.metrics, self.subsample))
+            logging.info(
+                f"Qualité de {target_file}: "
+                + ", ".join(f"{field}={result[field]}" for field in QUALITY_FIELDS if result.get(field) is not None)
+            )
+        except Exception as e:
+            logging.error(f"Exception lors de la mesure de qualité de {target_file}: {e}")
+        finally:
+            if os.path.exists(target_file):
+                os.remove(target_file)
+            if on_done is not None:
+                on_done(result)
+
+    def drain(self):
+        for future in self._futures:
+            future.result()
+        self._futures = []
+
+    def shutdown(self):
+        self.drain()
+        self._pool.shutdown()
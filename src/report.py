@@ -0,0 +1,307 @@
+import html
+import logging
+import statistics
+from results_store import DEFAULT_DB, CONFIG_COLUMNS, connect, resolve_run
+from quality import QUALITY_FIELDS
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Configurations are aggregated per host: the same preset does not cost the same everywhere
+KEY_COLUMNS = ["host"] + CONFIG_COLUMNS
+
+# Stored columns read for each result row
+VALUE_COLUMNS = ["frames", "utime_s", "rtime_s", "energy_j", "content_s", "output_kbps"] + QUALITY_FIELDS
+
+# Cost-efficiency metrics derived per row, then aggregated by median:
+#  - fps: frames per wall-clock second
+#  - frames_per_cpu_s: frames per second of user CPU time (-benchmark utime)
+#  - fps_per_watt: frames per joule of RAPL package energy, i.e. fps per watt
+#  - cost_per_hour: price of the machine time needed to encode one hour of content
+EFFICIENCY_METRICS = {
+    "fps": {"label": "images/s", "higher_is_better": True},
+    "frames_per_cpu_s": {"label": "images/s CPU", "higher_is_better": True},
+    "fps_per_watt": {"label": "images/s/W", "higher_is_better": True},
+    "cost_per_hour": {"label": "coût/h encodée", "higher_is_better": False}
+}
+
+DEFAULT_REPORT = "benchmark_report"
+
+def load_report_rows(run_refs=None, db_path=DEFAULT_DB):
+    """
+    Lignes de résultats de la base (toutes les exécutions, ou celles désignées par `run_refs`
+    au format de resolve_run), avec l'hôte de leur exécution. Les transcodages interrompus et
+    sans mesure de temps sont écartés.
+    Retourne un DataFrame si pandas est disponible, sinon une liste de dictionnaires.
+    """
+    conn = connect(db_path)
+    try:
+        where = "results.rtime_s > 0 AND results.frames > 0 AND NOT COALESCE(results.aborted, 0)"
+        params = []
+        if run_refs:
+            run_ids = sorted({resolve_run(conn, ref) for ref in run_refs})
+            where += f" AND results.run_id IN ({', '.join('?' for _ in run_ids)})"
+            params = run_ids
+        columns = ", ".join(
+            ["COALESCE(runs.host, '')"]
+            + [f"COALESCE(results.{column}, 'file')" if column == "sink" else f"results.{column}" for column in CONFIG_COLUMNS]
+            + [f"results.{column}" for column in VALUE_COLUMNS]
+        )
+        query = f"SELECT {columns} FROM results JOIN runs ON runs.id = results.run_id WHERE {where}"
+        if pd is not None:
+            rows = pd.read_sql_query(query, conn, params=params)
+            rows.columns = KEY_COLUMNS + VALUE_COLUMNS
+            return rows
+        return [dict(zip(KEY_COLUMNS + VALUE_COLUMNS, row)) for row in conn.execute(query, params)]
+    finally:
+        conn.close()
+
+def _ratio(numerator, denominator):
+    return numerator / denominator if numerator is not None and denominator else None
+
+def _derive(row, price_per_hour):
+    row["fps"] = _ratio(row["frames"], row["rtime_s"])
+    row["frames_per_cpu_s"] = _ratio(row["frames"], row["utime_s"])
+    row["fps_per_watt"] = _ratio(row["frames"], row["energy_j"])
+    row["cost_per_hour"] = _ratio(price_per_hour * row["rtime_s"], row["content_s"]) if price_per_hour else None
+    return row
+
+def aggregate_efficiency(rows, price_per_hour=None):
+    """
+    Médianes par hôte et configuration des métriques EFFICIENCY_METRICS, du débit obtenu et
+    de la qualité. `price_per_hour` est le prix d'une heure de la machine entière: le coût
+    suppose qu'un job l'occupe seul pendant rtime_s.
+    Retourne une liste de dictionnaires (clés KEY_COLUMNS, "runs" et les métriques, None si absentes).
+    """
+    metrics = list(EFFICIENCY_METRICS) + ["output_kbps"] + QUALITY_FIELDS
+    if pd is not None:
+        # Vectorised path: one pass per derived column, then a single groupby median
+        frame = rows.copy()
+        frame[VALUE_COLUMNS] = frame[VALUE_COLUMNS].apply(pd.to_numeric, errors="coerce")
+        frame["fps"] = frame["frames"] / frame["rtime_s"]
+        frame["frames_per_cpu_s"] = frame["frames"] / frame["utime_s"].where(frame["utime_s"] > 0)
+        frame["fps_per_watt"] = frame["frames"] / frame["energy_j"].where(frame["energy_j"] > 0)
+        frame["cost_per_hour"] = (
+            price_per_hour * frame["rtime_s"] / frame["content_s"].where(frame["content_s"] > 0)
+            if price_per_hour else float("nan")
+        )
+        grouped = frame.groupby(KEY_COLUMNS, sort=True, dropna=False)
+        medians = grouped[metrics].median()
+        medians["runs"] = grouped.size()
+        medians = medians.reset_index().astype(object)
+        return [
+            {key: (None if pd.isna(value) else value) for key, value in record.items()}
+            for record in medians.to_dict("records")
+        ]
+
+    groups = {}
+    for row in rows:
+        row = _derive(dict(row), price_per_hour)
+        groups.setdefault(tuple(row[column] for column in KEY_COLUMNS), []).append(row)
+    aggregated = []
+    for key in sorted(groups):
+        group = groups[key]
+        entry = dict(zip(KEY_COLUMNS, key))
+        entry["runs"] = len(group)
+        for metric in metrics:
+            values = [row[metric] for row in group if row[metric] is not None]
+            entry[metric] = statistics.median(values) if values else None
+        aggregated.append(entry)
+    return aggregated
+
+def pareto_front(points, x_higher_is_better=True, y_higher_is_better=True):
+    """
+    Indices des points (x, y) non dominés: aucun autre point n'est au moins aussi bon sur les
+    deux axes et meilleur sur l'un. Tri puis balayage, en O(n log n).
+    """
+    sx = 1 if x_higher_is_better else -1
+    sy = 1 if y_higher_is_better else -1
+    order = sorted(range(len(points)), key=lambda i: (-sx * points[i][0], -sy * points[i][1]))
+    front = []
+    best_y = None
+    for i in order:
+        y = sy * points[i][1]
+        if best_y is None or y > best_y:
+            front.append(i)
+            best_y = y
+    return front
+
+def quality_axis(entries, quality_metric):
+    """
+    Axe de comparaison d'une source: `quality_metric` (plus haut = meilleur) s'il a été mesuré,
+    sinon le débit obtenu output_kbps (plus bas = meilleur). Retourne (colonne, plus haut = meilleur).
+    """
+    if any(entry.get(quality_metric) is not None for entry in entries):
+        return quality_metric, True
+    return "output_kbps", False
+
+def build_fronts(aggregated, quality_metric="vmaf"):
+    """
+    Frontières de Pareto par source et par métrique d'efficacité, contre l'axe de quality_axis.
+    Retourne {source: {"axis": (colonne, sens), "fronts": {métrique: [entrées de la frontière]}}}.
+    """
+    by_source = {}
+    for entry in aggregated:
+        by_source.setdefault(entry["source"], []).append(entry)
+    fronts = {}
+    for source, entries in by_source.items():
+        axis, axis_higher = quality_axis(entries, quality_metric)
+        fronts[source] = {"axis": (axis, axis_higher), "fronts": {}}
+        for metric, spec in EFFICIENCY_METRICS.items():
+            candidates = [e for e in entries if e.get(axis) is not None and e.get(metric) is not None]
+            if not candidates:
+                continue
+            indices = pareto_front(
+                [(e[axis], e[metric]) for e in candidates], axis_higher, spec["higher_is_better"]
+            )
+            fronts[source]["fronts"][metric] = [candidates[i] for i in indices]
+    return fronts
+
+def _format(value, digits=2):
+    if value is None:
+        return "—"
+    if isinstance(value, float):
+        return f"{value:.{digits}f}"
+    return str(value)
+
+def _config_label(entry):
+    return " ".join(str(entry[column]) for column in ["host"] + CONFIG_COLUMNS[1:])
+
+def _table_rows(entries, fronts, axis):
+    columns = KEY_COLUMNS[:1] + KEY_COLUMNS[2:] + ["runs"] + list(EFFICIENCY_METRICS) + [axis]
+    rows = []
+    for entry in sorted(entries, key=lambda e: -(e.get("fps") or 0)):
+        on_front = [metric for metric, front in fronts.items() if any(entry is e for e in front)]
+        rows.append([_format(entry.get(column)) for column in columns] + [", ".join(on_front)])
+    return columns + ["pareto"], rows
+
+def render_markdown(aggregated, fronts, price_per_hour=None):
+    """
+    Rapport Markdown: un tableau par source, les configurations de la frontière de Pareto
+    d'au moins une métrique marquées ★ (colonne pareto: les métriques concernées).
+    """
+    lines = ["# Rapport d'efficacité", ""]
+    if not price_per_hour:
+        lines += ["Coût par heure encodée non calculé (--price-per-hour non fourni).", ""]
+    for source in sorted(fronts):
+        axis, axis_higher = fronts[source]["axis"]
+        entries = [entry for entry in aggregated if entry["source"] == source]
+        columns, rows = _table_rows(entries, fronts[source]["fronts"], axis)
+        lines += [
+            f"## {source}", "",
+            f"Axe de qualité: {axis} ({'plus haut' if axis_higher else 'plus bas'} = meilleur)", "",
+            "| " + " | ".join(columns) + " |",
+            "|" + "---|" * len(columns)
+        ]
+        for row in rows:
+            star = "★ " if row[-1] else ""
+            lines.append("| " + star + " | ".join(row) + " |")
+        lines.append("")
+    return "\n".join(lines)
+
+def render_svg(entries, front, axis, metric, width=480, height=320, margin=56):
+    """
+    Nuage de points SVG autonome (métrique en fonction de l'axe de qualité), la frontière
+    de Pareto en rouge reliée par une ligne.
+    """
+    xs = [entry[axis] for entry in entries]
+    ys = [entry[metric] for entry in entries]
+    x_min, x_max = min(xs), max(xs)
+    y_min, y_max = min(ys), max(ys)
+    x_span = (x_max - x_min) or 1.0
+    y_span = (y_max - y_min) or 1.0
+
+    def project(x, y):
+        return (margin + (x - x_min) / x_span * (width - 2 * margin),
+                height - margin - (y - y_min) / y_span * (height - 2 * margin))
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="11">',
+        f'<rect width="{width}" height="{height}" fill="white"/>',
+        f'<line x1="{margin}" y1="{height - margin}" x2="{width - margin}" y2="{height - margin}" stroke="black"/>',
+        f'<line x1="{margin}" y1="{margin}" x2="{margin}" y2="{height - margin}" stroke="black"/>',
+        f'<text x="{width / 2}" y="{height - 12}" text-anchor="middle">{html.escape(axis)}</text>',
+        f'<text x="14" y="{height / 2}" text-anchor="middle" transform="rotate(-90 14 {height / 2})">'
+        f'{html.escape(EFFICIENCY_METRICS[metric]["label"])}</text>',
+        f'<text x="{margin}" y="{height - margin + 14}" text-anchor="middle">{_format(x_min)}</text>',
+        f'<text x="{width - margin}" y="{height - margin + 14}" text-anchor="middle">{_format(x_max)}</text>',
+        f'<text x="{margin - 4}" y="{height - margin}" text-anchor="end">{_format(y_min)}</text>',
+        f'<text x="{margin - 4}" y="{margin + 4}" text-anchor="end">{_format(y_max)}</text>'
+    ]
+    ordered = sorted(front, key=lambda entry: entry[axis])
+    if len(ordered) > 1:
+        points = " ".join("%.1f,%.1f" % project(entry[axis], entry[metric]) for entry in ordered)
+        parts.append(f'<polyline points="{points}" fill="none" stroke="#c0392b" stroke-dasharray="4 3"/>')
+    for entry in entries:
+        on_front = any(entry is e for e in front)
+        x, y = project(entry[axis], entry[metric])
+        parts.append(
+            f'<circle cx="{x:.1f}" cy="{y:.1f}" r="{5 if on_front else 3}" '
+            f'fill="{"#c0392b" if on_front else "#7f8c8d"}"><title>{html.escape(_config_label(entry))}: '
+            f'{axis}={_format(entry[axis])}, {metric}={_format(entry[metric], 3)}</title></circle>'
+        )
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+def render_html(aggregated, fronts, price_per_hour=None):
+    """
+    Rapport HTML autonome (CSS et graphiques SVG inclus, sans ressource externe): par source,
+    un graphique par métrique d'efficacité mesurée et le tableau des configurations.
+    """
+    body = ["<h1>Rapport d'efficacité</h1>"]
+    if not price_per_hour:
+        body.append("<p>Coût par heure encodée non calculé (--price-per-hour non fourni).</p>")
+    for source in sorted(fronts):
+        axis, axis_higher = fronts[source]["axis"]
+        entries = [entry for entry in aggregated if entry["source"] == source]
+        body.append(f"<h2>{html.escape(source)}</h2>")
+        body.append(f"<p>Axe de qualité: {html.escape(axis)} ({'plus haut' if axis_higher else 'plus bas'} = meilleur). "
+                    f"Frontière de Pareto en rouge.</p>")
+        body.append('<div class="plots">')
+        for metric, front in fronts[source]["fronts"].items():
+            plotted = [e for e in entries if e.get(axis) is not None and e.get(metric) is not None]
+            body.append(render_svg(plotted, front, axis, metric))
+        body.append("</div>")
+        columns, rows = _table_rows(entries, fronts[source]["fronts"], axis)
+        body.append("<table><tr>" + "".join(f"<th>{html.escape(c)}</th>" for c in columns) + "</tr>")
+        for row in rows:
+            css = ' class="front"' if row[-1] else ""
+            body.append(f"<tr{css}>" + "".join(f"<td>{html.escape(cell)}</td>" for cell in row) + "</tr>")
+        body.append("</table>")
+    style = (
+        "body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin:1em 0}"
+        "td,th{border:1px solid #ccc;padding:2px 6px;text-align:right}tr.front{background:#fdecea}"
+        ".plots{display:flex;flex-wrap:wrap;gap:1em}"
+    )
+    return (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Rapport d\'efficacité</title>'
+        f"<style>{style}</style></head><body>\n" + "\n".join(body) + "\n</body></html>\n"
+    )
+
+def write_report(run_refs=None, output=DEFAULT_REPORT, formats=("html", "md"), price_per_hour=None,
+                 quality_metric="vmaf", db_path=DEFAULT_DB):
+    """
+    Génère le rapport d'efficacité des exécutions enregistrées: `output`.html et/ou `output`.md.
+    Retourne la liste des fichiers écrits (vide si aucun résultat exploitable).
+    """
+    rows = load_report_rows(run_refs, db_path)
+    if not len(rows):
+        logging.warning("Aucun résultat exploitable pour le rapport.")
+        return []
+    aggregated = aggregate_efficiency(rows, price_per_hour)
+    fronts = build_fronts(aggregated, quality_metric)
+    logging.info(f"Rapport: {len(rows)} résultat(s), {len(aggregated)} configuration(s), {len(fronts)} source(s)")
+    written = []
+    renderers = {"html": render_html, "md": render_markdown}
+    for fmt in formats:
+        path = f"{output}.{fmt}"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(renderers[fmt](aggregated, fronts, price_per_hour))
+        logging.info(f"Rapport enregistré dans : {path}")
+        written.append(path)
+    return written
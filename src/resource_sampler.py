@@ -0,0 +1,244 @@
+import os
+import re
+import csv
+import time
+import logging
+import threading
+from collections import namedtuple
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_KB = (os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096) // 1024
+
+DEFAULT_INTERVAL_S = 0.5
+
+POWERCAP_DIR = "/sys/class/powercap"
+
+# One point of the resource time series of a run.
+# cpu_percent may exceed 100 (one full core = 100); core_load holds the system-wide busy % of each online core, by core number.
+ResourceSample = namedtuple("ResourceSample", [
+    "elapsed_s",
+    "cpu_percent",
+    "threads",
+    "rss_kb",
+    "read_bytes",
+    "write_bytes",
+    "voluntary_ctxt",
+    "nonvoluntary_ctxt",
+    "run_delay_ms",
+    "core_load"
+])
+
+# Per-run aggregates added to the results when sampling is enabled
+RESOURCE_FIELDS = [
+    "cpu_percent_avg",
+    "cpu_percent_max",
+    "threads_max",
+    "rss_kb_max",
+    "read_bytes",
+    "write_bytes",
+    "voluntary_ctxt",
+    "nonvoluntary_ctxt",
+    "run_delay_ms"
+]
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+def read_core_times():
+    """
+    Retourne {numéro de cœur: (busy, total)} en ticks d'après /proc/stat, qui ne liste que les
+    cœurs en ligne: les numéros ne sont pas forcément contigus (SMT désactivé, cœurs retirés).
+    """
+    cores = {}
+    for line in _read("/proc/stat").split('\n'):
+        if line.startswith("cpu") and line[3:4].isdigit():
+            label, *fields = line.split()
+            values = [int(v) for v in fields]
+            # idle + iowait are the only non-busy states
+            idle = values[3] + (values[4] if len(values) > 4 else 0)
+            total = sum(values[:8])
+            cores[int(label[3:])] = (total - idle, total)
+    return cores
+
+def read_process(pid, tasks=None):
+    """
+    Lit l'état courant d'un processus et de ses threads dans /proc.
+    Retourne un dictionnaire de compteurs cumulés, ou None si le processus a disparu.
+
+    Les changements de contexte et l'attente d'ordonnancement ne sont tenus que par thread:
+    `tasks` ({tid: derniers compteurs}) garde ceux des threads déjà terminés, pour que les
+    totaux du processus ne baissent pas quand un thread se termine entre deux lectures.
+    """
+    tasks = {} if tasks is None else tasks
+    try:
+        stat = _read(f"/proc/{pid}/stat")
+        # The command name may contain spaces: fields start after the closing parenthesis
+        fields = stat[stat.rindex(")") + 2:].split()
+        counters = {
+            "cpu_ticks": int(fields[11]) + int(fields[12]),
+            "threads": int(fields[17]),
+            "rss_kb": int(fields[21]) * PAGE_KB,
+            "read_bytes": 0,
+            "write_bytes": 0
+        }
+        try:
+            for line in _read(f"/proc/{pid}/io").split('\n'):
+                key, _, value = line.partition(": ")
+                if key in ("read_bytes", "write_bytes"):
+                    counters[key] = int(value)
+        except PermissionError:
+            pass
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            try:
+                task = {}
+                for line in _read(f"/proc/{pid}/task/{tid}/status").split('\n'):
+                    if line.startswith("voluntary_ctxt_switches"):
+                        task["voluntary_ctxt"] = int(line.split()[1])
+                    elif line.startswith("nonvoluntary_ctxt_switches"):
+                        task["nonvoluntary_ctxt"] = int(line.split()[1])
+                task["run_delay_ns"] = int(_read(f"/proc/{pid}/task/{tid}/schedstat").split()[1])
+                tasks[tid] = task
+            except (FileNotFoundError, ProcessLookupError, IndexError):
+                # Thread exited between listdir and read: its last counters are kept
+                continue
+    except (FileNotFoundError, ProcessLookupError, ValueError, IndexError):
+        return None
+    for field in ("voluntary_ctxt", "nonvoluntary_ctxt", "run_delay_ns"):
+        counters[field] = sum(task.get(field, 0) for task in tasks.values())
+    return counters
+
+class ResourceSampler(threading.Thread):
+    """
+    Échantillonne l'utilisation des ressources d'un processus à intervalle régulier.
+
+    Lance un thread démon qui lit /proc/<pid>/{stat,io,status,schedstat} et /proc/stat
+    toutes les `interval` secondes jusqu'à stop() ou la fin du processus.
+    Les échantillons (ResourceSample) sont disponibles dans `samples`; les compteurs cumulés
+    incluent les threads terminés depuis leur dernière lecture.
+    """
+
+    def __init__(self, pid, interval=DEFAULT_INTERVAL_S):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._tasks = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        start = time.monotonic()
+        previous = read_process(self.pid, self._tasks)
+        previous_cores = read_core_times()
+        previous_time = start
+        while previous is not None and not self._stop_event.wait(self.interval):
+            current = read_process(self.pid, self._tasks)
+            if current is None:
+                break
+            now = time.monotonic()
+            cores = read_core_times()
+            elapsed = now - previous_time
+            core_load = tuple(
+                round(100 * (busy - previous_cores[core][0]) / (total - previous_cores[core][1]))
+                if core in previous_cores and total > previous_cores[core][1] else 0
+                for core, (busy, total) in sorted(cores.items())
+            )
+            self.samples.append(ResourceSample(
+                elapsed_s=round(now - start, 3),
+                cpu_percent=round(100 * (current["cpu_ticks"] - previous["cpu_ticks"]) / CLOCK_TICKS / elapsed, 1),
+                threads=current["threads"],
+                rss_kb=current["rss_kb"],
+                read_bytes=current["read_bytes"],
+                write_bytes=current["write_bytes"],
+                voluntary_ctxt=current["voluntary_ctxt"],
+                nonvoluntary_ctxt=current["nonvoluntary_ctxt"],
+                run_delay_ms=round(current["run_delay_ns"] / 1e6, 1),
+                core_load=core_load
+            ))
+            previous, previous_cores, previous_time = current, cores, now
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+def rapl_zones(powercap_dir=POWERCAP_DIR):
+    """
+    Zones RAPL de premier niveau (un paquet CPU chacune: intel-rapl:0, intel-rapl:1...).
+    Les sous-zones (core, uncore, dram) sont ignorées: leur énergie est déjà comptée dans le paquet.
+    """
+    try:
+        names = os.listdir(powercap_dir)
+    except OSError:
+        return []
+    return sorted(os.path.join(powercap_dir, name) for name in names if re.fullmatch(r'intel-rapl:\d+', name))
+
+def read_rapl_energy(zones=None):
+    """
+    Retourne {zone: (énergie cumulée en µJ, valeur maximale du compteur en µJ)} pour chaque zone
+    RAPL lisible; dictionnaire vide sans RAPL ou sans droit de lecture (energy_uj est souvent
+    réservé à root).
+    """
+    energy = {}
+    for zone in rapl_zones() if zones is None else zones:
+        try:
+            energy[zone] = (
+                int(_read(os.path.join(zone, "energy_uj"))),
+                int(_read(os.path.join(zone, "max_energy_range_uj")))
+            )
+        except (OSError, ValueError):
+            continue
+    return energy
+
+def rapl_energy_j(start, end):
+    """
+    Énergie consommée (joules) par les paquets CPU entre deux lectures de read_rapl_energy,
+    en tenant compte du rebouclage des compteurs; None si RAPL n'est pas disponible.
+    """
+    if not start or not end:
+        return None
+    total = 0
+    for zone, (before, max_range) in start.items():
+        if zone not in end:
+            continue
+        delta = end[zone][0] - before
+        total += delta if delta >= 0 else delta + max_range
+    return round(total / 1e6, 3)
+
+def summarize_resources(samples):
+    """
+    Agrège une série d'échantillons en colonnes de résultats (voir RESOURCE_FIELDS).
+    Les compteurs cumulés (I/O, changements de contexte) sont ceux du dernier échantillon.
+    """
+    if not samples:
+        return dict.fromkeys(RESOURCE_FIELDS)
+    last = samples[-1]
+    cpu = [s.cpu_percent for s in samples]
+    return {
+        "cpu_percent_avg": round(sum(cpu) / len(cpu), 1),
+        "cpu_percent_max": max(cpu),
+        "threads_max": max(s.threads for s in samples),
+        "rss_kb_max": max(s.rss_kb for s in samples),
+        "read_bytes": last.read_bytes,
+        "write_bytes": last.write_bytes,
+        "voluntary_ctxt": last.voluntary_ctxt,
+        "nonvoluntary_ctxt": last.nonvoluntary_ctxt,
+        "run_delay_ms": last.run_delay_ms
+    }
+
+def write_resource_series(results, csv_file="benchmark_resources.csv"):
+    """
+    Enregistre la série temporelle de ressources de chaque résultat (une ligne par échantillon).
+    La charge par cœur est compactée en une seule colonne "12;97;...".
+    """
+    key_fields = ["source", "codec", "preset", "bitrate", "iteration", "acceleration"]
+    with open(csv_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(key_fields + list(ResourceSample._fields))
+        for result in results:
+            key = [result.get(field, "") for field in key_fields]
+            for sample in result.get("resources", []):
+                writer.writerow(key + list(sample[:-1]) + [";".join(map(str, sample.core_load))])
+    logging.info(f"Les séries de ressources sont enregistrées dans : {csv_file}")
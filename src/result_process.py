@@ -1,56 +1,175 @@
 import csv
 import logging
+from quality import QUALITY_FIELDS
+from live import LATENCY_FIELDS
+from progress import STAGE_FIELDS
+from result_stats import summarize
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def process_results(csv_file):
     """
-    Traite les résultats du benchmark et affiche un résumé simple
+    Traite les résultats du benchmark et affiche un résumé statistique
     pour utime_s (CPU user time), rtime_s (wall-clock),
-    et maxrss_kb (max resident set size).
+    et maxrss_kb (max resident set size): moyenne, médiane, p95, écart-type,
+    intervalle de confiance bootstrap de la médiane et itérations aberrantes (MAD).
     """
     summary = {}
     try:
         with open(csv_file, "r") as f:
             reader = csv.DictReader(f)
             for row in reader:
-                key = (row["codec"], row["preset"], row["bitrate"], row["acceleration"])
+                # Runs interrupted by --min-speed have no meaningful timings
+                if row.get("aborted") == "True":
+                    continue
+                key = (row["codec"], row["preset"], row["bitrate"], row["acceleration"], row.get("sink") or "file")
                 if key not in summary:
                     summary[key] = {
-                        "total_utime": 0,
-                        "total_rtime": 0,
-                        "total_rss": 0,
-                        "count": 0
+                        "utime_s": [],
+                        "rtime_s": [],
+                        "maxrss_kb": [],
+                        "iterations": [],
+                        "output_kbps": [],
+                        "quality": {field: [] for field in QUALITY_FIELDS},
+                        "latency": {field: [] for field in LATENCY_FIELDS},
+                        "stages": {field: [] for field in STAGE_FIELDS}
                     }
                 try:
-                    summary[key]["total_utime"] += float(row["utime_s"])
-                    summary[key]["total_rtime"] += float(row["rtime_s"])
-                    summary[key]["total_rss"] += float(row["maxrss_kb"])
-                    summary[key]["count"] += 1
+                    utime = float(row["utime_s"])
+                    rtime = float(row["rtime_s"])
+                    rss = float(row["maxrss_kb"])
                 except ValueError:
                     logging.warning(f"Valeur invalide dans la ligne: {row}")
                     continue
+                summary[key]["utime_s"].append(utime)
+                summary[key]["rtime_s"].append(rtime)
+                summary[key]["maxrss_kb"].append(rss)
+                summary[key]["iterations"].append(row["iteration"])
+                if row.get("output_kbps"):
+                    summary[key]["output_kbps"].append(float(row["output_kbps"]))
+                for field in QUALITY_FIELDS:
+                    if row.get(field):
+                        summary[key]["quality"][field].append(float(row[field]))
+                for field in LATENCY_FIELDS:
+                    if row.get(field):
+                        summary[key]["latency"][field].append(float(row[field]))
+                for field in STAGE_FIELDS:
+                    if row.get(field):
+                        summary[key]["stages"][field].append(float(row[field]))
     except FileNotFoundError:
         logging.error(f"Fichier CSV non trouvé: {csv_file}")
         return
     except Exception as e:
         logging.error(f"Erreur lors de la lecture du fichier CSV: {e}")
         return
-    
+
     logging.info("\n=== Résumé des Résultats (CPU time, wall-clock, maxrss) ===")
     for key, value in summary.items():
-        codec, preset, bitrate, acceleration = key
-        n = value["count"]
-        if n > 0:
-            avg_utime = value["total_utime"] / n
-            avg_rtime = value["total_rtime"] / n
-            avg_rss   = value["total_rss"] / n
-        else:
-            avg_utime = avg_rtime = avg_rss = 0
-        
+        codec, preset, bitrate, acceleration, sink = key
+        utime = summarize(value["utime_s"])
+        rtime = summarize(value["rtime_s"])
+        rss = summarize(value["maxrss_kb"])
+
+        outliers = sorted(set(utime["outliers"]) | set(rtime["outliers"]))
+        outlier_line = ""
+        if outliers:
+            outlier_line = (
+                f"  Itérations aberrantes (MAD): "
+                f"{', '.join(value['iterations'][i] for i in outliers)}\n"
+            )
+
+        quality_lines = "".join(
+            f"  {field} moyen: {sum(scores) / len(scores):.3f}\n"
+            for field, scores in value["quality"].items() if scores
+        )
+
+        output_line = ""
+        if value["output_kbps"]:
+            output_line = f"  Débit obtenu (output_kbps) médian: {summarize(value['output_kbps'])['median']:.1f}\n"
+
+        latency_lines = "".join(
+            f"  {field} médian: {summarize(values)['median']:.2f}\n"
+            for field, values in value["latency"].items() if values
+        )
+
+        stage_line = ""
+        if any(value["stages"].values()):
+            stage_line = "  Étapes (médianes): " + ", ".join(
+                f"{field} {summarize(values)['median']:.3f}" for field, values in value["stages"].items() if values
+            ) + "\n"
+
+        logging.info(
+            f"Codec: {codec}, Preset: {preset}, Bitrate: {bitrate}, Accélération: {acceleration}, Sortie: {sink}\n"
+            f"  Itérations: {rtime['n']}\n"
+            f"  Temps CPU (utime_s): moyenne {utime['mean']:.2f}, médiane {utime['median']:.2f}, "
+            f"p95 {utime['p95']:.2f}, écart-type {utime['stddev']:.2f}, "
+            f"IC95 [{utime['ci_low']:.2f}, {utime['ci_high']:.2f}]\n"
+            f"  Temps total (rtime_s): moyenne {rtime['mean']:.2f}, médiane {rtime['median']:.2f}, "
+            f"p95 {rtime['p95']:.2f}, écart-type {rtime['stddev']:.2f}, "
+            f"IC95 [{rtime['ci_low']:.2f}, {rtime['ci_high']:.2f}]\n"
+            f"  maxrss_kB: moyenne {rss['mean']:.0f}, médiane {rss['median']:.0f}, p95 {rss['p95']:.0f}\n"
+            f"{outlier_line}"
+            f"{output_line}"
+            f"{stage_line}"
+            f"{quality_lines}"
+            f"{latency_lines}"
+        )
+
+def report_variants(csv_file, field, baseline, variants=None):
+    """
+    Compare les variantes d'une même configuration qui ne diffèrent que par la colonne `field`:
+    pour chaque configuration mesurée avec la valeur `baseline`, la médiane de rtime_s de chaque
+    autre valeur est comparée à la sienne. Avec field="sink" et baseline="null", l'écart est le
+    temps réel perdu en E/S de sortie; avec field="acceleration" et baseline="vaapi", c'est le
+    gain ou la perte des autres pipelines par rapport à l'envoi des images au GPU (hwupload).
+    `variants` restreint les valeurs comparées à la référence (ex: les seuls pipelines VAAPI,
+    sans les encodeurs logiciels du même balayage); par défaut toutes le sont.
+    Retourne la liste des comparaisons (dictionnaires).
+    """
+    config_fields = [name for name in ("source", "codec", "preset", "bitrate", "acceleration", "sink") if name != field]
+    rtimes = {}
+    try:
+        with open(csv_file, "r") as f:
+            for row in csv.DictReader(f):
+                if row.get("aborted") == "True" or not row.get("rtime_s"):
+                    continue
+                # Rows written before output sinks existed all went to a file
+                row.setdefault("sink", "file")
+                row["sink"] = row["sink"] or "file"
+                if variants is not None and row[field] != baseline and row[field] not in variants:
+                    continue
+                config = tuple(row[name] for name in config_fields)
+                rtimes.setdefault(config, {}).setdefault(row[field], []).append(float(row["rtime_s"]))
+    except FileNotFoundError:
+        logging.error(f"Fichier CSV non trouvé: {csv_file}")
+        return []
+
+    rows = []
+    for config, by_variant in sorted(rtimes.items()):
+        if baseline not in by_variant:
+            continue
+        baseline_rtime = summarize(by_variant[baseline])["median"]
+        for variant, values in sorted(by_variant.items()):
+            if variant == baseline:
+                continue
+            median = summarize(values)["median"]
+            rows.append({
+                "config": config,
+                "variant": variant,
+                "rtime_s": median,
+                "baseline_rtime_s": baseline_rtime,
+                "delta_s": median - baseline_rtime,
+                "delta_pct": (median - baseline_rtime) / baseline_rtime * 100 if baseline_rtime else 0.0
+            })
+
+    if not rows:
+        logging.info(f"Aucune configuration mesurée à la fois avec {field}={baseline} et une autre valeur.")
+        return rows
+    logging.info(f"\n=== Comparaison des variantes de {field} (rtime_s médian comparé à {baseline}) ===")
+    for row in rows:
         logging.info(
-            f"Codec: {codec}, Preset: {preset}, Bitrate: {bitrate}, Accélération: {acceleration}\n"
-            f"  Temps CPU moyen (utime_s): {avg_utime:.2f}\n"
-            f"  Temps total moyen (rtime_s): {avg_rtime:.2f}\n"
-            f"  maxrss_kB moyen: {avg_rss:.0f}\n"
+            f"{' '.join(row['config'])} - {row['variant']}: "
+            f"{row['rtime_s']:.3f}s contre {row['baseline_rtime_s']:.3f}s "
+            f"({row['delta_s']:+.3f}s, {row['delta_pct']:+.1f}%)"
         )
+    return rows
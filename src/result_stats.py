@@ -0,0 +1,96 @@
+import math
+import random
+import statistics
+
+# Scale factor making the MAD a consistent estimator of the standard deviation for normal data
+MAD_SCALE = 1.4826
+
+def percentile(values, p):
+    """
+    Percentile `p` (0-100) par interpolation linéaire entre les rangs.
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * p / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def bootstrap_ci(values, stat=statistics.median, confidence=0.95, resamples=2000, seed=0):
+    """
+    Intervalle de confiance bootstrap (méthode des percentiles) de `stat` sur `values`.
+    Le tirage est déterministe (`seed`) pour que deux analyses des mêmes données concordent.
+    """
+    if len(values) < 2:
+        value = stat(values) if values else 0.0
+        return value, value
+    rng = random.Random(seed)
+    n = len(values)
+    estimates = [stat(rng.choices(values, k=n)) for _ in range(resamples)]
+    alpha = (1 - confidence) / 2
+    return percentile(estimates, 100 * alpha), percentile(estimates, 100 * (1 - alpha))
+
+def mad_outliers(values, threshold=3.5):
+    """
+    Indices des valeurs aberrantes selon le z-score robuste |x - médiane| / (1.4826 x MAD).
+    """
+    if len(values) < 3:
+        return []
+    med = statistics.median(values)
+    mad = statistics.median(abs(v - med) for v in values)
+    if mad == 0:
+        return []
+    return [i for i, v in enumerate(values) if abs(v - med) / (MAD_SCALE * mad) > threshold]
+
+def relative_ci_width(values, confidence=0.95):
+    """
+    Largeur de l'intervalle de confiance de la médiane rapportée à la médiane (0.02 = 2%).
+    Retourne l'infini tant qu'il n'y a pas assez de mesures pour conclure.
+    """
+    if len(values) < 3:
+        return math.inf
+    med = statistics.median(values)
+    if med == 0:
+        return math.inf
+    low, high = bootstrap_ci(values, confidence=confidence)
+    return (high - low) / med
+
+def summarize(values, confidence=0.95):
+    """
+    Statistiques descriptives d'une série de mesures:
+    n, mean, median, p95, stddev, ci_low / ci_high (médiane, bootstrap) et outliers (indices MAD).
+    """
+    if not values:
+        return {"n": 0, "mean": 0.0, "median": 0.0, "p95": 0.0, "stddev": 0.0,
+                "ci_low": 0.0, "ci_high": 0.0, "outliers": []}
+    ci_low, ci_high = bootstrap_ci(values, confidence=confidence)
+    return {
+        "n": len(values),
+        "mean": statistics.fmean(values),
+        "median": statistics.median(values),
+        "p95": percentile(values, 95),
+        "stddev": statistics.stdev(values) if len(values) > 1 else 0.0,
+        "ci_low": ci_low,
+        "ci_high": ci_high,
+        "outliers": mad_outliers(values),
+    }
+
+def bootstrap_ratio_ci(candidate, baseline, stat=statistics.median, confidence=0.95, resamples=2000, seed=0):
+    """
+    Intervalle de confiance bootstrap du rapport stat(candidate) / stat(baseline),
+    les deux échantillons étant rééchantillonnés indépendamment.
+    Retourne None si l'un des échantillons compte moins de deux mesures.
+    """
+    if len(candidate) < 2 or len(baseline) < 2:
+        return None
+    rng = random.Random(seed)
+    ratios = []
+    for _ in range(resamples):
+        base = stat(rng.choices(baseline, k=len(baseline)))
+        if base > 0:
+            ratios.append(stat(rng.choices(candidate, k=len(candidate))) / base)
+    if not ratios:
+        return None
+    alpha = (1 - confidence) / 2
+    return percentile(ratios, 100 * alpha), percentile(ratios, 100 * (1 - alpha))
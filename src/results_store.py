@@ -0,0 +1,277 @@
+import os
+import socket
+import logging
+import sqlite3
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from quality import QUALITY_FIELDS
+from resource_sampler import RESOURCE_FIELDS
+from live import LATENCY_FIELDS
+from progress import STAGE_FIELDS
+from environment import ENVIRONMENT_FIELDS
+from result_stats import bootstrap_ratio_ci
+from vaapi_detect import get_vainfo_output, parse_vainfo_driver_version
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_DB = "benchmark_results.db"
+
+# Columns of a stored result row (in addition to run_id) and their SQLite type
+RESULT_COLUMNS = {
+    "source": "TEXT",
+    "codec": "TEXT",
+    "preset": "TEXT",
+    "bitrate": "TEXT",
+    "acceleration": "TEXT",
+    "iteration": "INTEGER",
+    "utime_s": "REAL",
+    "rtime_s": "REAL",
+    "maxrss_kb": "REAL",
+    "cpus": "TEXT",
+    "device": "TEXT",
+    "frames": "INTEGER",
+    "aborted": "INTEGER",
+    "sink": "TEXT",
+    "output_bytes": "INTEGER",
+    "output_kbps": "REAL",
+    "content_s": "REAL",
+    "energy_j": "REAL",
+    **{field: "REAL" for field in LATENCY_FIELDS},
+    **{field: "REAL" for field in STAGE_FIELDS},
+    **{field: "REAL" for field in QUALITY_FIELDS},
+    **{field: "REAL" for field in RESOURCE_FIELDS},
+    **{field: "INTEGER" if field in ("turbo", "smt", "numa_node") else "TEXT" for field in ENVIRONMENT_FIELDS}
+}
+
+CONFIG_COLUMNS = ["source", "codec", "preset", "bitrate", "acceleration", "sink"]
+
+# Rows stored before output sinks existed were all written to a file
+CONFIG_SELECT = ", ".join("COALESCE(sink, 'file')" if column == "sink" else column for column in CONFIG_COLUMNS)
+
+# Metrics where a higher value is better; for the others (timings, memory) lower is better
+HIGHER_IS_BETTER = set(QUALITY_FIELDS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    label TEXT,
+    host TEXT,
+    ffmpeg_version TEXT,
+    driver TEXT,
+    kernel TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id)
+);
+CREATE INDEX IF NOT EXISTS runs_by_label ON runs (label);
+"""
+
+def connect(db_path=DEFAULT_DB):
+    """
+    Ouvre (et crée si besoin) la base SQLite des résultats.
+    Les colonnes de résultats manquantes (bases créées par une version antérieure) sont ajoutées.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+    with conn:
+        for column, column_type in RESULT_COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE results ADD COLUMN {column} {column_type}")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS results_by_config "
+            "ON results (run_id, codec, preset, bitrate, acceleration)"
+        )
+    return conn
+
+def get_ffmpeg_version():
+    """
+    Retourne la première ligne de `ffmpeg -version` (ex: "ffmpeg version 6.1.1 ...").
+    """
+    try:
+        result = subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        return result.stdout.split('\n', 1)[0].strip()
+    except FileNotFoundError:
+        return ""
+
+def collect_run_metadata(label=None):
+    """
+    Décrit l'environnement de l'exécution courante: hôte, version de ffmpeg, pilote VAAPI, noyau.
+    """
+    return {
+        "label": label,
+        "host": socket.gethostname(),
+        "ffmpeg_version": get_ffmpeg_version(),
+        "driver": parse_vainfo_driver_version(get_vainfo_output()),
+        "kernel": platform.release()
+    }
+
+def save_run(results, metadata, db_path=DEFAULT_DB):
+    """
+    Enregistre une exécution et tous ses résultats; retourne l'identifiant de l'exécution.
+    """
+    conn = connect(db_path)
+    try:
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (created_at, label, host, ffmpeg_version, driver, kernel) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    metadata.get("label"),
+                    metadata.get("host"),
+                    metadata.get("ffmpeg_version"),
+                    metadata.get("driver"),
+                    metadata.get("kernel")
+                )
+            )
+            run_id = cursor.lastrowid
+            conn.executemany(
+                f"INSERT INTO results (run_id, {', '.join(RESULT_COLUMNS)}) "
+                f"VALUES (?, {', '.join('?' for _ in RESULT_COLUMNS)})",
+                ([run_id] + [result.get(column) for column in RESULT_COLUMNS] for result in results)
+            )
+    finally:
+        conn.close()
+    logging.info(f"Exécution n°{run_id} enregistrée dans : {db_path}")
+    return run_id
+
+# Rows that measured a complete encode: failed runs (rtime_s = 0) and runs stopped by --min-speed
+# or the job timeout would otherwise pull medians and estimates towards a fake speed-up
+VALID_RESULT = "rtime_s > 0 AND NOT COALESCE(aborted, 0)"
+
+def resolve_run(conn, ref):
+    """
+    Retourne l'identifiant d'exécution désigné par `ref`: un identifiant numérique,
+    "latest" (dernière exécution), "previous" (avant-dernière) ou un label (dernière exécution portant ce label).
+    """
+    if ref in ("latest", "previous"):
+        offset = 0 if ref == "latest" else 1
+        row = conn.execute("SELECT id FROM runs ORDER BY id DESC LIMIT 1 OFFSET ?", (offset,)).fetchone()
+    elif str(ref).isdigit():
+        row = conn.execute("SELECT id FROM runs WHERE id = ?", (int(ref),)).fetchone()
+    else:
+        row = conn.execute("SELECT id FROM runs WHERE label = ? ORDER BY id DESC LIMIT 1", (ref,)).fetchone()
+    if row is None:
+        raise ValueError(f"Exécution introuvable: {ref}")
+    return row[0]
+
+def load_run_metric(conn, run_id, metric):
+    """
+    Retourne {configuration: [valeurs de `metric`]} pour une exécution, jobs en échec ou interrompus exclus.
+    """
+    if metric not in RESULT_COLUMNS:
+        raise ValueError(f"Métrique inconnue: {metric}")
+    values = {}
+    query = (
+        f"SELECT {CONFIG_SELECT}, {metric} FROM results "
+        f"WHERE run_id = ? AND {metric} IS NOT NULL AND {VALID_RESULT}"
+    )
+    for row in conn.execute(query, (run_id,)):
+        values.setdefault(tuple(row[:-1]), []).append(row[-1])
+    return values
+
+def load_history(db_path=DEFAULT_DB, metric="rtime_s"):
+    """
+    Retourne {configuration: [valeurs de `metric`]} sur toutes les exécutions enregistrées,
+    jobs en échec ou interrompus exclus (dictionnaire vide si la base n'existe pas encore).
+    """
+    if metric not in RESULT_COLUMNS:
+        raise ValueError(f"Métrique inconnue: {metric}")
+    if not os.path.exists(db_path):
+        return {}
+    conn = connect(db_path)
+    try:
+        values = {}
+        query = f"SELECT {CONFIG_SELECT}, {metric} FROM results WHERE {metric} > 0 AND {VALID_RESULT}"
+        for row in conn.execute(query):
+            values.setdefault(tuple(row[:-1]), []).append(row[-1])
+        return values
+    finally:
+        conn.close()
+
+def describe_run(conn, run_id):
+    row = conn.execute(
+        "SELECT id, created_at, label, host, ffmpeg_version, driver, kernel FROM runs WHERE id = ?", (run_id,)
+    ).fetchone()
+    return dict(zip(["id", "created_at", "label", "host", "ffmpeg_version", "driver", "kernel"], row))
+
+def compare_runs(run_ref="latest", baseline_ref="previous", metric="rtime_s", threshold=0.05, db_path=DEFAULT_DB):
+    """
+    Compare une exécution à une exécution de référence, configuration par configuration.
+
+    Pour chaque configuration présente dans les deux exécutions, on calcule l'écart relatif
+    des médianes de `metric` et l'intervalle de confiance bootstrap de leur rapport.
+    Une configuration est en régression si l'écart dépasse `threshold` dans le mauvais sens
+    et que l'écart est significatif (IC du rapport excluant 1). Avec moins de deux mesures
+    d'un côté la significativité ne peut pas être évaluée: seul le seuil est appliqué.
+
+    Retourne la liste des comparaisons (dictionnaires) par configuration.
+    """
+    conn = connect(db_path)
+    try:
+        run_id = resolve_run(conn, run_ref)
+        baseline_id = resolve_run(conn, baseline_ref)
+        run, baseline = describe_run(conn, run_id), describe_run(conn, baseline_id)
+        candidate_values = load_run_metric(conn, run_id, metric)
+        baseline_values = load_run_metric(conn, baseline_id, metric)
+    finally:
+        conn.close()
+
+    logging.info(
+        f"Comparaison de l'exécution n°{run['id']} ({run['created_at']}, {run['host']}, {run['ffmpeg_version']}) "
+        f"à la référence n°{baseline['id']} ({baseline['created_at']}, {baseline['host']}, {baseline['ffmpeg_version']})"
+    )
+    for field in ("ffmpeg_version", "driver", "kernel"):
+        if run[field] != baseline[field]:
+            logging.info(f"  {field}: {baseline[field]} -> {run[field]}")
+
+    worse_sign = -1 if metric in HIGHER_IS_BETTER else 1
+    comparisons = []
+    for config in sorted(set(candidate_values) & set(baseline_values)):
+        candidate, base = candidate_values[config], baseline_values[config]
+        base_median = statistics.median(base)
+        candidate_median = statistics.median(candidate)
+        delta = (candidate_median - base_median) / base_median if base_median else 0.0
+        ci = bootstrap_ratio_ci(candidate, base)
+        significant = None if ci is None else (ci[0] > 1 or ci[1] < 1)
+        regression = worse_sign * delta > threshold and significant is not False
+        comparisons.append({
+            "config": config,
+            "baseline_median": base_median,
+            "median": candidate_median,
+            "delta": delta,
+            "ratio_ci": ci,
+            "significant": significant,
+            "regression": regression
+        })
+
+    for config in sorted(set(baseline_values) - set(candidate_values)):
+        logging.warning(f"Configuration absente de l'exécution comparée: {config}")
+
+    return comparisons
+
+def report_comparison(comparisons, metric="rtime_s"):
+    """
+    Affiche le résultat de compare_runs et retourne le nombre de régressions.
+    """
+    logging.info(f"\n=== Comparaison ({metric}) ===")
+    for c in comparisons:
+        source, codec, preset, bitrate, acceleration, sink = c["config"]
+        ci = f"[{c['ratio_ci'][0]:.3f}, {c['ratio_ci'][1]:.3f}]" if c["ratio_ci"] else "n/a"
+        status = "RÉGRESSION" if c["regression"] else "ok"
+        significance = {True: "significatif", False: "non significatif", None: "significativité inconnue"}[c["significant"]]
+        line = (
+            f"{status}: {source} {codec} {preset} {bitrate} {acceleration} {sink} - "
+            f"{c['baseline_median']:.3f} -> {c['median']:.3f} ({c['delta'] * 100:+.1f}%, "
+            f"IC95 du rapport {ci}, {significance})"
+        )
+        if c["regression"]:
+            logging.warning(line)
+        else:
+            logging.info(line)
+    regressions = sum(1 for c in comparisons if c["regression"])
+    logging.info(f"{regressions} régression(s) sur {len(comparisons)} configuration(s) comparée(s).")
+    return regressions
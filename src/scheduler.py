@@ -0,0 +1,271 @@
+import os
+import time
+import queue
+import shutil
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from result_stats import relative_ci_width
+from events import publish
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+TASKSET_PATH = shutil.which("taskset")
+
+def available_cpus():
+    """
+    Retourne la liste triée des cœurs sur lesquels le processus courant peut s'exécuter.
+    """
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        # Plateformes sans sched_getaffinity (macOS, Windows)
+        return list(range(os.cpu_count() or 1))
+
+def partition_cpus(cpus, slots):
+    """
+    Découpe `cpus` en `slots` ensembles contigus et disjoints de tailles équilibrées.
+    Exemple: partition_cpus([0, 1, 2, 3, 4], 2) -> [[0, 1, 2], [3, 4]]
+    """
+    slots = max(1, min(slots, len(cpus)))
+    size, extra = divmod(len(cpus), slots)
+    core_sets = []
+    start = 0
+    for i in range(slots):
+        end = start + size + (1 if i < extra else 0)
+        core_sets.append(cpus[start:end])
+        start = end
+    return core_sets
+
+def format_cpus(cpus):
+    """
+    Formate une liste de cœurs au format taskset: [0, 1, 2, 5] -> "0-2,5".
+    """
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(f"{a}-{b}" if a != b else f"{a}" for a, b in ranges)
+
+def pinned_command(cmd, cpus=None):
+    """
+    Préfixe `cmd` par `taskset` pour l'épingler sur `cpus` (l'affinité est posée avant l'exec,
+    donc héritée par tous les threads de ffmpeg). Sans taskset la commande est inchangée et
+    l'appelant applique pin_process après le lancement.
+    """
+    if cpus and TASKSET_PATH:
+        return [TASKSET_PATH, "-c", format_cpus(cpus)] + list(cmd)
+    return list(cmd)
+
+def pin_process(pid, cpus=None):
+    """
+    Épingle un processus déjà lancé sur `cpus` avec sched_setaffinity, à défaut de taskset.
+    """
+    if cpus and not TASKSET_PATH:
+        try:
+            os.sched_setaffinity(pid, cpus)
+        except (AttributeError, OSError) as e:
+            logging.warning(f"Impossible d'épingler le processus {pid} sur {format_cpus(cpus)}: {e}")
+
+def popen_pinned(cmd, cpus=None, **kwargs):
+    """
+    Lance `cmd` avec subprocess.Popen en l'épinglant sur `cpus` si fourni.
+    """
+    process = subprocess.Popen(pinned_command(cmd, cpus), **kwargs)
+    pin_process(process.pid, cpus)
+    return process
+
+def run_jobs(jobs, run_job, concurrency=1, isolate=False, devices=None, sessions_per_device=1, on_result=None):
+    """
+    Exécute `run_job(job, cpus)` pour chaque job avec au plus `concurrency` jobs simultanés.
+
+    Avec `isolate`, chaque worker reçoit un ensemble de cœurs disjoint et `cpus` contient
+    cet ensemble; sinon `cpus` vaut None et les jobs partagent toute la machine.
+    Chaque résultat reçoit une colonne "cpus" avec l'ensemble de cœurs utilisé.
+    Avec `devices`, les jobs sont répartis sur une file par périphérique (voir run_device_jobs).
+    `on_result(result)` est appelé dès qu'un job se termine, une fois ces colonnes ajoutées.
+    Les résultats sont renvoyés dans l'ordre de `jobs`, comme pour une exécution série;
+    les jobs en échec (résultat None) sont ignorés.
+    """
+    if devices:
+        return run_device_jobs(jobs, run_job, devices, sessions_per_device, isolate, on_result)
+
+    cpus = available_cpus()
+    concurrency = max(1, concurrency)
+    if isolate:
+        core_sets = partition_cpus(cpus, concurrency)
+        if len(core_sets) < concurrency:
+            logging.warning(f"Seulement {len(cpus)} cœurs disponibles: concurrence réduite à {len(core_sets)}.")
+        concurrency = len(core_sets)
+    else:
+        core_sets = [cpus] * concurrency
+
+    slots = queue.Queue()
+    for core_set in core_sets:
+        slots.put(core_set)
+
+    def worker(job):
+        core_set = slots.get()
+        try:
+            result = run_job(job, core_set if isolate else None)
+            if result is not None:
+                result["cpus"] = format_cpus(core_set)
+                if on_result is not None:
+                    on_result(result)
+            return result
+        finally:
+            slots.put(core_set)
+
+    if concurrency == 1:
+        outcomes = [worker(job) for job in jobs]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(worker, jobs))
+
+    return [result for result in outcomes if result is not None]
+
+def run_device_jobs(jobs, run_job, devices, sessions_per_device=1, isolate=False, on_result=None):
+    """
+    Répartit les jobs sur une file par périphérique (ex: un GPU) puis exécute
+    `run_job(job, cpus, device=device)` avec `sessions_per_device` workers par file.
+
+    Les jobs sont distribués à tour de rôle entre les files. Chaque résultat reçoit les colonnes
+    "device", "cpus", ainsi que "started_s" / "finished_s" (horloge monotone, en secondes)
+    qui permettent de calculer le débit de chaque périphérique.
+    """
+    cpus = available_cpus()
+    workers = len(devices) * max(1, sessions_per_device)
+    core_sets = partition_cpus(cpus, workers) if isolate else [cpus]
+
+    queues = {device: queue.Queue() for device in devices}
+    for index, job in enumerate(jobs):
+        queues[devices[index % len(devices)]].put((index, job))
+
+    outcomes = [None] * len(jobs)
+
+    def worker(device, core_set):
+        pending = queues[device]
+        while True:
+            try:
+                index, job = pending.get_nowait()
+            except queue.Empty:
+                return
+            started = time.monotonic()
+            try:
+                result = run_job(job, core_set if isolate else None, device=device)
+            except Exception as e:
+                logging.error(f"Exception sur {device}: {e}")
+                result = None
+            if result is not None:
+                result["device"] = device
+                result["cpus"] = format_cpus(core_set)
+                result["started_s"] = round(started, 3)
+                result["finished_s"] = round(time.monotonic(), 3)
+                if on_result is not None:
+                    on_result(result)
+            outcomes[index] = result
+
+    threads = []
+    for w in range(workers):
+        device = devices[w % len(devices)]
+        thread = threading.Thread(target=worker, args=(device, core_sets[w % len(core_sets)]), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    return [result for result in outcomes if result is not None]
+
+def job_label(job, prefix=""):
+    """
+    Libellé d'un job (config, i, is_warmup) pour les événements du bus (voir events.py).
+    """
+    config, i, is_warmup = job
+    parts = [prefix] if prefix else []
+    parts += [str(value) for value in (config if isinstance(config, tuple) else (config,))]
+    parts.append(f"échauffement {-i}" if is_warmup else f"#{i + 1}")
+    return " ".join(parts)
+
+def publish_finished(label, result, **fields):
+    rtime = result.get("rtime_s") if result is not None else None
+    frames = result.get("frames") if result is not None else None
+    publish("job_finished", job=label, rtime_s=rtime, aborted=bool(result and result.get("aborted")),
+            fps=frames / rtime if frames and rtime else None, **fields)
+
+class MatrixPlan:
+    """
+    Déroulement d'une matrice de configurations, indépendant de la façon d'exécuter les jobs
+    (moteur asyncio de engine.py).
+
+    Chaque job est un tuple (config, i, is_warmup). first_round() retourne l'échauffement puis
+    les 'iteration_count' itérations non encore terminées, next_round() les itérations
+    adaptatives suivantes (None quand il n'y en a plus); record() est appelé avec le résultat
+    de chaque job et retourne None pour les jobs d'échauffement.
+    Avec `target_ci` (ex: 0.02 pour 2%), les configurations dont l'intervalle de confiance
+    de la médiane de `metric` est plus large sont relancées une itération à la fois, jusqu'à
+    convergence, `max_iterations` atteint ou épuisement de `time_budget` secondes.
+    `completed` ({(config, i): résultat}, ex: JobJournal.completed_jobs) liste les jobs déjà
+    terminés lors d'une exécution précédente: ils ne sont pas relancés mais comptent pour
+    les itérations adaptatives; l'échauffement d'une configuration entièrement terminée est sauté.
+    """
+
+    def __init__(self, configs, iteration_count=1, warmup=0, target_ci=None, time_budget=None,
+                 max_iterations=50, metric="rtime_s", completed=None):
+        self.configs = list(configs)
+        self.iteration_count = iteration_count
+        self.warmup = warmup
+        self.target_ci = target_ci
+        self.time_budget = time_budget
+        self.max_iterations = max_iterations
+        self.metric = metric
+        self.completed = completed or {}
+        self.measured = {config: [] for config in self.configs}
+        for (config, _), result in self.completed.items():
+            if config in self.measured:
+                self.measured[config].append(result[metric])
+        self._iteration = iteration_count
+        self._deadline = None
+
+    def first_round(self):
+        remaining = [
+            (config, i) for config in self.configs for i in range(self.iteration_count)
+            if (config, i) not in self.completed
+        ]
+        done = len(self.configs) * self.iteration_count - len(remaining)
+        if done:
+            logging.info(f"{done} job(s) déjà terminé(s) ignoré(s)")
+        warm = sorted({config for config, _ in remaining}, key=self.configs.index)
+        jobs = [(config, -w - 1, True) for config in warm for w in range(self.warmup)]
+        jobs += [(config, i, False) for config, i in remaining]
+        publish("planned", jobs=len(jobs))
+        return jobs
+
+    def record(self, job, result):
+        config, _, is_warmup = job
+        if is_warmup:
+            return None
+        if result is not None:
+            self.measured[config].append(result[self.metric])
+        return result
+
+    def next_round(self):
+        if self.target_ci is None or self._iteration >= self.max_iterations:
+            return None
+        # The time budget only covers the adaptive iterations
+        if self.time_budget and self._deadline is None:
+            self._deadline = time.monotonic() + self.time_budget
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            logging.warning("Budget de temps épuisé: arrêt des itérations adaptatives.")
+            return None
+        pending = [config for config in self.configs if relative_ci_width(self.measured[config]) > self.target_ci]
+        if not pending:
+            return None
+        iteration = self._iteration
+        self._iteration += 1
+        logging.info(f"Itération adaptative {iteration + 1}: {len(pending)} configuration(s) non convergée(s)")
+        jobs = [(config, iteration, False) for config in pending if (config, iteration) not in self.completed]
+        publish("planned", jobs=len(jobs))
+        return jobs
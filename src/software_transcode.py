@@ -1,105 +1,61 @@
-import subprocess
-import os
 import logging
-import re
-from config import PRESETS, BITRATES
-# Removed ITERATION_COUNT import, because we'll pass it in as a function parameter.
+from config import PRESETS
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def build_software_command(source, target, codec, bitrate, preset):
-    # (same as before)
+def x265_frame_threads(threads):
+    """
+    Nombre de frame-threads retenu par x265 pour `threads` cœurs (même heuristique que x265).
+    """
+    for cores, frame_threads in ((32, 6), (16, 5), (8, 3), (4, 2)):
+        if threads >= cores:
+            return frame_threads
+    return 1
+
+def build_software_threading_args(codec, threads, sliced_threads=False):
+    """
+    Options fixant le nombre de threads de l'encodeur logiciel.
+    libx264 reçoit -threads (et sliced-threads si demandé), libx265 un pool de `threads`
+    workers et le nombre de frame-threads correspondant.
+    """
+    args = ["-threads", str(threads)]
+    if codec == "hevc":
+        args += ["-x265-params", f"pools={threads}:frame-threads={x265_frame_threads(threads)}"]
+    elif sliced_threads:
+        args += ["-x264-params", f"threads={threads}:sliced-threads=1"]
+    return args
+
+def build_software_encoder_args(codec, bitrate, preset, threads=None, sliced_threads=False):
+    """
+    Options d'encodage logiciel d'une sortie, partagées par les commandes simples et multi-sorties.
+    Sans `threads`, l'encodeur choisit lui-même son nombre de threads.
+    """
     codec_map = {
         "h264": "libx264",
         "hevc": "libx265"
     }
 
-    cmd = [
-        "ffmpeg",
-        "-benchmark",
-        "-y", "-hide_banner",
-        "-i", source,
+    args = [
         "-c:v", codec_map.get(codec, "libx264"),
         "-preset", PRESETS[preset]["preset"],
         "-crf", PRESETS[preset]["crf"],
-        "-b:v", bitrate,
-        target
+        "-b:v", bitrate
     ]
-    return cmd
-
-def extract_metrics(stderr):
-    # (same as before)
-    metrics = {
-        'utime_s': 0.0,
-        'rtime_s': 0.0,
-        'maxrss_kb': 0
-    }
-    # parse utime, rtime, maxrss...
-    bench_match = re.search(
-        r'bench:\s*utime=([\d\.]+)s\s*stime=([\d\.]+)s\s*rtime=([\d\.]+)s',
-        stderr
-    )
-    if bench_match:
-        try:
-            metrics['utime_s'] = float(bench_match.group(1))
-            metrics['rtime_s'] = float(bench_match.group(3))
-        except ValueError:
-            pass
-
-    rss_match = re.search(r'bench:\s*maxrss=(\d+)kB', stderr)
-    if rss_match:
-        try:
-            metrics['maxrss_kb'] = int(rss_match.group(1))
-        except ValueError:
-            pass
+    if threads:
+        args += build_software_threading_args(codec, threads, sliced_threads)
+    return args
 
-    return metrics
-
-def transcode_software(source, codec, iteration_count=1):
+def build_software_command(source, target, codec, bitrate, preset, input_args=None, threads=None, sliced_threads=False):
     """
-    Effectue le transcodage logiciel pour un codec donné (H.264 ou HEVC).
-    On répète chaque test 'iteration_count' fois.
+    Construit la commande de transcodage logiciel.
+    `input_args` remplace l'entrée par défaut ["-i", source] (ex: entrée du cache d'images).
     """
-    results = []
-    os.makedirs("transcoded_outputs", exist_ok=True)
-
-    for preset in PRESETS:
-        for bitrate in BITRATES:
-            for i in range(iteration_count):
-                target_file = (
-                    f"transcoded_outputs/"
-                    f"{os.path.basename(source).replace('.mp4','')}_{codec}_{bitrate}_{preset}_{i}.mp4"
-                )
-                cmd = build_software_command(source, target_file, codec, bitrate, preset)
-                logging.info(f"Exécution de la commande: {' '.join(cmd)}")
-
-                try:
-                    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                    stdout, stderr = process.communicate()
-
-                    metrics = extract_metrics(stderr)
-
-                    results.append({
-                        "source": source,
-                        "codec": codec,
-                        "preset": preset,
-                        "bitrate": bitrate,
-                        "iteration": i + 1,
-                        "utime_s": metrics['utime_s'],
-                        "rtime_s": metrics['rtime_s'],
-                        "maxrss_kb": metrics['maxrss_kb']
-                    })
-
-                    logging.info(
-                        f"Terminé: {target_file} - "
-                        f"utime_s={metrics['utime_s']:.2f}, "
-                        f"rtime_s={metrics['rtime_s']:.2f}, "
-                        f"maxrss_kb={metrics['maxrss_kb']}"
-                    )
-                except Exception as e:
-                    logging.error(f"Exception lors du transcodage de {target_file}: {e}")
-
-                if os.path.exists(target_file):
-                    os.remove(target_file)
-
-    return results
+    cmd = [
+        "ffmpeg",
+        "-benchmark",
+        "-y", "-hide_banner",
+        *(input_args or ["-i", source]),
+        *build_software_encoder_args(codec, bitrate, preset, threads, sliced_threads),
+        target
+    ]
+    return cmd
@@ -0,0 +1,143 @@
+import os
+import json
+import hashlib
+import logging
+import subprocess
+from frame_cache import file_checksum
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_SYNTHETIC_DIR = "samples/synthetic"
+
+RESOLUTIONS = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "2160p": (3840, 2160)
+}
+
+PIX_FMTS = {
+    8: "yuv420p",
+    10: "yuv420p10le"
+}
+
+# lavfi sources by motion complexity, all deterministic:
+#  - low: testsrc2, a mostly static pattern with small moving parts
+#  - medium: mandelbrot zoom, detail that changes everywhere but smoothly
+#  - high: testsrc2 with seeded temporal noise, which defeats motion prediction
+MOTION_SOURCES = {
+    "low": "testsrc2=size={width}x{height}:rate={fps}",
+    "medium": "mandelbrot=size={width}x{height}:rate={fps}",
+    "high": "testsrc2=size={width}x{height}:rate={fps},noise=alls=30:allf=t+u:all_seed=1"
+}
+
+# Near-lossless mezzanine, encoded with the codec the sweep expects for the source
+MEZZANINE_ENCODERS = {
+    "h264": ["-c:v", "libx264", "-preset", "veryfast", "-crf", "12"],
+    "hevc": ["-c:v", "libx265", "-preset", "veryfast", "-crf", "14"]
+}
+
+def parse_resolution(resolution):
+    """
+    "1080p" -> (1920, 1080); "1280x720" -> (1280, 720).
+    """
+    if resolution in RESOLUTIONS:
+        return RESOLUTIONS[resolution]
+    try:
+        width, height = resolution.lower().split("x")
+        return int(width), int(height)
+    except ValueError:
+        raise ValueError(f"Résolution inconnue: {resolution} (attendu {', '.join(RESOLUTIONS)} ou LxH)")
+
+def clip_params(resolution="1080p", duration=60, fps=30, bit_depth=8, motion="medium", codec="h264"):
+    """
+    Paramètres normalisés d'un clip synthétique; ils déterminent entièrement son contenu.
+    """
+    if bit_depth not in PIX_FMTS:
+        raise ValueError(f"Profondeur de couleur non supportée: {bit_depth} bits")
+    if motion not in MOTION_SOURCES:
+        raise ValueError(f"Complexité de mouvement inconnue: {motion}")
+    if codec not in MEZZANINE_ENCODERS:
+        raise ValueError(f"Codec de source synthétique non supporté: {codec}")
+    width, height = parse_resolution(resolution)
+    return {
+        "width": width,
+        "height": height,
+        "duration": float(duration),
+        "fps": int(fps),
+        "bit_depth": bit_depth,
+        "motion": motion,
+        "codec": codec
+    }
+
+def clip_key(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+def build_synthetic_command(params, target):
+    """
+    Commande ffmpeg générant un clip à partir d'une source lavfi.
+    """
+    graph = MOTION_SOURCES[params["motion"]].format(**params)
+    return [
+        "ffmpeg",
+        "-y", "-hide_banner", "-nostats",
+        "-f", "lavfi",
+        "-i", graph,
+        "-t", str(params["duration"]),
+        "-pix_fmt", PIX_FMTS[params["bit_depth"]],
+        *MEZZANINE_ENCODERS[params["codec"]],
+        "-g", str(2 * int(params["fps"])),
+        "-f", "mp4",
+        target
+    ]
+
+def generate_clip(params, directory=DEFAULT_SYNTHETIC_DIR):
+    """
+    Retourne le chemin du clip décrit par `params`, en le générant si nécessaire.
+
+    Les clips sont nommés d'après le hash de leurs paramètres et accompagnés d'un fichier .json
+    contenant les paramètres et le SHA-256 du clip. Un clip dont le checksum ne correspond plus
+    (fichier tronqué ou modifié) est régénéré.
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = (
+        f"{params['height']}p{params['fps']}_{params['bit_depth']}bit_{params['motion']}_"
+        f"{params['duration']:g}s_{params['codec']}_{clip_key(params)}"
+    )
+    path = os.path.join(directory, f"{name}.mp4")
+    meta_path = os.path.join(directory, f"{name}.json")
+
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("sha256") == file_checksum(path):
+            logging.info(f"Source synthétique {path} déjà générée")
+            return path
+        logging.warning(f"Checksum invalide pour {path}: régénération")
+
+    partial = f"{path}.partial"
+    cmd = build_synthetic_command(params, partial)
+    logging.info(f"Génération de la source synthétique {path}: {' '.join(cmd)}")
+    try:
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise RuntimeError(f"Échec de la génération de {path}: {e.stderr.strip()[-500:]}")
+    os.replace(partial, path)
+    with open(meta_path, "w") as f:
+        json.dump({**params, "sha256": file_checksum(path)}, f, indent=2)
+    return path
+
+def synthetic_videos(resolutions=("1080p",), duration=60, fps=30, bit_depth=8, motion="medium",
+                     codecs=("h264", "hevc"), directory=DEFAULT_SYNTHETIC_DIR):
+    """
+    Génère (ou réutilise) un clip par résolution et par codec et les retourne au format de
+    config.VIDEOS ({"file", "codec"}), pour remplacer les vidéos téléchargées.
+    """
+    videos = []
+    for resolution in resolutions:
+        for codec in codecs:
+            params = clip_params(resolution, duration, fps, bit_depth, motion, codec)
+            videos.append({"file": generate_clip(params, directory), "codec": codec})
+    return videos
@@ -0,0 +1,156 @@
+import os
+import csv
+import logging
+import statistics
+from config import PRESETS
+from progress import run_ffmpeg, extract_metrics
+from scheduler import available_cpus, format_cpus
+from software_transcode import build_software_command
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Parallel efficiency under which adding cores is considered wasted
+EFFICIENCY_THRESHOLD = 0.7
+
+SCALING_FIELDS = [
+    "source",
+    "codec",
+    "preset",
+    "bitrate",
+    "threads",
+    "cpus",
+    "iterations",
+    "utime_s",
+    "rtime_s",
+    "speedup",
+    "efficiency",
+    "serial_fraction",
+    "amdahl_max_speedup",
+    "recommended_threads"
+]
+
+def thread_counts(max_threads):
+    """
+    Nombres de threads testés: 1, 2, 4, ... jusqu'à `max_threads` (inclus même s'il n'est pas une puissance de 2).
+    """
+    counts = []
+    n = 1
+    while n < max_threads:
+        counts.append(n)
+        n *= 2
+    counts.append(max_threads)
+    return counts
+
+def fit_amdahl(points):
+    """
+    Ajuste la loi d'Amdahl S(n) = 1 / (f + (1 - f) / n) sur des points (n, speedup).
+    En posant x = 1 - 1/n et y = 1/S - 1/n, la loi devient y = f.x: f est estimé par
+    moindres carrés (f = somme(x.y) / somme(x²)) puis borné à [0, 1].
+    """
+    sxx = sxy = 0.0
+    for n, speedup in points:
+        if n <= 1 or speedup <= 0:
+            continue
+        x = 1 - 1 / n
+        y = 1 / speedup - 1 / n
+        sxx += x * x
+        sxy += x * y
+    if sxx == 0:
+        return None
+    return min(1.0, max(0.0, sxy / sxx))
+
+def recommended_threads(rows):
+    """
+    Plus grand nombre de threads dont l'efficacité parallèle reste au-dessus de EFFICIENCY_THRESHOLD.
+    """
+    efficient = [row["threads"] for row in rows if row["efficiency"] >= EFFICIENCY_THRESHOLD]
+    return max(efficient) if efficient else 1
+
+def scale_preset(source, codec, preset, bitrate, counts, cpus, iteration_count=1, sliced_threads=False):
+    """
+    Mesure un preset pour chaque nombre de threads, chaque exécution étant épinglée sur
+    autant de cœurs que de threads. Retourne une ligne par nombre de threads.
+    """
+    os.makedirs("transcoded_outputs", exist_ok=True)
+    base = os.path.basename(source).replace('.mp4', '')
+    rows = []
+    for threads in counts:
+        core_set = cpus[:threads]
+        utimes, rtimes = [], []
+        for i in range(iteration_count):
+            target_file = f"transcoded_outputs/{base}_{codec}_{bitrate}_{preset}_t{threads}_{i}.mp4"
+            cmd = build_software_command(source, target_file, codec, bitrate, preset,
+                                         threads=threads, sliced_threads=sliced_threads)
+            logging.info(f"Exécution de la commande ({threads} threads sur {format_cpus(core_set)}): {' '.join(cmd)}")
+            try:
+                metrics = extract_metrics(run_ffmpeg(cmd, core_set).stderr)
+                if metrics['rtime_s'] > 0:
+                    utimes.append(metrics['utime_s'])
+                    rtimes.append(metrics['rtime_s'])
+            except Exception as e:
+                logging.error(f"Exception lors du transcodage de {target_file}: {e}")
+            if os.path.exists(target_file):
+                os.remove(target_file)
+        if not rtimes:
+            logging.warning(f"Aucune mesure valide pour {preset} avec {threads} threads.")
+            continue
+        rows.append({
+            "source": source,
+            "codec": codec,
+            "preset": preset,
+            "bitrate": bitrate,
+            "threads": threads,
+            "cpus": format_cpus(core_set),
+            "iterations": len(rtimes),
+            "utime_s": statistics.median(utimes),
+            "rtime_s": statistics.median(rtimes)
+        })
+
+    if not rows:
+        return rows
+
+    # Speedups are relative to the smallest thread count measured (1 unless it failed)
+    reference = rows[0]
+    for row in rows:
+        row["speedup"] = round(reference["rtime_s"] * reference["threads"] / row["rtime_s"], 3)
+        row["efficiency"] = round(row["speedup"] / row["threads"], 3)
+
+    serial_fraction = fit_amdahl([(row["threads"], row["speedup"]) for row in rows])
+    recommended = recommended_threads(rows)
+    for row in rows:
+        row["serial_fraction"] = round(serial_fraction, 4) if serial_fraction is not None else ""
+        row["amdahl_max_speedup"] = round(1 / serial_fraction, 1) if serial_fraction else ""
+        row["recommended_threads"] = recommended
+
+    logging.info(
+        f"{source} {codec} preset {preset}: "
+        + ", ".join(f"{row['threads']}t x{row['speedup']:.2f} ({row['efficiency'] * 100:.0f}%)" for row in rows)
+        + f" - fraction série (Amdahl) {rows[0]['serial_fraction']}, threads recommandés: {recommended}"
+    )
+    return rows
+
+def run_thread_scaling(videos, bitrate, iteration_count=1, max_threads=None, sliced_threads=False):
+    """
+    Balaye le nombre de threads des encodeurs logiciels pour chaque vidéo et chaque preset.
+    """
+    cpus = available_cpus()
+    max_threads = min(max_threads or len(cpus), len(cpus))
+    counts = thread_counts(max_threads)
+    rows = []
+    for video in videos:
+        for preset in PRESETS:
+            logging.info(f"--- Passage à l'échelle de {video['file']} ({video['codec']}, preset {preset}, {counts} threads) ---")
+            rows.extend(scale_preset(video["file"], video["codec"], preset, bitrate, counts, cpus,
+                                     iteration_count, sliced_threads))
+    return rows
+
+def write_scaling_results(rows, csv_file="thread_scaling_results.csv"):
+    """
+    Enregistre les mesures de passage à l'échelle (une ligne par preset et nombre de threads).
+    """
+    with open(csv_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SCALING_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+    logging.info(f"Les résultats de passage à l'échelle sont enregistrés dans : {csv_file}")
@@ -0,0 +1,214 @@
+import os
+import csv
+import json
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from software_transcode import build_software_command
+from progress import run_ffmpeg, extract_metrics, ProgressSample
+from hardware_transcode import build_hardware_command
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_FPS = 30.0
+
+def probe_frame_rate(source):
+    """
+    Retourne la cadence native (images/s) du premier flux vidéo de `source` via ffprobe.
+    Retourne DEFAULT_FPS si ffprobe est absent ou si la cadence est illisible.
+    """
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=avg_frame_rate",
+        "-of", "json",
+        source
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        rate = json.loads(result.stdout)["streams"][0]["avg_frame_rate"]
+        num, den = rate.split("/")
+        if float(den) > 0 and float(num) > 0:
+            return float(num) / float(den)
+    except (subprocess.CalledProcessError, FileNotFoundError, KeyError, IndexError, ValueError) as e:
+        logging.warning(f"Cadence de {source} inconnue ({e}), utilisation de {DEFAULT_FPS} fps.")
+    return DEFAULT_FPS
+
+def run_streams(cmds):
+    """
+    Lance toutes les commandes en même temps (un thread par flux suivant son flux -progress)
+    et attend leur fin. Retourne pour chaque flux un dictionnaire {frames, rtime_s, fps, progress}.
+    """
+    def run(cmd):
+        result = run_ffmpeg(cmd)
+        metrics = extract_metrics(result.stderr)
+        frames = result.samples[-1].frame if result.samples else 0
+        fps = frames / metrics['rtime_s'] if metrics['rtime_s'] > 0 else 0.0
+        return {"frames": frames, "rtime_s": metrics['rtime_s'], "fps": fps, "progress": result.samples}
+
+    with ThreadPoolExecutor(max_workers=len(cmds)) as pool:
+        return list(pool.map(run, cmds))
+
+def measure_throughput(source, codec, preset, bitrate, streams, acceleration="software", gpu="renderD128"):
+    """
+    Mesure le débit agrégé de `streams` transcodages simultanés d'une même configuration.
+    """
+    os.makedirs("transcoded_outputs", exist_ok=True)
+    base = os.path.basename(source).replace('.mp4', '')
+    cmds, targets = [], []
+    for k in range(streams):
+        target_file = f"transcoded_outputs/{base}_{codec}_{bitrate}_{preset}_stream{k}.mp4"
+        if acceleration == "vaapi":
+            cmd = build_hardware_command(source, target_file, codec, bitrate, preset, gpu)
+        else:
+            cmd = build_software_command(source, target_file, codec, bitrate, preset)
+        cmds.append(cmd)
+        targets.append(target_file)
+
+    logging.info(f"Lancement de {streams} flux simultanés: {' '.join(cmds[0])}")
+    try:
+        per_stream = run_streams(cmds)
+    finally:
+        for target_file in targets:
+            if os.path.exists(target_file):
+                os.remove(target_file)
+
+    return {
+        "streams": streams,
+        "per_stream_fps": [s["fps"] for s in per_stream],
+        "total_fps": sum(s["fps"] for s in per_stream),
+        "min_stream_fps": min(s["fps"] for s in per_stream),
+        "per_stream_progress": [s["progress"] for s in per_stream]
+    }
+
+def find_saturation(source, codec, preset, bitrate, acceleration="software", max_streams=None, realtime_fps=None,
+                    gpu="renderD128"):
+    """
+    Augmente le nombre K de flux simultanés jusqu'à ce que le débit agrégé passe sous
+    K x temps réel (ou qu'un flux décroche du temps réel).
+    K double jusqu'au premier échec, puis une dichotomie affine le point de saturation.
+    Retourne (saturation, mesures) où `saturation` est le plus grand K tenant le temps réel.
+    En VAAPI, tous les flux partagent le nœud de rendu `gpu`.
+    """
+    if realtime_fps is None:
+        realtime_fps = probe_frame_rate(source)
+    if max_streams is None:
+        max_streams = 4 * (os.cpu_count() or 1)
+
+    measurements = {}
+
+    def sustains(k):
+        if k not in measurements:
+            m = measure_throughput(source, codec, preset, bitrate, k, acceleration, gpu)
+            m["realtime"] = m["total_fps"] >= realtime_fps * k and m["min_stream_fps"] >= realtime_fps
+            measurements[k] = m
+            logging.info(
+                f"K={k}: fps total={m['total_fps']:.1f}, "
+                f"fps min par flux={m['min_stream_fps']:.1f}, "
+                f"temps réel={'Oui' if m['realtime'] else 'Non'}"
+            )
+        return measurements[k]["realtime"]
+
+    good, bad = 0, None
+    k = 1
+    while k <= max_streams:
+        if not sustains(k):
+            bad = k
+            break
+        good = k
+        k *= 2
+    if bad is None and good < max_streams:
+        if sustains(max_streams):
+            good = max_streams
+        else:
+            bad = max_streams
+
+    while bad is not None and bad - good > 1:
+        mid = (good + bad) // 2
+        if sustains(mid):
+            good = mid
+        else:
+            bad = mid
+
+    return good, [measurements[k] for k in sorted(measurements)]
+
+def write_throughput_results(rows, csv_file="throughput_results.csv"):
+    """
+    Enregistre les mesures du mode débit (une ligne par valeur de K testée).
+    """
+    fieldnames = [
+        "source",
+        "codec",
+        "preset",
+        "bitrate",
+        "acceleration",
+        "device",
+        "realtime_fps",
+        "streams",
+        "total_fps",
+        "min_stream_fps",
+        "realtime",
+        "saturation",
+        "per_stream_fps"
+    ]
+    with open(csv_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in rows:
+            row = dict(row)
+            row.pop("per_stream_progress", None)
+            row["per_stream_fps"] = ";".join(f"{fps:.2f}" for fps in row["per_stream_fps"])
+            writer.writerow(row)
+    logging.info(f"Les résultats du mode débit sont enregistrés dans : {csv_file}")
+
+def run_throughput_benchmark(videos, preset, bitrate, acceleration="software", max_streams=None, realtime_fps=None,
+                             gpu="renderD128"):
+    """
+    Exécute la recherche de saturation pour chaque vidéo et retourne les lignes à enregistrer.
+    """
+    rows = []
+    for video in videos:
+        source, codec = video["file"], video["codec"]
+        fps = realtime_fps or probe_frame_rate(source)
+        device = gpu if acceleration == "vaapi" else ""
+        logging.info(f"--- Mode débit: {source} ({codec}, {acceleration}{f' sur {device}' if device else ''}, "
+                     f"preset {preset}, {bitrate}, {fps:.2f} fps) ---")
+        saturation, measurements = find_saturation(
+            source, codec, preset, bitrate, acceleration, max_streams=max_streams, realtime_fps=fps, gpu=gpu
+        )
+        logging.info(f"Point de saturation pour {source}: {saturation} flux temps réel simultanés")
+        for m in measurements:
+            rows.append({
+                "source": source,
+                "codec": codec,
+                "preset": preset,
+                "bitrate": bitrate,
+                "acceleration": acceleration,
+                "device": device,
+                "realtime_fps": f"{fps:.3f}",
+                "streams": m["streams"],
+                "total_fps": f"{m['total_fps']:.2f}",
+                "min_stream_fps": f"{m['min_stream_fps']:.2f}",
+                "realtime": m["realtime"],
+                "saturation": saturation,
+                "per_stream_fps": m["per_stream_fps"],
+                "per_stream_progress": m["per_stream_progress"]
+            })
+    return rows
+
+def write_throughput_progress(rows, csv_file="throughput_progress.csv"):
+    """
+    Enregistre la série temporelle de progression de chaque flux de chaque mesure du mode débit
+    (une ligne par échantillon).
+    """
+    key_fields = ["source", "codec", "preset", "bitrate", "acceleration", "streams"]
+    with open(csv_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(key_fields + ["stream"] + list(ProgressSample._fields))
+        for row in rows:
+            key = [row[field] for field in key_fields]
+            for stream, samples in enumerate(row.get("per_stream_progress", [])):
+                for sample in samples:
+                    writer.writerow(key + [stream] + [round(value, 3) if isinstance(value, float) else value
+                                                      for value in sample])
+    logging.info(f"Les séries de progression du mode débit sont enregistrées dans : {csv_file}")
@@ -105,3 +105,14 @@ def get_encoding_capabilities():
 
     capabilities = parse_vainfo_for_vaapi(vainfo_output)
     return capabilities
+
+def parse_vainfo_driver_version(vainfo_output):
+    """
+    Extrait la version du pilote VAAPI de la sortie de vainfo, ex:
+    "vainfo: Driver version: Intel iHD driver for Intel(R) Gen Graphics - 23.1.1 ()".
+    Retourne une chaîne vide si elle est absente.
+    """
+    for line in vainfo_output.split('\n'):
+        if "Driver version:" in line:
+            return line.split("Driver version:", 1)[1].strip()
+    return ""
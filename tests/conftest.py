@@ -0,0 +1,40 @@
+import os
+import sys
+import stat
+import pytest
+
+# The benchmark modules are flat scripts in src/, imported by name as main.py does
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+# Stand-in for ffmpeg: -progress blocks on stdout and -benchmark lines on stderr, framecrc packets
+# for the raw frames read on stdin (live), a hang of FAKE_HANG seconds before exiting
+FAKE_FFMPEG = f"""#!{sys.executable}
+import os, sys, time
+args = sys.argv[1:]
+if "framecrc" in args:
+    width, height = map(int, args[args.index("-video_size") + 1].split("x"))
+    n = 0
+    while len(sys.stdin.buffer.read(width * height * 3 // 2)) == width * height * 3 // 2:
+        sys.stdout.write(f"0, {{n}}, {{n}}, 1, 1000, 0xdeadbeef\\n")
+        sys.stdout.flush()
+        n += 1
+else:
+    for i in (1, 2):
+        sys.stdout.write(f"frame={{i * 30}}\\nfps=60.0\\nbitrate=4000.0kbits/s\\nout_time_us={{i * 1000000}}\\n"
+                         f"speed=2.0x\\nprogress={{'continue' if i == 1 else 'end'}}\\n")
+        sys.stdout.flush()
+    time.sleep(float(os.environ.get("FAKE_HANG", "0")))
+    open(args[-1], "w").write("x" * 1000)
+sys.stderr.write("bench: utime=1.000s stime=0.100s rtime=0.500s\\nbench: maxrss=1000kB\\n")
+"""
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    ffmpeg = bin_dir / "ffmpeg"
+    ffmpeg.write_text(FAKE_FFMPEG)
+    ffmpeg.chmod(ffmpeg.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.chdir(tmp_path)
+    return ffmpeg
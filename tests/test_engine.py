@@ -0,0 +1,76 @@
+import os
+import time
+from engine import Engine, SweepTask
+from events import BUS
+from matrix import MatrixJob, matrix_task
+from live import live_tasks
+
+class StaticFrameCache:
+    def __init__(self, entry):
+        self.entry = entry
+        self.requested = []
+
+    def get(self, source, pix_fmt="yuv420p"):
+        self.requested.append((source, pix_fmt))
+        return {**self.entry, "pix_fmt": pix_fmt}
+
+def matrix_jobs():
+    return [
+        MatrixJob("720p/x264", {"bitrate": "3M"}, "software", ["scale=-2:720"], ["-c:v", "libx264", "-b:v", "3M"]),
+        MatrixJob("360p/av1", {"bitrate": "800k", "extension": "mkv"}, "software", ["scale=-2:360"],
+                  ["-c:v", "libsvtav1", "-b:v", "800k"])
+    ]
+
+def test_matrix_jobs_run_on_the_engine(fake_ffmpeg):
+    results = Engine(concurrency=2).run([matrix_task("source.mp4", "h264", matrix_jobs())])
+    assert sorted((r["preset"], r["bitrate"]) for r in results) == [("360p/av1", "800k"), ("720p/x264", "3M")]
+    for result in results:
+        assert result["acceleration"] == "software"
+        assert result["rtime_s"] == 0.5
+        assert result["frames"] == 60
+        assert not result["aborted"]
+        assert result["output_bytes"] == 1000
+    # Outputs are removed once measured
+    assert os.listdir("transcoded_outputs") == []
+
+def test_matrix_jobs_are_stopped_by_the_job_timeout(fake_ffmpeg, monkeypatch):
+    monkeypatch.setenv("FAKE_HANG", "30")
+    started = time.monotonic()
+    results = Engine(concurrency=2, timeout=0.5).run([matrix_task("source.mp4", "h264", matrix_jobs())])
+    assert time.monotonic() - started < 10
+    assert len(results) == 2
+    assert all(result["aborted"] for result in results)
+
+def test_live_runs_on_the_engine_with_progress_events(fake_ffmpeg, tmp_path):
+    frames = tmp_path / "frames.yuv"
+    frames.write_bytes(b"\0" * (16 * 16 * 3 // 2) * 45)
+    entry = {"path": str(frames), "pix_fmt": "yuv420p", "width": 16, "height": 16, "frame_rate": "30/1"}
+    events = []
+    BUS.subscribe(events.append)
+
+    engine = Engine(frame_cache=StaticFrameCache(entry))
+    tasks = live_tasks([{"file": "source.mp4", "codec": "h264"}])
+    [result] = [r for r in engine.run(tasks, sinks=("pipe",)) if (r["preset"], r["bitrate"]) == ("low", "2M")]
+
+    assert result["acceleration"] == "software_live"
+    assert result["frames"] == 45
+    assert result["dropped_frames"] == 0
+    assert result["output_bytes"] == 45 * 1000
+    assert result["latency_p50_ms"] >= 0
+    # 45 frames paced at 30 fps: at least one periodic sample before the final one
+    assert len(result["progress"]) >= 2
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and not any(e["kind"] == "progress" and "software_live" in e["job"] for e in events):
+        time.sleep(0.05)
+    assert any(e["kind"] == "progress" and "software_live" in e["job"] for e in events)
+
+def test_frame_cache_format_follows_the_backend(fake_ffmpeg, tmp_path):
+    cache = StaticFrameCache({"path": str(tmp_path / "frames.yuv"), "width": 16, "height": 16, "frame_rate": "30/1"})
+    tasks = [
+        SweepTask("software", "software.mp4", "h264", (), jobs=[("low", "2M")]),
+        SweepTask("vaapi", "vaapi.mp4", "h264", ("/dev/dri/renderD128",), jobs=[("low", "2M")])
+    ]
+    results = Engine(frame_cache=cache).run(tasks)
+    # libx264 reads planar yuv420p, VAAPI uploads nv12: one cache entry per format
+    assert sorted(cache.requested) == [("software.mp4", "yuv420p"), ("vaapi.mp4", "nv12")]
+    assert len(results) == 2
@@ -0,0 +1,34 @@
+import pytest
+import environment
+import resource_sampler
+from resource_sampler import read_core_times
+from environment import measure_busy_percent
+
+# SMT disabled on a 4-core/8-thread host: only the even CPUs are online
+PROC_STAT = """cpu  400 0 200 3000 100 0 0 0 0 0
+cpu0 100 0 50 750 25 0 0 0 0 0
+cpu2 100 0 50 750 25 0 0 0 0 0
+cpu4 100 0 50 750 25 0 0 0 0 0
+cpu6 100 0 50 750 25 0 0 0 0 0
+intr 12345
+ctxt 67890
+"""
+
+def test_core_times_are_keyed_by_cpu_number(monkeypatch):
+    monkeypatch.setattr(resource_sampler, "_read", lambda path: PROC_STAT)
+    assert read_core_times() == {core: (150, 925) for core in (0, 2, 4, 6)}
+
+def test_busy_percent_looks_cores_up_by_number(monkeypatch):
+    before = {0: (0, 100), 2: (0, 100), 4: (0, 100), 6: (0, 100)}
+    # cpu6 is fully busy, the others idle
+    after = {0: (0, 200), 2: (0, 200), 4: (0, 200), 6: (100, 200)}
+    snapshots = iter([before, after])
+    monkeypatch.setattr(environment, "read_core_times", lambda: next(snapshots))
+    monkeypatch.setattr(environment.time, "sleep", lambda seconds: None)
+    assert measure_busy_percent(cpus=[4, 6]) == pytest.approx(50.0)
+
+def test_busy_percent_skips_cores_gone_offline(monkeypatch):
+    snapshots = iter([{0: (0, 100), 2: (0, 100)}, {0: (50, 200)}])
+    monkeypatch.setattr(environment, "read_core_times", lambda: next(snapshots))
+    monkeypatch.setattr(environment.time, "sleep", lambda seconds: None)
+    assert measure_busy_percent(cpus=[0, 2]) == pytest.approx(50.0)
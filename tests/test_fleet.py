@@ -0,0 +1,117 @@
+import time
+import threading
+import pytest
+from http.server import ThreadingHTTPServer
+from engine import Engine
+from journal import JobJournal
+from fleet import Coordinator, expand_fleet_jobs, run_worker, _handler
+
+VIDEO = {"file": "clip.mp4", "codec": "h264"}
+
+CPU_ONLY = {"h264_encode": False, "h264_decode": False, "hevc_encode": False, "hevc_decode": False}
+VAAPI_H264 = {**CPU_ONLY, "h264_encode": True}
+
+def result_of(job, rtime_s=1.0):
+    return {**{field: job[field] for field in ("source", "codec", "preset", "bitrate", "acceleration", "sink",
+                                                "iteration")}, "rtime_s": rtime_s}
+
+@pytest.fixture
+def journal(tmp_path):
+    return JobJournal(str(tmp_path / "journal.jsonl"))
+
+def test_jobs_are_leased_to_capable_workers(journal):
+    jobs = expand_fleet_jobs([VIDEO], ["vaapi", "software"])
+    coordinator = Coordinator(jobs, journal)
+    cpu = coordinator.register("cpu-host", CPU_ONLY, [])
+    gpu = coordinator.register("gpu-host", VAAPI_H264, ["/dev/dri/renderD128"])
+
+    # The CPU-only worker skips the VAAPI jobs queued first
+    assert coordinator.lease(cpu)["acceleration"] == "software"
+    job = coordinator.lease(gpu)
+    assert job["acceleration"] == "vaapi"
+    assert coordinator.leases[job["id"]][0] == gpu
+
+def test_lost_worker_jobs_are_requeued_first(journal):
+    coordinator = Coordinator(expand_fleet_jobs([VIDEO], ["software"]), journal, lease_timeout=0.05)
+    lost = coordinator.register("a", CPU_ONLY, [])
+    job = coordinator.lease(lost)
+    time.sleep(0.1)
+    survivor = coordinator.register("b", CPU_ONLY, [])
+    coordinator.reap()
+
+    assert lost not in coordinator.workers
+    assert not coordinator.leases
+    assert coordinator.lease(survivor)["id"] == job["id"]
+    with pytest.raises(KeyError):
+        coordinator.lease(lost)
+
+def test_late_result_of_a_requeued_job_completes_it(journal):
+    jobs = expand_fleet_jobs([VIDEO], ["software"])
+    coordinator = Coordinator(jobs, journal, lease_timeout=0.05)
+    lost = coordinator.register("a", CPU_ONLY, [])
+    job = coordinator.lease(lost)
+    time.sleep(0.1)
+    coordinator.reap()
+    # With every worker lost the remaining jobs wait for them instead of ending the sweep
+    assert not coordinator.finished.is_set()
+
+    # The worker comes back under a new id and sends the result it finished meanwhile
+    worker = coordinator.register("a", CPU_ONLY, [])
+    coordinator.complete(worker, job["id"], result_of(job))
+    assert job["id"] in coordinator.done
+    assert all(pending["id"] != job["id"] for pending in coordinator.pools[None])
+    # A copy leased again in between only reports a duplicate
+    coordinator.complete(worker, job["id"], result_of(job, 2.0))
+    assert [(row["rtime_s"], row["host"]) for row in journal.results()] == [(1.0, "a")]
+
+def test_replicated_jobs_of_a_lost_host_stay_on_that_host(journal):
+    jobs = expand_fleet_jobs([VIDEO], ["software"])
+    coordinator = Coordinator(jobs, journal, lease_timeout=0.05, replicate=True, expected_hosts=2)
+    lost = coordinator.register("a", CPU_ONLY, [])
+    other = coordinator.register("b", CPU_ONLY, [])
+    job = coordinator.lease(lost)
+    time.sleep(0.1)
+    coordinator.heartbeat(other)
+    coordinator.reap()
+
+    assert coordinator.pools["a"][0]["id"] == job["id"]
+    assert all(coordinator.lease(other)["host"] == "b" for _ in range(len(jobs)))
+
+class ForgetfulEngine(Engine):
+    """
+    Moteur qui fait passer son worker pour perdu pendant son premier job.
+    """
+
+    def __init__(self, coordinator):
+        super().__init__()
+        self.coordinator = coordinator
+        self.forgotten = False
+
+    def run_job(self, task, preset, bitrate, sink="file", i=0):
+        if not self.forgotten:
+            self.forgotten = True
+            for worker in self.coordinator.workers.values():
+                worker["last_seen"] = 0
+            self.coordinator.reap()
+        return super().run_job(task, preset, bitrate, sink, i)
+
+def test_worker_registers_again_after_a_410(fake_ffmpeg, tmp_path, journal):
+    (tmp_path / VIDEO["file"]).touch()
+    jobs = expand_fleet_jobs([VIDEO], ["software"])
+    coordinator = Coordinator(jobs, journal)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(coordinator))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        executed = run_worker(url, CPU_ONLY, [], engine=ForgetfulEngine(coordinator))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert coordinator.finished.is_set()
+    # The first job was requeued when the worker was reaped, but its late result completed it
+    assert executed == len(jobs)
+    assert len(coordinator.done) == len(jobs)
+    assert len(list(journal.results())) == len(jobs)
+    assert len(coordinator.workers) == 1
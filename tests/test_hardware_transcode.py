@@ -0,0 +1,68 @@
+import os
+import sys
+import stat
+import pytest
+import capabilities
+from hardware_transcode import list_available_gpus, check_available_gpus
+from capabilities import get_capability_matrix, devices_supporting
+
+# ffmpeg stand-in: the VAAPI init succeeds on renderD128 only
+FAKE_FFMPEG = f"""#!{sys.executable}
+import sys
+init = sys.argv[sys.argv.index("-init_hw_device") + 1]
+sys.exit(0 if init.endswith("renderD128") else 1)
+"""
+
+# vainfo stand-in: renderD128 encodes H.264 only, renderD129 also decodes and encodes HEVC
+FAKE_VAINFO = f"""#!{sys.executable}
+import sys
+device = sys.argv[sys.argv.index("--device") + 1]
+print("vainfo: Driver version: Intel iHD driver for Intel(R) Gen Graphics - 23.1.1 ()")
+print("      VAProfileH264Main               :\\tVAEntrypointVLD")
+print("      VAProfileH264Main               :\\tVAEntrypointEncSlice")
+if device.endswith("renderD129"):
+    print("      VAProfileHEVCMain               :\\tVAEntrypointVLD")
+    print("      VAProfileHEVCMain               :\\tVAEntrypointEncSliceLP")
+"""
+
+def _install(bin_dir, name, script):
+    path = bin_dir / name
+    path.write_text(script)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+
+@pytest.fixture
+def dri_dir(tmp_path, monkeypatch):
+    dri = tmp_path / "dri"
+    dri.mkdir()
+    for node in ("card0", "card1", "renderD129", "renderD128"):
+        (dri / node).touch()
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    _install(bin_dir, "ffmpeg", FAKE_FFMPEG)
+    _install(bin_dir, "vainfo", FAKE_VAINFO)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(capabilities, "VA_PROFILE_BIN", str(tmp_path / "missing" / "va_profile"))
+    return dri
+
+def test_render_nodes_are_listed_from_the_dri_dir(dri_dir):
+    assert list_available_gpus(str(dri_dir)) == [str(dri_dir / "renderD128"), str(dri_dir / "renderD129")]
+
+def test_missing_dri_dir_lists_no_gpu(tmp_path):
+    assert list_available_gpus(str(tmp_path / "none")) == []
+
+def test_only_nodes_passing_the_vaapi_init_are_usable(dri_dir):
+    gpus = list_available_gpus(str(dri_dir))
+    assert check_available_gpus(gpus) == [str(dri_dir / "renderD128")]
+
+def test_capabilities_are_probed_per_node_with_vainfo(dri_dir, tmp_path):
+    gpus = list_available_gpus(str(dri_dir))
+    cache_file = str(tmp_path / "cache" / "capabilities.json")
+    matrices = get_capability_matrix(gpus, cache_file)
+    assert set(matrices) == set(gpus)
+    assert all(matrix["source"] == "vainfo" for matrix in matrices.values())
+    assert devices_supporting(matrices, "h264") == gpus
+    assert devices_supporting(matrices, "hevc") == [str(dri_dir / "renderD129")]
+    assert devices_supporting(matrices, "hevc", "encode_lp") == [str(dri_dir / "renderD129")]
+    # The second lookup is served by the cache
+    assert os.path.exists(cache_file)
+    assert get_capability_matrix(gpus, cache_file) == matrices
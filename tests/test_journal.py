@@ -0,0 +1,63 @@
+from journal import JobJournal
+from progress import ProgressSample
+from resource_sampler import ResourceSample
+
+def result(preset, iteration, rtime_s, sink="file", host=None):
+    return {
+        "source": "clip.mp4", "codec": "h264", "acceleration": "software", "preset": preset, "bitrate": "2M",
+        "iteration": iteration, "sink": sink, "host": host, "rtime_s": rtime_s,
+        "progress": [ProgressSample(1.0, 2.0, 60, 60.0, 4000.0, 2.0)],
+        "resources": [ResourceSample(0.5, 99.0, 4, 1000, 0, 0, 1, 2, 0.1, (50, 75))]
+    }
+
+def test_resumed_journal_skips_completed_jobs(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = JobJournal(path)
+    first = result("low", 1, 1.5)
+    journal.record(first)
+    journal.record(result("low", 2, 1.7))
+    journal.record(result("medium", 1, 3.0, host="node-a"))
+    journal.close()
+    # Series are dropped from the in-memory result once written
+    assert "progress" not in first and "resources" not in first
+
+    # A crash in the middle of a write leaves a truncated last line
+    with open(path, "a") as f:
+        f.write('{"source": "clip.mp4", "co')
+    resumed = JobJournal(path, resume=True)
+    assert len(resumed) == 3
+    completed = resumed.completed_jobs("clip.mp4", "h264", "software")
+    assert {key: row["rtime_s"] for key, row in completed.items()} == {
+        (("low", "2M", "file"), 0): 1.5,
+        (("low", "2M", "file"), 1): 1.7,
+        (("medium", "2M", "file"), 0): 3.0
+    }
+    assert all("progress" not in row for row in completed.values())
+    assert resumed.completed_jobs("clip.mp4", "hevc", "software") == {}
+    assert resumed.completed_keys(["preset", "iteration", "host"]) == {("low", 1, None), ("low", 2, None),
+                                                                       ("medium", 1, "node-a")}
+
+def test_results_are_read_back_with_their_series(tmp_path):
+    journal = JobJournal(str(tmp_path / "journal.jsonl"))
+    journal.record(result("low", 1, 1.5))
+    # A job recorded again (late fleet result) replaces its first row
+    journal.record(result("low", 1, 1.6))
+    journal.record(result("medium", 1, 3.0))
+
+    rows = list(journal.results())
+    assert [(row["preset"], row["rtime_s"]) for row in rows] == [("low", 1.6), ("medium", 3.0)]
+    assert rows[0]["progress"] == [ProgressSample(1.0, 2.0, 60, 60.0, 4000.0, 2.0)]
+    assert rows[0]["resources"][0].core_load == (50, 75)
+    # Rows recorded after a completed_jobs lookup are still seen by the next one
+    journal.completed_jobs("clip.mp4", "h264", "software")
+    journal.record(result("high", 1, 5.0))
+    assert (("high", "2M", "file"), 0) in journal.completed_jobs("clip.mp4", "h264", "software")
+    journal.close()
+
+def test_new_journal_replaces_an_existing_one(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = JobJournal(path)
+    journal.record(result("low", 1, 1.5))
+    journal.close()
+    assert len(JobJournal(path)) == 0
+    assert list(JobJournal(path).results()) == []
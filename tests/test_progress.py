@@ -0,0 +1,144 @@
+import pytest
+from progress import ProgressParser, ProgressSample, StageTimer, StderrLog, instrument_command, STAGE_FIELDS
+
+# `ffmpeg -progress pipe:1` output recorded from a libx264 encode: the first block comes before the
+# first encoded frame (N/A values), the last one ends with progress=end
+RECORDED_PROGRESS = """\
+frame=0
+fps=0.00
+stream_0_0_q=0.0
+bitrate=N/A
+total_size=48
+out_time_us=N/A
+out_time_ms=N/A
+out_time=N/A
+dup_frames=0
+drop_frames=0
+speed=N/A
+progress=continue
+frame=61
+fps=60.52
+stream_0_0_q=28.0
+bitrate=3987.4kbits/s
+total_size=512044
+out_time_us=1033333
+out_time_ms=1033333
+out_time=00:00:01.033333
+dup_frames=0
+drop_frames=0
+speed=2.01x
+progress=continue
+frame=300
+fps=59.87
+stream_0_0_q=-1.0
+bitrate=4012.1kbits/s
+total_size=5015208
+out_time_us=10000000
+out_time_ms=10000000
+out_time=00:00:10.000000
+dup_frames=0
+drop_frames=0
+speed=1.99x
+progress=end
+"""
+
+# stderr of a run instrumented by instrument_command (ffmpeg -benchmark_all and bench filters)
+RECORDED_STDERR = """\
+bench:      12000 user        300 sys      20000 real decode_video 0.0
+[bench@filter @ 0x55d0c3a4e2c0] t:0.004000 avg:0.004000 max:0.004000 min:0.004000
+[bench@upload @ 0x55d0c3a4f1c0] t:0.001500 avg:0.001500 max:0.001500 min:0.001500
+bench:      45000 user        100 sys      50000 real encode_video 0.0
+bench:      11000 user        200 sys      30000 real decode_video 0.0
+[bench@filter @ 0x55d0c3a4e2c0] t:0.006000 avg:0.005000 max:0.006000 min:0.004000
+[bench@upload @ 0x55d0c3a4f1c0] t:0.002500 avg:0.002000 max:0.002500 min:0.001500
+bench:      40000 user        100 sys      70000 real encode_video 0.0
+bench:          0 user          0 sys      10000 real flush_video 0.0
+frame=  300 fps= 60 q=-1.0 Lsize=    4900kB time=00:00:10.00 bitrate=4012.1kbits/s speed=1.99x
+bench: utime=9.876s stime=0.321s rtime=5.012s
+bench: maxrss=123456kB
+"""
+
+def feed_all(parser, text):
+    samples = []
+    for step, line in enumerate(text.splitlines(keepends=True)):
+        sample = parser.feed(line, now=float(step))
+        if sample is not None:
+            samples.append(sample)
+    return samples
+
+def test_progress_blocks_yield_one_sample_each():
+    parser = ProgressParser(start_time=0.0)
+    samples = feed_all(parser, RECORDED_PROGRESS)
+    assert len(samples) == 3
+    assert parser.samples == samples
+    assert all(isinstance(sample, ProgressSample) for sample in samples)
+
+def test_na_values_before_first_frame_read_as_zero():
+    first = feed_all(ProgressParser(start_time=0.0), RECORDED_PROGRESS)[0]
+    assert first.frame == 0
+    assert first.out_time_s == 0.0
+    assert first.bitrate_kbps == 0.0
+    assert first.speed == 0.0
+
+def test_speed_and_bitrate_suffixes_are_stripped():
+    second = feed_all(ProgressParser(start_time=0.0), RECORDED_PROGRESS)[1]
+    assert second.frame == 61
+    assert second.fps == pytest.approx(60.52)
+    assert second.speed == pytest.approx(2.01)
+    assert second.bitrate_kbps == pytest.approx(3987.4)
+    assert second.out_time_s == pytest.approx(1.033333)
+
+def test_progress_end_marks_the_run_finished():
+    parser = ProgressParser(start_time=0.0)
+    samples = feed_all(parser, RECORDED_PROGRESS[:RECORDED_PROGRESS.index("frame=300")])
+    assert not parser.finished
+    samples += feed_all(parser, RECORDED_PROGRESS[RECORDED_PROGRESS.index("frame=300"):])
+    assert parser.finished
+    assert samples[-1].frame == 300
+    assert samples[-1].out_time_s == pytest.approx(10.0)
+
+def test_elapsed_time_is_measured_from_start():
+    parser = ProgressParser(start_time=100.0)
+    sample = None
+    for line in RECORDED_PROGRESS.splitlines()[:12]:
+        sample = parser.feed(line, now=102.5) or sample
+    assert sample.elapsed_s == pytest.approx(2.5)
+
+def test_stage_timer_sums_benchmark_all_and_bench_filters():
+    stages = StageTimer()
+    consumed = [line for line in RECORDED_STDERR.splitlines(keepends=True) if stages.feed(line)]
+    assert len(consumed) == 9
+    buckets = stages.buckets(5.012)
+    assert set(buckets) == set(STAGE_FIELDS)
+    assert buckets["decode_s"] == pytest.approx(0.05)
+    # Encoder flush calls (flush_video) count as encoding
+    assert buckets["encode_s"] == pytest.approx(0.13)
+    assert buckets["filter_s"] == pytest.approx(0.01)
+    assert buckets["upload_s"] == pytest.approx(0.004)
+    assert buckets["other_s"] == pytest.approx(5.012 - 0.194)
+
+def test_stage_buckets_never_report_negative_other_time():
+    stages = StageTimer()
+    for line in RECORDED_STDERR.splitlines():
+        stages.feed(line)
+    assert stages.buckets(0.1)["other_s"] == 0.0
+
+def test_stderr_log_keeps_final_bench_lines_for_extract_metrics():
+    log = StderrLog(StageTimer())
+    for line in RECORDED_STDERR.splitlines(keepends=True):
+        log.feed(line)
+    text = log.text()
+    assert text.startswith("bench: utime=9.876s")
+    assert "real decode_video" not in text
+    assert "Lsize" in text
+
+def test_instrument_command_wraps_filter_groups():
+    cmd = ["ffmpeg", "-benchmark", "-i", "in.mp4", "-vf", "scale=1280:720,format=nv12,hwupload",
+           "-c:v", "h264_vaapi", "out.mp4"]
+    instrumented = instrument_command(cmd)
+    assert instrumented[1:3] == ["-benchmark", "-benchmark_all"]
+    assert instrumented[instrumented.index("-vf") + 1] == (
+        "bench@filter=start,scale=1280:720,format=nv12,bench@filter=stop,"
+        "bench@upload=start,hwupload,bench@upload=stop"
+    )
+    assert cmd[5] == "scale=1280:720,format=nv12,hwupload"
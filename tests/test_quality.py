@@ -0,0 +1,29 @@
+from quality import build_quality_command, extract_quality
+
+def filter_graph(cmd):
+    return cmd[cmd.index("-filter_complex") + 1].split(";")
+
+def test_downscaled_rendition_is_scaled_to_reference_size():
+    cmd = build_quality_command("out_720p.mp4", "source.mp4", ["vmaf", "psnr"], reference_size=(1920, 1080))
+    graph = filter_graph(cmd)
+    assert graph[0] == "[0:v]scale=1920:1080:flags=bicubic,setpts=PTS-STARTPTS[d0]"
+    # The reference is never rescaled
+    assert graph[1] == "[1:v]setpts=PTS-STARTPTS,split=2[r0][r1]"
+    assert graph[2:] == ["[d0][r0]libvmaf[d1]", "[d1][r1]psnr[d2]"]
+    assert cmd[cmd.index("-map") + 1] == "[d2]"
+
+def test_scaling_precedes_subsampling():
+    graph = filter_graph(build_quality_command("out.mp4", "source.mp4", ["ssim"], subsample=5,
+                                               reference_size=(1280, 720)))
+    assert graph[0].startswith("[0:v]scale=1280:720:flags=bicubic,select=")
+
+def test_without_reference_size_the_output_is_compared_as_is():
+    graph = filter_graph(build_quality_command("out.mp4", "source.mp4", ["ssim"]))
+    assert graph[0] == "[0:v]setpts=PTS-STARTPTS[d0]"
+
+def test_extract_quality_scores():
+    stderr = (
+        "[Parsed_libvmaf_0 @ 0x1] VMAF score: 93.456789\n"
+        "[Parsed_psnr_1 @ 0x2] PSNR y:41.2 u:44.0 v:44.5 average:42.107 min:38.1 max:47.9\n"
+    )
+    assert extract_quality(stderr) == {"vmaf": 93.456789, "psnr_db": 42.107, "ssim": None}
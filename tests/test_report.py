@@ -0,0 +1,85 @@
+import pytest
+import report
+from results_store import save_run
+from report import load_report_rows, aggregate_efficiency, pareto_front, write_report
+
+CONFIG = {"source": "samples/x264.mp4", "codec": "h264", "bitrate": "4M", "acceleration": "software", "sink": "file"}
+
+def row(preset, iteration, frames, rtime_s, utime_s, energy_j=None, vmaf=None, aborted=False):
+    return dict(CONFIG, preset=preset, iteration=iteration, frames=frames, rtime_s=rtime_s, utime_s=utime_s,
+                energy_j=energy_j, content_s=10.0, output_kbps=4000.0, vmaf=vmaf, aborted=aborted)
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "results.db")
+    save_run([
+        row("fast", 1, 300, 2.0, 4.0, energy_j=30.0, vmaf=90.0),
+        # No CPU time or energy measured: the per-CPU and per-watt ratios are missing, not infinite
+        row("fast", 2, 300, 3.0, 0.0, energy_j=0.0, vmaf=92.0),
+        # Failed and aborted runs are not part of the report
+        row("fast", 3, 300, 0.0, 4.0),
+        row("fast", 4, 30, 0.2, 0.4, aborted=True),
+        row("slow", 1, 300, 6.0, 12.0, vmaf=95.0)
+    ], {"label": "a", "host": "node-a"}, path)
+    save_run([row("fast", 1, 300, 1.0, 2.0, energy_j=20.0)], {"label": "b", "host": "node-b"}, path)
+    return path
+
+@pytest.fixture(params=["python", "pandas"])
+def backend(request, monkeypatch):
+    # Both aggregation paths must give the same medians
+    if request.param == "pandas":
+        monkeypatch.setattr(report, "pd", pytest.importorskip("pandas"))
+    else:
+        monkeypatch.setattr(report, "pd", None)
+    return request.param
+
+def test_efficiency_medians_per_host_and_config(db, backend):
+    aggregated = aggregate_efficiency(load_report_rows(db_path=db), price_per_hour=2.0)
+    by_key = {(entry["host"], entry["preset"]): entry for entry in aggregated}
+    assert list(by_key) == [("node-a", "fast"), ("node-a", "slow"), ("node-b", "fast")]
+
+    fast = by_key[("node-a", "fast")]
+    assert fast["runs"] == 2
+    assert fast["fps"] == pytest.approx(125.0)
+    assert fast["frames_per_cpu_s"] == pytest.approx(75.0)
+    assert fast["fps_per_watt"] == pytest.approx(10.0)
+    # 2 $/h x rtime_s / 10 s of content
+    assert fast["cost_per_hour"] == pytest.approx(0.5)
+    assert fast["vmaf"] == pytest.approx(91.0)
+
+    slow = by_key[("node-a", "slow")]
+    assert slow["runs"] == 1
+    assert slow["fps"] == pytest.approx(50.0)
+    assert slow["frames_per_cpu_s"] == pytest.approx(25.0)
+    assert slow["fps_per_watt"] is None
+
+    other = by_key[("node-b", "fast")]
+    assert (other["fps"], other["fps_per_watt"], other["vmaf"]) == (pytest.approx(300.0), pytest.approx(15.0), None)
+
+def test_cost_is_missing_without_a_price(db, backend):
+    aggregated = aggregate_efficiency(load_report_rows(db_path=db))
+    assert all(entry["cost_per_hour"] is None for entry in aggregated)
+
+def test_report_rows_can_be_limited_to_runs(db, backend):
+    assert len(load_report_rows(["b"], db_path=db)) == 1
+
+def test_pareto_front():
+    points = [(90, 100), (95, 50), (92, 80), (85, 120), (90, 90), (95, 50), (80, 110)]
+    # (90, 90) and (80, 110) are dominated; of the two (95, 50) ties only the first is kept
+    assert sorted(pareto_front(points)) == [0, 1, 2, 3]
+    # Lower is better on y (e.g. cost): the cheapest point at each quality level
+    assert sorted(pareto_front(points, y_higher_is_better=False)) == [1]
+    assert sorted(pareto_front([(1, 5), (2, 3), (3, 4)], x_higher_is_better=False, y_higher_is_better=False)) == [0, 1]
+    assert pareto_front([]) == []
+
+def test_write_report(db, backend, tmp_path):
+    output = str(tmp_path / "report")
+    assert write_report(output=output, price_per_hour=2.0, db_path=db) == [f"{output}.html", f"{output}.md"]
+    with open(f"{output}.md", encoding="utf-8") as f:
+        markdown = f.read()
+    assert "## samples/x264.mp4" in markdown
+    assert "Axe de qualité: vmaf (plus haut = meilleur)" in markdown
+    with open(f"{output}.html", encoding="utf-8") as f:
+        assert f.read().count("<svg") == 4
+    # Nothing usable: no file is written
+    assert write_report(output=output, db_path=str(tmp_path / "empty.db")) == []
@@ -0,0 +1,48 @@
+import sys
+import subprocess
+from resource_sampler import ResourceSampler, summarize_resources
+
+# Short-lived threads that mostly sleep (voluntary switches), then a CPU-bound main thread
+BUSY_LOOP = """
+import time, threading
+def nap():
+    for _ in range(200):
+        time.sleep(0.001)
+threads = [threading.Thread(target=nap) for _ in range(4)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+data = bytearray(32 << 20)
+end = time.monotonic() + 1.5
+while time.monotonic() < end:
+    pass
+"""
+
+def test_sampler_measures_a_busy_process():
+    process = subprocess.Popen([sys.executable, "-c", BUSY_LOOP])
+    sampler = ResourceSampler(process.pid, interval=0.05)
+    sampler.start()
+    process.wait()
+    samples = sampler.stop()
+
+    assert len(samples) >= 5
+    summary = summarize_resources(samples)
+    assert summary["cpu_percent_max"] > 50
+    assert summary["rss_kb_max"] > 32 << 10
+    assert summary["threads_max"] >= 1
+    assert summary["voluntary_ctxt"] > 0
+    assert summary["nonvoluntary_ctxt"] + summary["voluntary_ctxt"] > 0
+
+def test_switches_of_exited_threads_are_kept():
+    process = subprocess.Popen([sys.executable, "-c", BUSY_LOOP])
+    sampler = ResourceSampler(process.pid, interval=0.05)
+    sampler.start()
+    process.wait()
+    samples = sampler.stop()
+
+    # Cumulative counters never go down when the napping threads exit
+    voluntary = [s.voluntary_ctxt for s in samples]
+    assert voluntary == sorted(voluntary)
+    # The threads' ~800 sleeps outweigh the main thread's own switches
+    assert voluntary[-1] > 400
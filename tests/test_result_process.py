@@ -0,0 +1,23 @@
+import csv
+from result_process import report_variants
+
+def write_rows(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["source", "codec", "preset", "bitrate", "acceleration", "sink",
+                                               "rtime_s", "aborted"])
+        writer.writeheader()
+        for acceleration, rtime_s in rows:
+            writer.writerow({"source": "samples/x264.mp4", "codec": "h264", "preset": "medium", "bitrate": "4M",
+                             "acceleration": acceleration, "sink": "file", "rtime_s": rtime_s, "aborted": False})
+
+def test_only_the_requested_variants_are_compared(tmp_path):
+    path = str(tmp_path / "results.csv")
+    # A combined --software --hardware sweep: libx264 shares the configuration of the VAAPI pipelines
+    write_rows(path, [("vaapi", 2.0), ("vaapi", 2.2), ("vaapi_hwaccel", 1.5), ("software", 8.0)])
+
+    [comparison] = report_variants(path, "acceleration", "vaapi", variants=("vaapi_hwaccel",))
+    assert comparison["variant"] == "vaapi_hwaccel"
+    assert comparison["baseline_rtime_s"] == 2.1
+    assert comparison["delta_s"] == 1.5 - 2.1
+
+    assert [c["variant"] for c in report_variants(path, "acceleration", "vaapi")] == ["software", "vaapi_hwaccel"]
@@ -0,0 +1,27 @@
+import pytest
+from results_store import save_run, compare_runs, load_history
+
+CONFIG = {"source": "samples/x264.mp4", "codec": "h264", "preset": "medium", "bitrate": "4M",
+          "acceleration": "software", "sink": "file"}
+
+def rows(*measures):
+    return [dict(CONFIG, iteration=i + 1, rtime_s=rtime, aborted=aborted)
+            for i, (rtime, aborted) in enumerate(measures)]
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "results.db")
+    save_run(rows((2.0, False), (2.1, False), (1.9, False)), {"label": "baseline"}, path)
+    # One failed run (rtime_s = 0) and one stopped by --min-speed early
+    save_run(rows((2.0, False), (0.0, False), (0.3, True), (2.05, False)), {"label": "candidate"}, path)
+    return path
+
+def test_failed_and_aborted_runs_do_not_count_as_improvements(db):
+    [comparison] = compare_runs("candidate", "baseline", db_path=db)
+    assert comparison["median"] == pytest.approx(2.025)
+    assert comparison["baseline_median"] == pytest.approx(2.0)
+    assert not comparison["regression"]
+
+def test_history_excludes_failed_and_aborted_runs(db):
+    [values] = load_history(db).values()
+    assert sorted(values) == [1.9, 2.0, 2.0, 2.05, 2.1]
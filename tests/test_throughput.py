@@ -0,0 +1,26 @@
+import csv
+from throughput import measure_throughput, write_throughput_results, write_throughput_progress
+
+def test_concurrent_streams_are_followed_through_their_progress(fake_ffmpeg):
+    m = measure_throughput("clip.mp4", "h264", "medium", "4M", 3)
+    assert m["streams"] == 3
+    # 60 frames from the last -progress block in 0.5 s of the bench line
+    assert m["per_stream_fps"] == [120.0] * 3
+    assert m["total_fps"] == 360.0
+    assert [[sample.frame for sample in samples] for samples in m["per_stream_progress"]] == [[30, 60]] * 3
+
+def test_progress_series_are_written_per_stream(fake_ffmpeg):
+    m = measure_throughput("clip.mp4", "h264", "medium", "4M", 2)
+    row = {"source": "clip.mp4", "codec": "h264", "preset": "medium", "bitrate": "4M", "acceleration": "software",
+           "device": "", "realtime_fps": "30.000", "total_fps": f"{m['total_fps']:.2f}",
+           "min_stream_fps": f"{m['min_stream_fps']:.2f}", "realtime": True, "saturation": 2, **m}
+    write_throughput_results([row])
+    write_throughput_progress([row])
+    with open("throughput_results.csv") as f:
+        [written] = csv.DictReader(f)
+    assert written["per_stream_fps"] == "120.00;120.00"
+    with open("throughput_progress.csv") as f:
+        series = list(csv.DictReader(f))
+    assert [(s["streams"], s["stream"], s["frame"]) for s in series] == [
+        ("2", "0", "30"), ("2", "0", "60"), ("2", "1", "30"), ("2", "1", "60")
+    ]